@@ -0,0 +1,97 @@
+"""
+批量写入
+
+PostgreSQL 下通过 COPY ... FROM STDIN（文本格式）写入，其它数据库回退为 bulk_create。
+每个批次在独立事务（嵌套时为保存点）内完成。
+"""
+import io
+import json
+from datetime import date, datetime, time
+from typing import Iterable, List, Sequence
+
+from django.contrib.postgres.fields import ArrayField
+from django.db import connections, models, router, transaction
+
+COPY_BATCH_SIZE = 2000
+# COPY 文本格式需要转义的字符
+COPY_ESCAPES = str.maketrans({'\\': '\\\\', '\n': '\\n', '\r': '\\r', '\t': '\\t'})
+
+
+def _scalar_text(value) -> str:
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    return str(value)
+
+
+def _array_literal(values) -> str:
+    """PostgreSQL 数组字面量：空列表为 {}，元素加双引号并转义反斜杠与双引号，None 为 NULL"""
+    items = []
+    for item in values:
+        if item is None:
+            items.append('NULL')
+        elif isinstance(item, (list, tuple)):
+            items.append(_array_literal(item))
+        else:
+            items.append('"' + _scalar_text(item).replace('\\', '\\\\').replace('"', '\\"') + '"')
+    return '{' + ','.join(items) + '}'
+
+
+def _copy_text(field, value, connection) -> str:
+    """把单个字段值编码为 COPY 文本格式"""
+    if value is None:
+        return '\\N'
+    if isinstance(field, models.JSONField):
+        return json.dumps(value, cls=field.encoder, ensure_ascii=False).translate(COPY_ESCAPES)
+    if isinstance(field, models.BinaryField):
+        return '\\\\x' + bytes(value).hex()
+    value = field.get_db_prep_save(value, connection)
+    if value is None:
+        return '\\N'
+    if isinstance(field, ArrayField):
+        return _array_literal(value).translate(COPY_ESCAPES)
+    return _scalar_text(value).translate(COPY_ESCAPES)
+
+
+def _copy_fields(model) -> List[models.Field]:
+    return [field for field in model._meta.concrete_fields if not isinstance(field, models.AutoField)]
+
+
+def _copy_batch(model, objs: Sequence[models.Model], fields, connection) -> None:
+    buffer = io.StringIO()
+    for obj in objs:
+        row = [_copy_text(field, field.pre_save(obj, True), connection) for field in fields]
+        buffer.write('\t'.join(row))
+        buffer.write('\n')
+    buffer.seek(0)
+    columns = ', '.join(connection.ops.quote_name(field.column) for field in fields)
+    table = connection.ops.quote_name(model._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.copy_expert(f'COPY {table} ({columns}) FROM STDIN', buffer)
+
+
+def copy_insert(model, objs: Iterable[models.Model], batch_size: int = COPY_BATCH_SIZE) -> int:
+    """
+    批量插入模型实例，返回写入行数
+
+    与 bulk_create 一样不会调用 save() 和发送信号；主键需由字段默认值生成（如UUID）。
+    """
+    objs = list(objs)
+    if not objs:
+        return 0
+    using = router.db_for_write(model)
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        model.objects.using(using).bulk_create(objs, batch_size=batch_size)
+        return len(objs)
+
+    fields = _copy_fields(model)
+    for start in range(0, len(objs), batch_size):
+        batch = objs[start:start + batch_size]
+        with transaction.atomic(using=using):
+            _copy_batch(model, batch, fields, connection)
+        for obj in batch:
+            obj._state.adding = False
+            obj._state.db = using
+    return len(objs)
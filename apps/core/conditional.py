@@ -0,0 +1,92 @@
+"""
+条件请求（ETag / Last-Modified）
+
+校验值由 updated_at 聚合（最大更新时间、行数）计算，只需一条很小的聚合查询，
+不查询完整数据、也不序列化响应体；客户端带 If-None-Match / If-Modified-Since 轮询时，
+数据未变化直接返回304。
+
+集合接口只提供 ETag：删除行或行被过滤掉时最大更新时间可能不变甚至变小，
+Last-Modified 无法反映这类变化，行数与最大更新时间一起参与 ETag 计算则可以。
+"""
+import functools
+import hashlib
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Optional, Tuple
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+
+@dataclass
+class Version:
+    """
+    资源版本：parts 参与 ETag 计算；last_modified 只在它能完整反映资源变化时设置
+    """
+    parts: Tuple
+    last_modified: Optional[datetime] = None
+
+
+def latest(*values) -> Optional[datetime]:
+    values = [value for value in values if value is not None]
+    return max(values) if values else None
+
+
+def collection_version(queryset, *related_updated_at: str) -> Version:
+    """
+    集合的版本：行数 + 最大 updated_at，related_updated_at 为输出中包含的关联对象的更新时间（如创建者用户名）
+    """
+    aggregates = {'count': Count('pk', distinct=True), 'updated_at': Max('updated_at')}
+    for index, lookup in enumerate(related_updated_at):
+        aggregates[f'related_{index}'] = Max(lookup)
+    row = queryset.order_by().aggregate(**aggregates)
+    return Version(parts=tuple(row[key] for key in sorted(row)))
+
+
+def make_etag(request, version: Version) -> str:
+    """同一资源的不同查询参数、不同用户、不同渲染格式使用不同的 ETag"""
+    renderer = getattr(request, 'accepted_renderer', None)
+    digest = hashlib.blake2b(digest_size=16)
+    for part in (
+        request.get_full_path(),
+        getattr(renderer, 'media_type', ''),
+        getattr(request.user, 'pk', None),
+        *version.parts,
+    ):
+        digest.update(repr(part).encode('utf-8'))
+        digest.update(b'\x00')
+    return quote_etag(digest.hexdigest())
+
+
+def conditional_get(version_func: Callable[..., Optional[Version]]):
+    """
+    DRF 视图方法装饰器：GET/HEAD 时先计算资源版本，未变化返回304，否则执行视图并带上校验头
+
+    version_func(view, request, *args, **kwargs) 返回 Version，返回 None 时（如资源不存在）按普通请求处理。
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(view, request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return method(view, request, *args, **kwargs)
+            version = version_func(view, request, *args, **kwargs)
+            if version is None:
+                return method(view, request, *args, **kwargs)
+
+            etag = make_etag(request, version)
+            last_modified = int(version.last_modified.timestamp()) if version.last_modified else None
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = method(view, request, *args, **kwargs)
+            if response.status_code in (200, 304):
+                response.headers['ETag'] = etag
+                if last_modified is not None:
+                    response.headers['Last-Modified'] = http_date(last_modified)
+                # 响应内容因用户而异
+                patch_vary_headers(response, ('Authorization', 'Cookie'))
+            return response
+
+        return wrapper
+
+    return decorator
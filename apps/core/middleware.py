@@ -0,0 +1,77 @@
+"""
+响应压缩与读写分离中间件
+"""
+from django.conf import settings
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+from django.utils.regex_helper import _lazy_re_compile
+
+from .replicas import begin_request, end_request, pins
+
+try:
+    import brotli
+except ImportError:
+    # 未安装时只使用 gzip
+    brotli = None
+
+re_accepts_brotli = _lazy_re_compile(r'\bbr\b')
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """
+    压缩较大的 JSON 响应
+
+    客户端接受 br 且安装了 brotli 时使用 brotli，否则使用 gzip（带随机填充字节，见 GZipMiddleware）。
+    只处理非流式的 JSON 响应：流式接口（如工作流的 NDJSON 输出）需要逐条到达客户端，不做压缩。
+    """
+
+    def process_response(self, request, response):
+        config = settings.RESPONSE_COMPRESSION
+        if (
+            response.streaming
+            or response.has_header('Content-Encoding')
+            or not response.get('Content-Type', '').startswith('application/json')
+            or len(response.content) < config['MIN_SIZE']
+        ):
+            return response
+
+        accept_encoding = request.META.get('HTTP_ACCEPT_ENCODING', '')
+        if brotli is None or not re_accepts_brotli.search(accept_encoding):
+            return super().process_response(request, response)
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        compressed = brotli.compress(response.content, quality=config['BROTLI_QUALITY'])
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response.headers['Content-Length'] = str(len(compressed))
+        # 与 GZipMiddleware 相同：压缩后强 ETag 改为弱 ETag
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = 'br'
+        return response
+
+
+class ReplicaRoutingMiddleware:
+    """
+    为每个请求建立读写分离的路由状态（见 apps.core.replicas）
+
+    请求中发生过写入时，记录该用户在 STICKY_SECONDS 秒内只读主库。
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = begin_request()
+        try:
+            response = self.get_response(request)
+        finally:
+            state = end_request(token)
+        if state is not None and state.wrote and settings.DB_REPLICAS['ALIASES']:
+            # DRF 认证的用户会同步到 HttpRequest.user
+            user = getattr(request, 'user', None)
+            if user is not None and user.is_authenticated:
+                pins.pin(user.pk)
+        return response
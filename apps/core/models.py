@@ -1,16 +1,20 @@
 """
 核心模型基础类
 """
-import uuid
 from django.db import models
 from django.contrib.auth import get_user_model
 
+from .ids import ModelUUIDField
+
 
 class BaseModel(models.Model):
     """
     基础抽象模型，提供通用字段
+
+    子类声明 uuid_version = 7 时主键使用按时间递增的 uuid7（见 apps/core/ids.py）。
     """
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = ModelUUIDField(primary_key=True, editable=False)
+    uuid_version = 4
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
     
@@ -33,13 +37,34 @@ class UserRelatedModel(BaseModel):
         abstract = True
 
 
+class SoftDeleteManager(models.Manager):
+    """
+    只包含未删除的行
+
+    查询条件中始终带 is_deleted = false，可以使用子类以 condition=LIVE 声明的部分索引。
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().filter(is_deleted=False)
+
+
+# 部分索引的条件：只索引未删除的行
+LIVE = models.Q(is_deleted=False)
+
+
 class SoftDeleteModel(BaseModel):
     """
     软删除模型基类
+
+    默认管理器 objects 不包含已软删除的行；需要访问已删除的行时（清理、恢复）使用 all_objects。
+    关联对象的正向访问（如 document.knowledge_base）与保存、级联删除使用基础管理器，不受影响。
     """
     is_deleted = models.BooleanField(default=False, verbose_name='是否删除')
     deleted_at = models.DateTimeField(null=True, blank=True, verbose_name='删除时间')
-    
+
+    objects = SoftDeleteManager()
+    all_objects = models.Manager()
+
     class Meta:
         abstract = True
     
@@ -0,0 +1,45 @@
+"""
+JSON渲染器
+"""
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:
+    # 未安装时使用标准 JSONRenderer
+    orjson = None
+
+# 与 JSONRenderer 一致：转义 U+2028/U+2029，输出可安全嵌入 JavaScript
+LINE_SEPARATOR = '\u2028'.encode()
+PARAGRAPH_SEPARATOR = '\u2029'.encode()
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    基于 orjson 的 JSON 渲染器
+
+    输出与 JSONRenderer 一致（紧凑格式、UTF-8），时间、Decimal 等类型交给 DRF 的 JSONEncoder 处理；
+    未安装 orjson、请求缩进格式或数据超出 orjson 支持范围（如超过64位的整数）时退回 JSONRenderer。
+    """
+
+    _encoder = encoders.JSONEncoder()
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None or data is None or not api_settings.UNICODE_JSON
+            or not api_settings.COMPACT_JSON or not api_settings.STRICT_JSON
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(
+                data,
+                default=self._encoder.default,
+                # 时间交给 JSONEncoder，毫秒精度与 Z 后缀与 JSONRenderer 相同
+                option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS,
+            )
+        except (orjson.JSONEncodeError, TypeError):
+            return super().render(data, accepted_media_type, renderer_context)
+        return ret.replace(LINE_SEPARATOR, b'\\u2028').replace(PARAGRAPH_SEPARATOR, b'\\u2029')
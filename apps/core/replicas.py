@@ -0,0 +1,271 @@
+"""
+只读副本路由
+
+读副本只用于显式声明的只读接口（ReplicaReadMixin 的 replica_actions / replica_methods），
+其余查询、所有写入、事务内的查询都使用主库（default）：
+
+- 一次请求只选择一个副本，同一请求内的查询看到一致的数据；
+- 请求内发生写入后，该请求剩余的读取全部回到主库；
+- 用户自己写入后 STICKY_SECONDS 秒内（Redis记录，所有worker可见）只读主库，避免读不到刚写入的数据；
+- 每个进程的后台线程每 CHECK_INTERVAL 秒检查一次各副本的复制延迟，请求路由只读取缓存的结果；
+  延迟超过 MAX_LAG、连接失败的副本不参与选择，检查结果过期（检查线程被无响应的副本卡住）时不使用副本；
+- 没有可用副本、Redis不可用（无法判断是否需要读主库）时使用主库。
+
+Celery任务、管理命令等不经过中间件的代码始终使用主库。
+"""
+import logging
+import os
+import random
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, connections
+from rest_framework.permissions import SAFE_METHODS
+
+logger = logging.getLogger('manxiai.core')
+
+KEY_PREFIX = 'manxiai:db:pin'
+# 超过 CHECK_INTERVAL 的该倍数仍没有新的检查结果时，认为结果已过期
+STALE_CHECKS = 3
+
+# 副本上的复制延迟（秒）：WAL已全部重放时为0，否则为距最后一次重放事务的时间
+LAG_SQL = """
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() THEN 0
+    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+END
+"""
+
+
+class RoutingState:
+    """
+    一次请求的路由状态
+    """
+    __slots__ = ('use_replica', 'wrote', 'alias')
+
+    def __init__(self):
+        self.use_replica = False
+        self.wrote = False
+        # 本次请求选中的副本，'' 表示没有可用副本
+        self.alias: Optional[str] = None
+
+
+_state: ContextVar[Optional[RoutingState]] = ContextVar('manxiai_db_routing', default=None)
+
+
+def replica_aliases() -> List[str]:
+    return settings.DB_REPLICAS['ALIASES']
+
+
+class ReplicaMonitor:
+    """
+    进程内的副本复制延迟检查
+
+    检查在后台守护线程中进行（第一次选择副本时启动，fork 出的子进程各自重新启动），
+    请求线程只读取上一次的结果，不会因检查增加往返或被无响应的副本阻塞。
+    """
+
+    def __init__(self):
+        self._healthy: List[str] = []
+        self._lags: Dict[str, Optional[float]] = {}
+        self._checked_at = float('-inf')
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def measure_lag(alias: str) -> Optional[float]:
+        """返回复制延迟（秒），无法获取时返回None"""
+        connection = connections[alias]
+        if connection.vendor != 'postgresql':
+            return 0.0
+        with connection.cursor() as cursor:
+            cursor.execute(LAG_SQL)
+            lag = cursor.fetchone()[0]
+        return None if lag is None else float(lag)
+
+    def refresh(self):
+        config = settings.DB_REPLICAS
+        healthy, lags = [], {}
+        for alias in config['ALIASES']:
+            try:
+                lag = self.measure_lag(alias)
+            except Exception as exc:
+                logger.warning('只读副本 %s 不可用: %s', alias, exc)
+                connections[alias].close()
+                lag = None
+            lags[alias] = lag
+            if lag is not None and lag <= config['MAX_LAG']:
+                healthy.append(alias)
+            elif lag is not None:
+                logger.warning('只读副本 %s 复制延迟 %.1f 秒，暂不使用', alias, lag)
+        self._healthy, self._lags = healthy, lags
+        self._checked_at = time.monotonic()
+
+    def _run(self):
+        while True:
+            try:
+                self.refresh()
+            except Exception:
+                logger.exception('检查只读副本复制延迟失败')
+            finally:
+                # 后台线程不经过请求周期，自行回收失效的连接
+                close_old_connections()
+            time.sleep(settings.DB_REPLICAS['CHECK_INTERVAL'])
+
+    def start(self):
+        """在当前进程启动检查线程（已启动时不做任何事）"""
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._lock:
+            if self._pid == pid:
+                return
+            self._pid = pid
+            threading.Thread(target=self._run, name='replica-monitor', daemon=True).start()
+
+    def healthy(self) -> List[str]:
+        self.start()
+        age = time.monotonic() - self._checked_at
+        if age > settings.DB_REPLICAS['CHECK_INTERVAL'] * STALE_CHECKS:
+            # 尚未完成第一次检查，或检查线程被无响应的副本卡住
+            return []
+        return self._healthy
+
+    def choose(self) -> Optional[str]:
+        healthy = self.healthy()
+        return random.choice(healthy) if healthy else None
+
+    def status(self) -> Dict[str, Optional[float]]:
+        return dict(self._lags)
+
+
+replica_monitor = ReplicaMonitor()
+
+
+class _PinStore:
+    """
+    用户写入后的“读主库”标记，保存在Redis中
+    """
+
+    RETRY_INTERVAL = 30.0
+
+    def __init__(self):
+        self._client = None
+        self._retry_at = 0.0
+
+    def _redis(self):
+        if time.monotonic() < self._retry_at:
+            return None
+        if self._client is None:
+            from apps.core.redis import get_redis
+            self._client = get_redis()
+        return self._client
+
+    def _redis_failed(self, exc):
+        logger.warning('读写分离的Redis不可用，%s 秒内只读主库: %s', self.RETRY_INTERVAL, exc)
+        self._retry_at = time.monotonic() + self.RETRY_INTERVAL
+
+    def pin(self, user_pk):
+        client = self._redis()
+        if client is None:
+            return
+        try:
+            client.set(f'{KEY_PREFIX}:{user_pk}', 1, px=int(settings.DB_REPLICAS['STICKY_SECONDS'] * 1000))
+        except Exception as exc:
+            self._redis_failed(exc)
+
+    def is_pinned(self, user_pk) -> bool:
+        client = self._redis()
+        if client is None:
+            return True
+        try:
+            return bool(client.exists(f'{KEY_PREFIX}:{user_pk}'))
+        except Exception as exc:
+            self._redis_failed(exc)
+            return True
+
+
+pins = _PinStore()
+
+
+class ReplicaRouter:
+    """
+    数据库路由：只在当前请求允许时把读取发往副本，写入与迁移只在主库
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or not state.use_replica or state.wrote:
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            # 事务内的读取需要看到本事务的写入
+            return DEFAULT_DB_ALIAS
+        if state.alias is None:
+            state.alias = replica_monitor.choose() or ''
+        return state.alias or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *replica_aliases()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in replica_aliases():
+            return False
+        return None
+
+
+def begin_request():
+    return _state.set(RoutingState())
+
+
+def end_request(token) -> Optional[RoutingState]:
+    state = _state.get()
+    _state.reset(token)
+    return state
+
+
+def use_replica_for_request(user=None) -> bool:
+    """
+    当前请求之后的读取允许使用副本；用户最近写入过、请求已写入或未配置副本时不切换
+    """
+    state = _state.get()
+    if state is None or state.wrote or not replica_aliases():
+        return False
+    if user is not None and user.is_authenticated and pins.is_pinned(user.pk):
+        return False
+    state.use_replica = True
+    return True
+
+
+class ReplicaReadMixin:
+    """
+    视图的只读操作使用副本
+
+    ViewSet 用 replica_actions 声明只读的 action（只对 GET/HEAD 生效）；
+    APIView 用 replica_methods 声明只读的请求方法（如只读的检索 POST）。
+    """
+    replica_actions = ()
+    replica_methods = ()
+
+    def use_read_replica(self, request) -> bool:
+        action = getattr(self, 'action', None)
+        if action is not None:
+            return action in self.replica_actions and request.method in SAFE_METHODS
+        return request.method in self.replica_methods
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if self.use_read_replica(request):
+            use_replica_for_request(request.user)
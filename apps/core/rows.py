@@ -0,0 +1,191 @@
+"""
+列表接口的行序列化
+
+大分页时 ModelSerializer 的开销主要在逐字段的 Field 调用与模型实例化上。
+RowSerializer 用 .values() 只查询需要的列，直接把行字典转换为与对应 ModelSerializer 相同的输出，
+嵌套对象通过关联路径在同一条SQL中取出，不再逐行查询或实例化嵌套序列化器。
+"""
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+from rest_framework.response import Response
+from rest_framework.settings import ISO_8601, api_settings
+
+
+def _datetime_converter(tz):
+    """与 DRF DateTimeField.to_representation 一致：转换到当前时区，UTC 以 Z 结尾"""
+    output_format = api_settings.DATETIME_FORMAT
+
+    def convert(value):
+        if tz is not None and timezone.is_aware(value):
+            value = value.astimezone(tz)
+        if output_format is None or isinstance(value, str):
+            return value
+        if output_format.lower() != ISO_8601:
+            return value.strftime(output_format)
+        value = value.isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+
+    return convert
+
+
+def _date_converter(tz):
+    output_format = api_settings.DATE_FORMAT
+
+    def convert(value):
+        if output_format is None or isinstance(value, str):
+            return value
+        if output_format.lower() != ISO_8601:
+            return value.strftime(output_format)
+        return value.isoformat()
+
+    return convert
+
+
+def _uuid_converter(tz):
+    return str
+
+
+def _decimal_converter(tz):
+    return str if api_settings.COERCE_DECIMAL_TO_STRING else float
+
+
+def _file_converter(field, context):
+    """与 DRF FileField 一致：空值为None，有请求时输出绝对地址"""
+    request = context.get('request')
+
+    def factory(tz):
+        def convert(value):
+            if not value:
+                return None
+            url = field.storage.url(value)
+            return request.build_absolute_uri(url) if request is not None else url
+
+        return convert
+
+    return factory
+
+
+class RowSerializer:
+    """
+    基于 .values() 的只读列表序列化器
+
+    子类声明：
+    - model: 查询集的模型；
+    - fields: 输出字段名 -> 查询路径（如 'created_by__username'），嵌套对象用字典表示；
+    - annotations: 需要先 annotate 的表达式，在 fields 中按名称引用；
+    - computed: 不从数据库查询、由 prepare_rows() 为整页数据批量补充的列（如按团队汇总的成员数）。
+
+    值按模型字段类型转换（时间、UUID、Decimal、文件），与 DRF 默认字段的输出保持一致。
+    """
+    model = None
+    fields: Dict[str, Any] = {}
+    annotations: Dict[str, Any] = {}
+    computed: Tuple[str, ...] = ()
+
+    def __init__(self, context: Optional[Dict] = None):
+        self.context = context or {}
+        self.columns: List[Tuple[Tuple[str, ...], str, Optional[Callable]]] = []
+        self._compile(self.fields, ())
+        self.lookups = list(dict.fromkeys(
+            lookup for _, lookup, _ in self.columns if lookup not in self.computed
+        ))
+
+    def _compile(self, fields: Dict[str, Any], prefix: Tuple[str, ...]):
+        for name, lookup in fields.items():
+            if isinstance(lookup, dict):
+                self._compile(lookup, prefix + (name,))
+            else:
+                self.columns.append((prefix + (name,), lookup, self._converter(lookup)))
+
+    def _resolve(self, lookup: str):
+        model, field = self.model, None
+        for part in lookup.split('__'):
+            field = model._meta.get_field(part)
+            if field.is_relation and field.related_model is not None:
+                model = field.related_model
+        if field.is_relation:
+            # 外键本身：.values() 返回关联对象主键
+            field = field.target_field
+        return field
+
+    def _converter(self, lookup: str) -> Optional[Callable]:
+        """返回转换函数的工厂（参数为当前时区），不需要转换时返回None"""
+        if lookup in self.annotations or lookup in self.computed:
+            return None
+        field = self._resolve(lookup)
+        if isinstance(field, models.DateTimeField):
+            return _datetime_converter
+        if isinstance(field, models.DateField):
+            return _date_converter
+        if isinstance(field, models.UUIDField):
+            return _uuid_converter
+        if isinstance(field, models.DecimalField):
+            return _decimal_converter
+        if isinstance(field, models.FileField):
+            return _file_converter(field, self.context)
+        return None
+
+    def project(self, queryset):
+        """把查询集投影为只包含所需列的 values 查询集（可直接分页）"""
+        if self.annotations:
+            queryset = queryset.annotate(**self.annotations)
+        return queryset.values(*self.lookups)
+
+    def prepare_rows(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """为整页数据补充 computed 列"""
+        return rows
+
+    def to_representation(self, rows) -> List[Dict[str, Any]]:
+        if self.computed:
+            rows = self.prepare_rows(list(rows))
+        # 当前时区每次序列化只取一次（按请求激活的时区存放在 asgiref Local 中，逐值读取开销明显）
+        tz = timezone.get_current_timezone() if settings.USE_TZ else None
+        columns = [
+            (path, lookup, factory(tz) if factory is not None else None)
+            for path, lookup, factory in self.columns
+        ]
+        flat = all(len(path) == 1 for path, _, _ in columns)
+        data = []
+        for row in rows:
+            item: Dict[str, Any] = {}
+            for path, lookup, convert in columns:
+                value = row[lookup]
+                if value is not None and convert is not None:
+                    value = convert(value)
+                if flat:
+                    item[path[0]] = value
+                    continue
+                target = item
+                for key in path[:-1]:
+                    target = target.setdefault(key, {})
+                target[path[-1]] = value
+            data.append(item)
+        return data
+
+    def serialize(self, queryset) -> List[Dict[str, Any]]:
+        return self.to_representation(self.project(queryset))
+
+
+class RowListMixin:
+    """
+    ViewSet 的 list 使用 row_serializer_class（过滤、排序、分页行为不变）
+    """
+    row_serializer_class = None
+
+    def get_row_serializer(self) -> RowSerializer:
+        return self.row_serializer_class(context=self.get_serializer_context())
+
+    def list(self, request, *args, **kwargs):
+        if self.row_serializer_class is None:
+            return super().list(request, *args, **kwargs)
+        rows = self.get_row_serializer()
+        queryset = rows.project(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(rows.to_representation(page))
+        return Response(rows.to_representation(queryset))
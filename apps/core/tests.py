@@ -0,0 +1,57 @@
+"""
+核心模块测试
+
+copy_insert 的往返测试需要 PostgreSQL（COPY 与 pgvector），其它数据库跳过。
+"""
+import unittest
+
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+
+from apps.core.bulk import _array_literal, _copy_text, copy_insert
+from apps.core.models import StatusChoices
+from apps.embedding.models import ChunkEmbedding
+
+
+class ArrayLiteralTests(SimpleTestCase):
+    def test_empty_list(self):
+        self.assertEqual(_array_literal([]), '{}')
+
+    def test_elements_are_quoted_and_escaped(self):
+        self.assertEqual(_array_literal(['a', 'b"c', 'd\\e', None]), '{"a","b\\"c","d\\\\e",NULL}')
+
+    def test_copy_text_escapes_array_literal(self):
+        field = ChunkEmbedding._meta.get_field('tag_ids')
+        self.assertEqual(_copy_text(field, [], connection), '{}')
+        self.assertEqual(_copy_text(field, ['a\tb', 'c\\d'], connection), '{"a\\tb","c\\\\\\\\d"}')
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', '需要PostgreSQL')
+class CopyInsertTests(TestCase):
+    def setUp(self):
+        from apps.document.models import Document, DocumentChunk
+        from apps.knowledge_base.models import KnowledgeBase
+        from apps.users.models import User
+
+        user = User.objects.create_user(email='copy@example.com', username='copy', password=None)
+        knowledge_base = KnowledgeBase.objects.create(name='copy', created_by=user)
+        document = Document.objects.create(
+            knowledge_base=knowledge_base, name='copy', status=StatusChoices.COMPLETED, created_by=user,
+        )
+        self.chunks = [
+            DocumentChunk.objects.create(document=document, knowledge_base=knowledge_base, content=f'c{index}', index=index)
+            for index in range(2)
+        ]
+
+    def test_tag_ids_round_trip(self):
+        tags = [['a', 'b"c', 'd\\e', 'f,g'], []]
+        embeddings = [
+            ChunkEmbedding(
+                chunk=chunk, knowledge_base_id=chunk.knowledge_base_id, model_name='m', dimensions=3,
+                vector=[0.1, 0.2, 0.3], tag_ids=tag_ids,
+            )
+            for chunk, tag_ids in zip(self.chunks, tags)
+        ]
+        self.assertEqual(copy_insert(ChunkEmbedding, embeddings), 2)
+        stored = dict(ChunkEmbedding.objects.values_list('chunk_id', 'tag_ids'))
+        self.assertEqual([stored[chunk.pk] for chunk in self.chunks], tags)
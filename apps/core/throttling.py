@@ -0,0 +1,258 @@
+"""
+接口限流
+
+按调用方的多个维度分别计量：用户（未登录时为IP）、API密钥、用户所在的每个团队，
+普通接口（default）与会调用模型的昂贵接口（expensive，如检索、工作流运行）使用各自独立的预算。
+每个维度是一个令牌桶，一次请求涉及的所有桶在一个Lua脚本中原子地检查并扣减（一次Redis往返），
+任一桶不足时整个请求被拒绝且不扣减任何桶。
+
+APIView 通过 throttle_scope 指定预算，ViewSet 通过 throttle_scopes（action -> 预算）按操作指定，默认为 default。
+BACKEND=local 时只使用进程内令牌桶（测试、单进程部署），Redis不可用时也临时降级为进程内计量。
+"""
+import logging
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from django.conf import settings
+from rest_framework.throttling import BaseThrottle
+
+logger = logging.getLogger('manxiai.core')
+
+KEY_PREFIX = 'manxiai:throttle'
+
+# (键, 容量, 每秒补充量)
+Bucket = Tuple[str, float, float]
+
+
+# KEYS 为各维度的桶，ARGV 依次为每个桶的容量与每秒补充量；使用Redis服务器时间避免各worker时钟偏差。
+# 全部桶都足够时才扣减，返回0；否则返回需要等待的最长秒数
+THROTTLE_SCRIPT = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+local levels = {}
+local wait = 0
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[i * 2 - 1])
+    local rate = tonumber(ARGV[i * 2])
+    local data = redis.call('HMGET', key, 'tokens', 'ts')
+    local tokens = tonumber(data[1]) or capacity
+    local ts = tonumber(data[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+    levels[i] = tokens
+    if tokens < 1 then
+        wait = math.max(wait, (1 - tokens) / rate)
+    end
+end
+if wait > 0 then
+    return tostring(wait)
+end
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[i * 2 - 1])
+    local rate = tonumber(ARGV[i * 2])
+    redis.call('HSET', key, 'tokens', tostring(levels[i] - 1), 'ts', tostring(now))
+    redis.call('EXPIRE', key, math.ceil(capacity / rate) + 1)
+end
+return '0'
+"""
+
+
+def parse_rate(rate: Optional[str]) -> Optional[Tuple[float, float]]:
+    """'600/min' -> (容量600, 每秒补充10)；空值或0表示该维度不限流"""
+    if not rate:
+        return None
+    num, period = rate.split('/')
+    num_requests = int(num)
+    if num_requests <= 0:
+        return None
+    # 与 DRF 的速率格式相同，周期只看首字母（s/m/h/d）
+    duration = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}[period.strip()[0]]
+    return float(num_requests), num_requests / duration
+
+
+class LocalThrottleStore:
+    """
+    进程内令牌桶，语义与 THROTTLE_SCRIPT 相同
+    """
+
+    MAX_KEYS = 10000
+
+    def __init__(self):
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def consume(self, buckets: Sequence[Bucket]) -> float:
+        now = time.monotonic()
+        with self._lock:
+            levels = []
+            wait = 0.0
+            for key, capacity, rate in buckets:
+                tokens, updated = self._buckets.get(key, (capacity, now))
+                tokens = min(capacity, tokens + max(0.0, now - updated) * rate)
+                levels.append(tokens)
+                if tokens < 1:
+                    wait = max(wait, (1 - tokens) / rate)
+            if wait > 0:
+                return wait
+            for (key, _, _), tokens in zip(buckets, levels):
+                self._buckets[key] = (tokens - 1, now)
+            if len(self._buckets) > self.MAX_KEYS:
+                self._prune(now, {key: (capacity, rate) for key, capacity, rate in buckets})
+            return 0.0
+
+    def _prune(self, now: float, rates: Dict[str, Tuple[float, float]]):
+        """丢弃已经补满的桶（与不存在等价）；无法判断速率的按最久未使用丢弃一半"""
+        for key, (tokens, updated) in list(self._buckets.items()):
+            capacity, rate = rates.get(key, (None, None))
+            if capacity is not None and tokens + (now - updated) * rate >= capacity:
+                del self._buckets[key]
+        if len(self._buckets) > self.MAX_KEYS:
+            oldest = sorted(self._buckets, key=lambda key: self._buckets[key][1])
+            for key in oldest[:len(oldest) // 2]:
+                del self._buckets[key]
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class RedisThrottleStore:
+    """
+    Redis中的共享令牌桶，所有worker共用预算；Redis不可用时一段时间内降级为进程内计量
+    """
+
+    RETRY_INTERVAL = 30.0
+
+    def __init__(self, client=None):
+        self._client = client
+        self._script = None
+        self._fallback = LocalThrottleStore()
+        self._retry_at = 0.0
+
+    def _get_script(self):
+        if self._script is None:
+            if self._client is None:
+                from apps.core.redis import get_redis
+                self._client = get_redis()
+            self._script = self._client.register_script(THROTTLE_SCRIPT)
+        return self._script
+
+    def consume(self, buckets: Sequence[Bucket]) -> float:
+        if time.monotonic() < self._retry_at:
+            return self._fallback.consume(buckets)
+        args: List[float] = []
+        for _, capacity, rate in buckets:
+            args.extend((capacity, rate))
+        try:
+            wait = self._get_script()(keys=[key for key, _, _ in buckets], args=args)
+        except Exception as exc:
+            logger.warning('Redis接口限流不可用，%s 秒内降级为进程内限流: %s', self.RETRY_INTERVAL, exc)
+            self._retry_at = time.monotonic() + self.RETRY_INTERVAL
+            return self._fallback.consume(buckets)
+        return float(wait)
+
+    def clear(self):
+        self._fallback.clear()
+
+
+class TeamMembershipCache:
+    """
+    用户所在团队的进程内缓存，避免每个请求查询成员关系（成员变化最多延迟 ttl 秒生效）
+    """
+
+    def __init__(self, ttl: float = 60.0, max_entries: int = 10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: Dict[str, Tuple[float, Tuple[str, ...]]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_pk) -> Tuple[str, ...]:
+        key = str(user_pk)
+        now = time.monotonic()
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > now:
+            return entry[1]
+
+        from apps.users.models import TeamMember
+
+        team_ids = tuple(str(team_id) for team_id in TeamMember.objects.filter(
+            user_id=user_pk,
+        ).values_list('team_id', flat=True))
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                self._entries.clear()
+            self._entries[key] = (now + self.ttl, team_ids)
+        return team_ids
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def build_store():
+    """BACKEND: redis 所有worker共享，local 只在进程内计量，none 不限流"""
+    backend = settings.API_THROTTLE['BACKEND']
+    if backend == 'none':
+        return None
+    if backend == 'redis':
+        return RedisThrottleStore()
+    return LocalThrottleStore()
+
+
+throttle_store = build_store()
+team_membership = TeamMembershipCache(ttl=settings.API_THROTTLE['TEAM_CACHE_TTL'])
+
+
+class ApiThrottle(BaseThrottle):
+    """
+    按 用户/IP、API密钥、团队 分别计量的令牌桶限流
+
+    预算由 settings.API_THROTTLE['RATES'][scope][维度] 配置，如 '600/min'；
+    令牌桶容量即每个周期的请求数，允许短时突发，之后按平均速率补充。
+    """
+    default_scope = 'default'
+
+    def get_scope(self, view) -> str:
+        scopes = getattr(view, 'throttle_scopes', None)
+        action = getattr(view, 'action', None)
+        if scopes and action in scopes:
+            return scopes[action]
+        return getattr(view, 'throttle_scope', None) or self.default_scope
+
+    def get_identities(self, request) -> List[Tuple[str, str]]:
+        from apps.users.models import ApiKey
+
+        user = request.user
+        if not (user and user.is_authenticated):
+            return [('anon', self.get_ident(request))]
+        identities = [('user', str(user.pk))]
+        if isinstance(request.auth, ApiKey):
+            identities.append(('api_key', str(request.auth.pk)))
+        identities.extend(('team', team_id) for team_id in team_membership.get(user.pk))
+        return identities
+
+    def get_buckets(self, request, view) -> List[Bucket]:
+        scope = self.get_scope(view)
+        rates = settings.API_THROTTLE['RATES'].get(scope, {})
+        buckets = []
+        for kind, ident in self.get_identities(request):
+            rate = parse_rate(rates.get(kind))
+            if rate is not None:
+                buckets.append((f'{KEY_PREFIX}:{scope}:{kind}:{ident}', *rate))
+        return buckets
+
+    def allow_request(self, request, view):
+        self.wait_seconds = None
+        if throttle_store is None:
+            return True
+        buckets = self.get_buckets(request, view)
+        if not buckets:
+            return True
+        wait = throttle_store.consume(buckets)
+        if wait > 0:
+            self.wait_seconds = wait
+            return False
+        return True
+
+    def wait(self):
+        return self.wait_seconds
@@ -0,0 +1,124 @@
+"""
+文本分块与分词
+"""
+import hashlib
+import re
+from typing import List
+
+# 按优先级尝试的分隔符：段落、换行、中英文句末标点、空格
+SEPARATORS = ['\n\n', '\n', '。', '！', '？', '. ', '! ', '? ', '；', '; ', '，', ', ', ' ']
+TOKEN_PATTERN = re.compile(r'[一-鿿]|[A-Za-z0-9_]+')
+# 内容锚点：片段哈希对该值取模为0且分块已达半满时提前结束分块，
+# 使分块边界由局部内容决定，文档局部修改后后续分块能重新对齐（便于增量索引）
+ANCHOR_MODULUS = 4
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def _split_recursive(text: str, chunk_size: int, separators: List[str]) -> List[str]:
+    """把文本切成不超过chunk_size的片段，优先在靠前的分隔符处切分"""
+    if len(text) <= chunk_size:
+        return [text]
+    for index, separator in enumerate(separators):
+        if separator not in text:
+            continue
+        pieces = []
+        parts = text.split(separator)
+        for position, part in enumerate(parts):
+            # 保留分隔符，拼接后还原原文
+            if position < len(parts) - 1:
+                part += separator
+            if len(part) > chunk_size:
+                pieces.extend(_split_recursive(part, chunk_size, separators[index + 1:]))
+            elif part:
+                pieces.append(part)
+        return pieces
+    return [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)]
+
+
+def is_anchor(piece: str) -> bool:
+    digest = hashlib.blake2b(piece.encode('utf-8'), digest_size=4).digest()
+    return int.from_bytes(digest, 'big') % ANCHOR_MODULUS == 0
+
+
+def split_text(text: str, chunk_size: int = 1000, chunk_overlap: int = 200) -> List[str]:
+    """
+    将文本切分为带重叠的分块
+    """
+    text = (text or '').strip()
+    if not text:
+        return []
+    chunk_size = max(1, chunk_size)
+    chunk_overlap = max(0, min(chunk_overlap, chunk_size // 2))
+
+    chunks = []
+    current: List[str] = []
+    length = 0
+    # current 中是否有尚未输出过的片段（而不仅是重叠部分）
+    fresh = False
+    for piece in _split_recursive(text, chunk_size, SEPARATORS):
+        if fresh and length + len(piece) > chunk_size:
+            chunks.append(''.join(current).strip())
+            fresh = False
+            # 保留上一块末尾不超过chunk_overlap的完整片段作为重叠
+            while current and length > chunk_overlap:
+                length -= len(current.pop(0))
+        while current and length + len(piece) > chunk_size:
+            length -= len(current.pop(0))
+        current.append(piece)
+        length += len(piece)
+        fresh = True
+        if length >= chunk_size // 2 and is_anchor(piece):
+            chunks.append(''.join(current).strip())
+            fresh = False
+            while current and length > chunk_overlap:
+                length -= len(current.pop(0))
+    if fresh and ''.join(current).strip():
+        chunks.append(''.join(current).strip())
+    return chunks
+
+
+def tokenize_for_search(text: str) -> List[str]:
+    """
+    关键词检索分词，中文使用jieba搜索引擎模式，不可用时按字/词正则切分
+    """
+    text = (text or '').lower()
+    try:
+        import jieba
+    except ImportError:
+        return TOKEN_PATTERN.findall(text)
+    return [token for token in (t.strip() for t in jieba.cut_for_search(text)) if TOKEN_PATTERN.search(token)]
+
+
+class StreamSplitter:
+    """
+    增量分块：文本分段写入，缓冲超过 chunk_size * buffer_factor 后在最后一个段落边界处
+    切出前半部分交给 split_text，不需要先拼出整篇文本（段落边界本就是优先的切分点，
+    仅切出位置前后的分块之间没有重叠）
+    """
+
+    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200, buffer_factor: int = 4):
+        self.chunk_size = max(1, chunk_size)
+        self.chunk_overlap = chunk_overlap
+        self.limit = self.chunk_size * buffer_factor
+        self.buffer = ''
+
+    def feed(self, text: str) -> List[str]:
+        self.buffer += text
+        if len(self.buffer) < self.limit:
+            return []
+        cut = self.buffer.rfind('\n\n')
+        if cut <= 0:
+            cut = self.buffer.rfind('\n')
+        if cut <= 0:
+            if len(self.buffer) < self.limit * 2:
+                return []
+            cut = len(self.buffer)
+        head, self.buffer = self.buffer[:cut], self.buffer[cut:]
+        return split_text(head, self.chunk_size, self.chunk_overlap)
+
+    def close(self) -> List[str]:
+        head, self.buffer = self.buffer, ''
+        return split_text(head, self.chunk_size, self.chunk_overlap)
@@ -1,5 +1,138 @@
 """
-文档管理模型 - 待完善
+文档管理模型
 """
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector
 from django.db import models
-# TODO: 实现文档管理相关模型 
\ No newline at end of file
+from apps.core.models import LIVE, BaseModel, UserRelatedModel, SoftDeleteModel, StatusChoices
+
+
+class Document(UserRelatedModel, SoftDeleteModel):
+    """
+    文档模型
+    """
+    knowledge_base = models.ForeignKey(
+        'knowledge_base.KnowledgeBase',
+        on_delete=models.CASCADE,
+        related_name='documents',
+        verbose_name='知识库'
+    )
+    name = models.CharField(max_length=255, verbose_name='文档名称')
+    file = models.FileField(upload_to='documents/%Y/%m/', blank=True, null=True, verbose_name='文件')
+    file_type = models.CharField(max_length=20, blank=True, default='', verbose_name='文件类型')
+    file_size = models.BigIntegerField(default=0, verbose_name='文件大小(字节)')
+    content_hash = models.CharField(max_length=64, blank=True, default='', verbose_name='内容哈希')
+    status = models.CharField(
+        max_length=20,
+        choices=StatusChoices.choices,
+        default=StatusChoices.PENDING,
+        verbose_name='状态'
+    )
+    chunks_count = models.IntegerField(default=0, verbose_name='分块数量')
+    metadata = models.JSONField(default=dict, blank=True, verbose_name='元数据')
+    tags = models.ManyToManyField(
+        'knowledge_base.KnowledgeBaseTag',
+        blank=True,
+        related_name='documents',
+        verbose_name='标签'
+    )
+    error_message = models.TextField(blank=True, default='', verbose_name='错误信息')
+
+    class Meta:
+        db_table = 'documents'
+        verbose_name = '文档'
+        verbose_name_plural = '文档'
+        ordering = ['-created_at']
+        indexes = [
+            # 上传时按名称查找同名文档、按知识库列出
+            models.Index(fields=['knowledge_base', 'name'], condition=LIVE, name='doc_live_kb_name_idx'),
+        ]
+
+    def __str__(self):
+        return self.name
+
+
+class DocumentChunk(BaseModel):
+    """
+    文档分块模型
+    """
+    # 写入量最大的表之一，主键按时间递增
+    uuid_version = 7
+
+    document = models.ForeignKey(
+        Document,
+        on_delete=models.CASCADE,
+        related_name='chunks',
+        verbose_name='文档'
+    )
+    knowledge_base = models.ForeignKey(
+        'knowledge_base.KnowledgeBase',
+        on_delete=models.CASCADE,
+        related_name='chunks',
+        verbose_name='知识库'
+    )
+    index = models.IntegerField(verbose_name='分块序号')
+    content = models.TextField(verbose_name='分块内容')
+    content_hash = models.CharField(max_length=64, verbose_name='内容哈希')
+    # 分词后以空格连接的文本，用于全文检索表达式索引
+    search_text = models.TextField(blank=True, default='', verbose_name='检索文本')
+    token_count = models.IntegerField(default=0, verbose_name='Token数')
+    metadata = models.JSONField(default=dict, blank=True, verbose_name='元数据')
+
+    class Meta:
+        db_table = 'document_chunks'
+        verbose_name = '文档分块'
+        verbose_name_plural = '文档分块'
+        ordering = ['document', 'index']
+        indexes = [
+            models.Index(fields=['document', 'index']),
+            models.Index(fields=['knowledge_base', 'content_hash']),
+            GinIndex(SearchVector('search_text', config='simple'), name='document_chunks_search_gin'),
+        ]
+
+    def __str__(self):
+        return f"{self.document.name} #{self.index}"
+
+
+class WebSource(UserRelatedModel):
+    """
+    网页数据源：单个网址或站点地图，采集到的每个页面对应知识库中的一个文档
+    """
+    class SourceTypeChoices(models.TextChoices):
+        PAGE = 'page', '网页'
+        SITEMAP = 'sitemap', '站点地图'
+
+    knowledge_base = models.ForeignKey(
+        'knowledge_base.KnowledgeBase',
+        on_delete=models.CASCADE,
+        related_name='web_sources',
+        verbose_name='知识库'
+    )
+    url = models.URLField(max_length=2000, verbose_name='网址')
+    source_type = models.CharField(
+        max_length=20,
+        choices=SourceTypeChoices.choices,
+        default=SourceTypeChoices.PAGE,
+        verbose_name='类型'
+    )
+    max_pages = models.IntegerField(default=500, verbose_name='最大页面数')
+    # 定时重新采集间隔（分钟），为空时只手动采集
+    crawl_interval = models.IntegerField(null=True, blank=True, verbose_name='采集间隔(分钟)')
+    status = models.CharField(
+        max_length=20,
+        choices=StatusChoices.choices,
+        default=StatusChoices.PENDING,
+        verbose_name='状态'
+    )
+    last_crawled_at = models.DateTimeField(null=True, blank=True, verbose_name='最近采集时间')
+    last_result = models.JSONField(default=dict, blank=True, verbose_name='最近采集结果')
+    error_message = models.TextField(blank=True, default='', verbose_name='错误信息')
+
+    class Meta:
+        db_table = 'document_web_sources'
+        verbose_name = '网页数据源'
+        verbose_name_plural = '网页数据源'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return self.url
@@ -0,0 +1,45 @@
+"""
+文档解析：把上传的文件内容转换为纯文本
+"""
+import os
+
+TEXT_FILE_TYPES = ('txt', 'md', 'markdown', 'csv', 'json')
+HTML_FILE_TYPES = ('html', 'htm')
+
+
+class UnsupportedFileType(ValueError):
+    """不支持的文件类型"""
+
+
+def detect_file_type(name: str) -> str:
+    return os.path.splitext(name or '')[1].lstrip('.').lower()
+
+
+def decode_text(content: bytes) -> str:
+    for encoding in ('utf-8-sig', 'gb18030'):
+        try:
+            return content.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    return content.decode('utf-8', errors='replace')
+
+
+def html_to_text(html: str) -> str:
+    import html2text
+
+    converter = html2text.HTML2Text()
+    converter.ignore_images = True
+    converter.body_width = 0
+    return converter.handle(html)
+
+
+def extract_text(content: bytes, file_type: str) -> str:
+    """
+    提取文件文本
+    """
+    file_type = (file_type or '').lower()
+    if file_type in TEXT_FILE_TYPES:
+        return decode_text(content)
+    if file_type in HTML_FILE_TYPES:
+        return html_to_text(decode_text(content))
+    raise UnsupportedFileType(f'不支持的文件类型: {file_type or "未知"}')
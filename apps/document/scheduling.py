@@ -0,0 +1,188 @@
+"""
+定时索引调度
+
+KnowledgeBaseSettings.index_schedule 为5段cron表达式（分 时 日 月 周），
+表示允许执行索引的时间窗口，例如 "* 1-5 * * *" 为每天1点至5点59分。
+设置了计划的知识库，新上传/重新上传的文档保持待处理状态，
+由 Celery beat 每分钟触发的调度任务在窗口内按全局并发预算分批派发。
+"""
+import logging
+from datetime import timedelta
+from typing import TYPE_CHECKING, Dict, List
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from apps.core.models import StatusChoices
+from .models import Document
+
+if TYPE_CHECKING:
+    from celery.schedules import crontab
+
+logger = logging.getLogger('manxiai.document')
+
+
+def parse_schedule(expression: str) -> 'crontab':
+    """解析cron表达式，格式错误时抛出ValueError"""
+    # celery.schedules 会加载整个 Celery 应用，只在校验计划与调度时导入，不拖慢接口进程启动
+    from celery.schedules import ParseException, crontab
+
+    fields = (expression or '').split()
+    if len(fields) != 5:
+        raise ValueError('索引计划需为5段cron表达式: 分 时 日 月 周')
+    minute, hour, day_of_month, month_of_year, day_of_week = fields
+    try:
+        return crontab(
+            minute=minute,
+            hour=hour,
+            day_of_month=day_of_month,
+            month_of_year=month_of_year,
+            day_of_week=day_of_week,
+        )
+    except (ParseException, ValueError) as exc:
+        raise ValueError(f'无效的索引计划: {exc}') from exc
+
+
+def in_window(schedule: 'crontab', now=None) -> bool:
+    """当前（本地时间）所在分钟是否落在计划窗口内"""
+    now = timezone.localtime(now)
+    return (
+        now.minute in schedule.minute
+        and now.hour in schedule.hour
+        and now.day in schedule.day_of_month
+        and now.month in schedule.month_of_year
+        and now.isoweekday() % 7 in schedule.day_of_week
+    )
+
+
+def open_knowledge_bases(now=None) -> List:
+    """当前处于索引窗口内的知识库ID"""
+    from apps.knowledge_base.models import KnowledgeBaseSettings
+
+    rows = KnowledgeBaseSettings.objects.filter(
+        auto_index=True, knowledge_base__is_deleted=False
+    ).exclude(index_schedule__isnull=True).exclude(index_schedule='').values_list(
+        'knowledge_base_id', 'index_schedule'
+    )
+    open_ids = []
+    for knowledge_base_id, expression in rows:
+        try:
+            if in_window(parse_schedule(expression), now):
+                open_ids.append(knowledge_base_id)
+        except ValueError:
+            logger.warning('知识库 %s 的索引计划无效: %s', knowledge_base_id, expression)
+    return open_ids
+
+
+def _active_documents():
+    # exclude(file='') 不排除 NULL
+    return Document.objects.filter(knowledge_base__is_deleted=False, file__isnull=False).exclude(file='')
+
+
+# 与 services.index_mode 一致：没有设置，或开启自动索引且未设置计划的知识库上传后立即索引
+IMMEDIATE_MODE = Q(knowledge_base__settings__isnull=True) | Q(
+    Q(knowledge_base__settings__index_schedule__isnull=True) | Q(knowledge_base__settings__index_schedule=''),
+    knowledge_base__settings__auto_index=True,
+)
+
+
+def requeue_stale(now=None) -> int:
+    """
+    处理中超时（worker异常退出等）的文档重新处理，返回数量
+
+    立即索引的知识库没有调度器派发待处理文档，直接重新提交索引任务；
+    其余的重新置为待处理，由调度器在窗口内派发或等待手动索引。
+    """
+    from .tasks import index_document_task
+
+    now = now or timezone.now()
+    stale_before = now - timedelta(seconds=settings.INDEX_SCHEDULER['STALE_AFTER'])
+    stale = _active_documents().filter(status=StatusChoices.PROCESSING, updated_at__lt=stale_before)
+    with transaction.atomic():
+        redispatch = list(
+            stale.filter(IMMEDIATE_MODE).select_for_update(skip_locked=True, of=('self',)).values_list(
+                'id', flat=True
+            )
+        )
+        Document.objects.filter(id__in=redispatch).update(updated_at=now)
+        for document_id in redispatch:
+            transaction.on_commit(lambda document_id=document_id: index_document_task.delay(str(document_id)))
+    requeued = stale.exclude(IMMEDIATE_MODE).update(status=StatusChoices.PENDING, updated_at=now)
+    return len(redispatch) + requeued
+
+
+def dispatch_scheduled(now=None) -> Dict:
+    """
+    为处于窗口内的知识库派发待处理文档，返回派发数量与积压情况
+
+    全局并发预算 = MAX_CONCURRENCY - 处理中的文档数；各知识库轮流取最早的待处理文档。
+    """
+    from .tasks import index_document_task
+
+    requeue_stale(now)
+    open_ids = open_knowledge_bases(now)
+    budget = settings.INDEX_SCHEDULER['MAX_CONCURRENCY'] - _active_documents().filter(
+        status=StatusChoices.PROCESSING
+    ).count()
+
+    dispatched = []
+    if open_ids and budget > 0:
+        with transaction.atomic():
+            pending = list(
+                _active_documents().filter(
+                    knowledge_base_id__in=open_ids, status=StatusChoices.PENDING
+                ).select_for_update(skip_locked=True, of=('self',)).order_by('updated_at').values_list(
+                    'id', 'knowledge_base_id'
+                )[:budget * 4]
+            )
+            queues: Dict = {}
+            for document_id, knowledge_base_id in pending:
+                queues.setdefault(knowledge_base_id, []).append(document_id)
+            while len(dispatched) < budget and any(queues.values()):
+                for queue in queues.values():
+                    if queue and len(dispatched) < budget:
+                        dispatched.append(queue.pop(0))
+            Document.objects.filter(id__in=dispatched).update(
+                status=StatusChoices.PROCESSING, updated_at=timezone.now()
+            )
+            for document_id in dispatched:
+                transaction.on_commit(
+                    lambda document_id=document_id: index_document_task.delay(str(document_id))
+                )
+
+    report = backlog()
+    report.update({'dispatched': len(dispatched), 'open_knowledge_bases': len(open_ids)})
+    if dispatched or report['pending_documents']:
+        logger.info('定时索引: 派发 %s 个文档，积压 %s 个(%s 字节)',
+                    len(dispatched), report['pending_documents'], report['pending_bytes'])
+    return report
+
+
+def backlog(knowledge_base_ids=None) -> Dict:
+    """待索引积压：总数、字节数与按知识库明细"""
+    queryset = _active_documents().filter(status__in=[StatusChoices.PENDING, StatusChoices.PROCESSING])
+    if knowledge_base_ids is not None:
+        queryset = queryset.filter(knowledge_base_id__in=knowledge_base_ids)
+    rows = queryset.values('knowledge_base_id', 'knowledge_base__name').annotate(
+        pending=Count('id', filter=Q(status=StatusChoices.PENDING)),
+        processing=Count('id', filter=Q(status=StatusChoices.PROCESSING)),
+        pending_bytes=Sum('file_size', filter=Q(status=StatusChoices.PENDING)),
+    ).order_by('-pending')
+    knowledge_bases = [
+        {
+            'knowledge_base': str(row['knowledge_base_id']),
+            'name': row['knowledge_base__name'],
+            'pending': row['pending'],
+            'processing': row['processing'],
+            'pending_bytes': row['pending_bytes'] or 0,
+        }
+        for row in rows
+    ]
+    return {
+        'pending_documents': sum(item['pending'] for item in knowledge_bases),
+        'processing_documents': sum(item['processing'] for item in knowledge_bases),
+        'pending_bytes': sum(item['pending_bytes'] for item in knowledge_bases),
+        'knowledge_bases': knowledge_bases,
+    }
@@ -0,0 +1,75 @@
+"""
+文档管理序列化器
+"""
+from rest_framework import serializers
+from .models import Document, WebSource
+
+
+class DocumentSerializer(serializers.ModelSerializer):
+    """
+    文档序列化器
+    """
+    created_by_name = serializers.CharField(source='created_by.username', read_only=True)
+    tags = serializers.SlugRelatedField(slug_field='name', many=True, read_only=True)
+
+    class Meta:
+        model = Document
+        fields = [
+            'id', 'knowledge_base', 'name', 'file', 'file_type', 'file_size', 'content_hash',
+            'status', 'chunks_count', 'metadata', 'tags', 'error_message',
+            'created_by', 'created_by_name', 'created_at', 'updated_at'
+        ]
+        read_only_fields = fields
+
+
+class DocumentUploadSerializer(serializers.Serializer):
+    """
+    文档上传序列化器，同名文档视为重新上传
+    """
+    knowledge_base = serializers.UUIDField()
+    file = serializers.FileField()
+    name = serializers.CharField(max_length=255, required=False, allow_blank=True)
+
+
+class DocumentTagsSerializer(serializers.Serializer):
+    """
+    文档标签设置序列化器
+    """
+    tags = serializers.ListField(child=serializers.CharField(max_length=50), allow_empty=True)
+
+
+class WebSourceSerializer(serializers.ModelSerializer):
+    """
+    网页数据源序列化器
+    """
+
+    class Meta:
+        model = WebSource
+        fields = [
+            'id', 'knowledge_base', 'url', 'source_type', 'max_pages', 'crawl_interval',
+            'status', 'last_crawled_at', 'last_result', 'error_message',
+            'created_by', 'created_at', 'updated_at'
+        ]
+        read_only_fields = [
+            'id', 'status', 'last_crawled_at', 'last_result', 'error_message',
+            'created_by', 'created_at', 'updated_at'
+        ]
+
+    def validate_url(self, value):
+        from .web import UnsafeUrlError, validate_url
+
+        try:
+            validate_url(value)
+        except UnsafeUrlError as exc:
+            raise serializers.ValidationError(str(exc))
+        return value
+
+    def validate_max_pages(self, value):
+        if value < 1 or value > 10000:
+            raise serializers.ValidationError('最大页面数应在1到10000之间')
+        return value
+
+    def validate_crawl_interval(self, value):
+        if value is not None and value < 60:
+            raise serializers.ValidationError('采集间隔不能小于60分钟')
+        return value
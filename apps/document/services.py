@@ -0,0 +1,444 @@
+"""
+文档处理服务：分块、向量化与入库
+"""
+import hashlib
+import logging
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.utils import timezone
+
+from apps.core.bulk import copy_insert
+from apps.core.models import StatusChoices
+from apps.model_management.limits import estimate_tokens
+from .chunking import content_hash, split_text, tokenize_for_search
+from .models import Document, DocumentChunk
+from .parsers import detect_file_type, extract_text
+from .spreadsheets import SPREADSHEET_FILE_TYPES, iter_row_windows, iter_sheet_rows, validate_spreadsheet
+
+EMBEDDING_BATCH_SIZE = 64
+# 流式索引时每批向量化并写入的分块数
+STREAM_BATCH_SIZE = 256
+
+logger = logging.getLogger('manxiai.document')
+
+
+def build_chunks(document: Document, pieces: Iterable[str], start_index: int = 0,
+                 metadata: Optional[Dict] = None) -> List[DocumentChunk]:
+    """
+    构建（未保存的）分块对象
+    """
+    return [
+        DocumentChunk(
+            document=document,
+            knowledge_base_id=document.knowledge_base_id,
+            index=start_index + offset,
+            content=piece,
+            content_hash=content_hash(piece),
+            search_text=' '.join(tokenize_for_search(piece)),
+            token_count=estimate_tokens(piece),
+            metadata=dict(metadata or {}),
+        )
+        for offset, piece in enumerate(pieces)
+    ]
+
+
+def embed_chunks(knowledge_base, chunks: List[DocumentChunk], batch_size: int = EMBEDDING_BATCH_SIZE):
+    """
+    为分块批量生成向量，返回（未保存的）ChunkEmbedding列表
+
+    知识库正在重新向量化时，同时生成目标模型的影子向量（双写）。
+    """
+    from apps.embedding.search import get_search_settings
+    from apps.embedding.services import active_embedding_model, shadow_embedding_models
+
+    if not chunks:
+        return []
+    models = [active_embedding_model(knowledge_base)] + shadow_embedding_models(knowledge_base)
+    mode, _ = get_search_settings(knowledge_base)
+    return _embed_with(models, chunks, mode, batch_size)
+
+
+def _embed_with(models, chunks: List[DocumentChunk], mode: str, batch_size: int = EMBEDDING_BATCH_SIZE):
+    from apps.embedding.services import build_embedding
+
+    embeddings = []
+    for model in models:
+        for start in range(0, len(chunks), batch_size):
+            batch = chunks[start:start + batch_size]
+            vectors = model.embed([chunk.content for chunk in batch])
+            embeddings.extend(
+                build_embedding(chunk, vector, model.name, mode) for chunk, vector in zip(batch, vectors)
+            )
+    return embeddings
+
+
+def _lock_settings_shared(knowledge_base_id):
+    """
+    以共享锁锁定知识库设置行：写入之间互不阻塞，与切换向量模型、量化方式时的排他锁（select_for_update）互斥
+    """
+    from django.db import connections, router
+    from apps.knowledge_base.models import KnowledgeBaseSettings
+
+    connection = connections[router.db_for_write(KnowledgeBaseSettings)]
+    if connection.vendor != 'postgresql':
+        return
+    table = connection.ops.quote_name(KnowledgeBaseSettings._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT 1 FROM {table} WHERE knowledge_base_id = %s FOR SHARE', [knowledge_base_id])
+
+
+def reconcile_embeddings(chunks: List[DocumentChunk], embeddings):
+    """
+    在写入分块的事务内按锁定后的知识库设置校正事务外生成的向量，返回实际写入的向量
+
+    向量化期间可能切换了生效模型或量化方式（重新向量化、重新编码任务）：补齐当前生效模型与
+    进行中任务目标模型缺少的向量，丢弃已切换掉的模型的向量（否则在清理旧向量之后写入会残留），
+    量化方式不一致的按当前方式重新编码。切换在排他锁内完成，持有共享锁期间不会再变化。
+    """
+    from django.conf import settings
+    from apps.embedding import quantization
+    from apps.embedding.services import resolve_embedding_model
+    from apps.embedding.models import ReembedJob
+    from apps.knowledge_base.models import KnowledgeBaseSettings
+
+    if not chunks:
+        return embeddings
+    knowledge_base_id = chunks[0].knowledge_base_id
+    _lock_settings_shared(knowledge_base_id)
+    row = KnowledgeBaseSettings.objects.filter(knowledge_base_id=knowledge_base_id).values_list(
+        'embedding_model', 'embedding_dimensions', 'vector_quantization', 'active_quantization'
+    ).first()
+    if row is None or not row[0]:
+        return embeddings
+    model_name, dimensions, vector_quantization, active_quantization = row
+    mode = active_quantization or vector_quantization
+    required = {(model_name, dimensions or settings.EMBEDDING_DIMENSIONS)} | set(
+        ReembedJob.objects.filter(
+            knowledge_base_id=knowledge_base_id, status=StatusChoices.PROCESSING
+        ).values_list('target_model', 'target_dimensions')
+    )
+
+    kept = [embedding for embedding in embeddings if (embedding.model_name, embedding.dimensions) in required]
+    for embedding in kept:
+        if embedding.quantization != mode:
+            embedding.quantization = mode
+            embedding.quantized = quantization.encode_for_storage(embedding.vector, mode)
+    missing = required - {(embedding.model_name, embedding.dimensions) for embedding in kept}
+    if missing:
+        logger.info('知识库 %s 的向量模型在向量化期间已切换，补齐 %s 的向量', knowledge_base_id, sorted(missing))
+        kept.extend(_embed_with(
+            [resolve_embedding_model(name, dims) for name, dims in sorted(missing)], chunks, mode
+        ))
+    return kept
+
+
+def save_chunks(chunks: List[DocumentChunk], embeddings) -> int:
+    """
+    在同一事务内写入分块及其向量（PostgreSQL下使用COPY），返回写入行数
+    """
+    from apps.embedding.models import ChunkEmbedding
+    from apps.embedding.search import bump_embeddings_version
+
+    started = time.perf_counter()
+    with transaction.atomic():
+        embeddings = reconcile_embeddings(chunks, embeddings)
+        rows = copy_insert(DocumentChunk, chunks) + copy_insert(ChunkEmbedding, embeddings)
+        for knowledge_base_id in {embedding.knowledge_base_id for embedding in embeddings}:
+            bump_embeddings_version(knowledge_base_id)
+    elapsed = time.perf_counter() - started
+    if rows:
+        logger.info('写入 %s 行分块/向量，耗时 %.3fs (%.0f 行/秒)', rows, elapsed, rows / max(elapsed, 1e-9))
+    return rows
+
+
+@dataclass
+class ChunkDiff:
+    """增量索引结果"""
+    added: int = 0
+    removed: int = 0
+    unchanged: int = 0
+
+    def to_dict(self):
+        return {'added': self.added, 'removed': self.removed, 'unchanged': self.unchanged}
+
+
+def _existing_chunks(document: Document) -> Dict[str, List]:
+    """已有分块按内容哈希分组：{hash: [(id, index, metadata), ...]}"""
+    existing: Dict[str, List] = {}
+    for chunk_id, index, chunk_hash, metadata in document.chunks.order_by('index').values_list(
+        'id', 'index', 'content_hash', 'metadata'
+    ):
+        existing.setdefault(chunk_hash, []).append((chunk_id, index, metadata))
+    return existing
+
+
+def sync_document_chunks(document: Document, pieces: List[str]) -> ChunkDiff:
+    """
+    按分块内容哈希与已有分块比对，只为新增分块生成向量，删除消失的分块，
+    内容未变的分块保留（包括向量），仅在位置变化时更新序号
+
+    向量化在事务外完成，分块变更与文档本身在同一事务内保存。
+    """
+    from apps.embedding.search import bump_embeddings_version
+
+    existing = _existing_chunks(document)
+    moved = []
+    chunks = []
+    unchanged = 0
+    for index, piece in enumerate(pieces):
+        matches = existing.get(content_hash(piece))
+        if matches:
+            chunk_id, old_index, _ = matches.pop(0)
+            unchanged += 1
+            if old_index != index:
+                moved.append(DocumentChunk(id=chunk_id, index=index))
+        else:
+            chunks.extend(build_chunks(document, [piece], start_index=index))
+    removed = [chunk_id for matches in existing.values() for chunk_id, _, _ in matches]
+
+    embeddings = embed_chunks(document.knowledge_base, chunks)
+    with transaction.atomic():
+        if removed:
+            DocumentChunk.objects.filter(id__in=removed).delete()
+            bump_embeddings_version(document.knowledge_base_id)
+        if moved:
+            DocumentChunk.objects.bulk_update(moved, ['index'])
+        save_chunks(chunks, embeddings)
+        document.chunks_count = len(pieces)
+        document.save()
+    return ChunkDiff(added=len(chunks), removed=len(removed), unchanged=unchanged)
+
+
+def _refresh_embedding_metadata(document: Document, chunks: List[DocumentChunk]) -> int:
+    """分块元数据变化后同步其向量上冗余的元数据（文档元数据与分块元数据合并）"""
+    from apps.embedding.filters import filter_attributes
+    from apps.embedding.models import ChunkEmbedding
+
+    chunk_metadata = {chunk.id: chunk.metadata for chunk in chunks}
+    embeddings = list(ChunkEmbedding.objects.filter(chunk_id__in=chunk_metadata).only('id', 'chunk_id'))
+    now = timezone.now()
+    for embedding in embeddings:
+        embedding.metadata = filter_attributes(document, chunk_metadata[embedding.chunk_id])['metadata']
+        embedding.updated_at = now
+    ChunkEmbedding.objects.bulk_update(embeddings, ['metadata', 'updated_at'], batch_size=500)
+    return len(embeddings)
+
+
+def sync_document_chunk_stream(document: Document, pieces: Iterable[Tuple[str, Dict]],
+                               batch_size: int = STREAM_BATCH_SIZE) -> ChunkDiff:
+    """
+    流式版本的 sync_document_chunks，pieces 为 (内容, 分块元数据) 的迭代器
+
+    每 batch_size 个分块向量化并写入一次，内存占用只与批大小有关；
+    消失的分块在全部写入后删除，期间检索可能同时命中新旧分块。
+    """
+    from apps.embedding.search import bump_embeddings_version
+
+    existing = _existing_chunks(document)
+    diff = ChunkDiff()
+    total = 0
+    batch = []
+
+    def write(batch):
+        moved = []
+        retagged = []
+        chunks = []
+        for index, piece, metadata in batch:
+            matches = existing.get(content_hash(piece))
+            if matches:
+                chunk_id, old_index, old_metadata = matches.pop(0)
+                diff.unchanged += 1
+                if old_index != index or old_metadata != metadata:
+                    moved.append(DocumentChunk(id=chunk_id, index=index, metadata=metadata))
+                if old_metadata != metadata:
+                    retagged.append(moved[-1])
+            else:
+                chunks.extend(build_chunks(document, [piece], start_index=index, metadata=metadata))
+        embeddings = embed_chunks(document.knowledge_base, chunks)
+        with transaction.atomic():
+            if moved:
+                DocumentChunk.objects.bulk_update(moved, ['index', 'metadata'])
+            if retagged:
+                _refresh_embedding_metadata(document, retagged)
+            save_chunks(chunks, embeddings)
+        diff.added += len(chunks)
+
+    for piece, metadata in pieces:
+        batch.append((total, piece, metadata))
+        total += 1
+        if len(batch) >= batch_size:
+            write(batch)
+            batch = []
+    if batch:
+        write(batch)
+
+    removed = [chunk_id for matches in existing.values() for chunk_id, _, _ in matches]
+    with transaction.atomic():
+        for start in range(0, len(removed), STREAM_BATCH_SIZE):
+            DocumentChunk.objects.filter(id__in=removed[start:start + STREAM_BATCH_SIZE]).delete()
+        if removed:
+            bump_embeddings_version(document.knowledge_base_id)
+        document.chunks_count = total
+        document.save()
+    diff.removed = len(removed)
+    return diff
+
+
+def index_spreadsheet(document: Document) -> Document:
+    """
+    流式索引表格文档：逐行读取，按行窗口分块（每块带表头），边读边向量化写入
+    """
+    knowledge_base = document.knowledge_base
+    digest = hashlib.sha256()
+
+    def pieces(fp):
+        rows = iter_sheet_rows(fp, document.file_type)
+        for window in iter_row_windows(rows, knowledge_base.chunk_size):
+            digest.update(window.text.encode('utf-8'))
+            digest.update(b'\n')
+            yield window.text, window.metadata
+        # 迭代结束后、文档保存前写入内容哈希
+        document.content_hash = digest.hexdigest()
+
+    try:
+        document.status = StatusChoices.COMPLETED
+        document.error_message = ''
+        with document.file.open('rb') as fp:
+            diff = sync_document_chunk_stream(document, pieces(fp))
+    except Exception as exc:
+        document.status = StatusChoices.FAILED
+        document.error_message = str(exc)
+        document.save(update_fields=['status', 'error_message', 'updated_at'])
+        raise
+    logger.info('表格文档 %s 索引完成: %s', document.id, diff.to_dict())
+    return document
+
+
+def index_document_text(document: Document, text: str) -> Document:
+    """
+    对文档文本分块、向量化并入库
+
+    已有分块时增量更新：只有内容变化的分块会重新向量化。
+    """
+    knowledge_base = document.knowledge_base
+    try:
+        pieces = split_text(text, knowledge_base.chunk_size, knowledge_base.chunk_overlap)
+        document.content_hash = content_hash(text)
+        document.status = StatusChoices.COMPLETED
+        document.error_message = ''
+        diff = sync_document_chunks(document, pieces)
+    except Exception as exc:
+        document.status = StatusChoices.FAILED
+        document.error_message = str(exc)
+        document.save(update_fields=['status', 'error_message', 'updated_at'])
+        raise
+    logger.info('文档 %s 索引完成: %s', document.id, diff.to_dict())
+    return document
+
+
+def ingest_text(knowledge_base, name: str, text: str, created_by,
+                file_type: str = 'txt', metadata: Optional[Dict] = None) -> Document:
+    """
+    以纯文本创建文档并完成索引
+    """
+    document = Document.objects.create(
+        knowledge_base=knowledge_base,
+        name=name,
+        file_type=file_type,
+        file_size=len(text.encode('utf-8')),
+        status=StatusChoices.PROCESSING,
+        metadata=metadata or {},
+        created_by=created_by,
+    )
+    return index_document_text(document, text)
+
+
+def index_mode(knowledge_base) -> str:
+    """
+    文档上传后的索引方式：immediate 立即索引，scheduled 等待计划窗口，manual 手动索引
+    """
+    from apps.knowledge_base.models import KnowledgeBaseSettings
+
+    row = KnowledgeBaseSettings.objects.filter(
+        knowledge_base=knowledge_base
+    ).values_list('auto_index', 'index_schedule').first()
+    if row is None:
+        return 'immediate'
+    auto_index, schedule = row
+    if not auto_index:
+        return 'manual'
+    return 'scheduled' if schedule else 'immediate'
+
+
+def index_document(document: Document) -> Document:
+    """
+    解析文档文件并（增量）索引，表格文档流式处理
+    """
+    if document.file_type in SPREADSHEET_FILE_TYPES:
+        return index_spreadsheet(document)
+    with document.file.open('rb') as fp:
+        text = extract_text(fp.read(), document.file_type)
+    return index_document_text(document, text)
+
+
+def upload_document(knowledge_base, name: str, content: bytes, created_by,
+                    file_type: Optional[str] = None) -> Document:
+    """
+    上传文档；同一知识库中同名文档视为重新上传，内容变化时按分块差异增量索引
+
+    开启自动索引且未设置索引计划时立即提交后台任务，否则保持待处理状态等待定时或手动索引。
+    """
+    from .tasks import index_document_task
+
+    file_type = file_type or detect_file_type(name)
+    # 先解析一次，尽早拒绝不支持或损坏的文件
+    if file_type in SPREADSHEET_FILE_TYPES:
+        validate_spreadsheet(content, file_type)
+    else:
+        extract_text(content, file_type)
+    digest = hashlib.sha256(content).hexdigest()
+
+    document = Document.objects.filter(knowledge_base=knowledge_base, name=name).first()
+    if document is not None and document.metadata.get('file_hash') == digest \
+            and document.status == StatusChoices.COMPLETED:
+        return document
+    if document is None:
+        document = Document(knowledge_base=knowledge_base, name=name, created_by=created_by)
+    elif document.file:
+        document.file.delete(save=False)
+    document.file_type = file_type
+    document.file_size = len(content)
+    document.metadata = {**document.metadata, 'file_hash': digest}
+    immediate = index_mode(knowledge_base) == 'immediate'
+    document.status = StatusChoices.PROCESSING if immediate else StatusChoices.PENDING
+    document.error_message = ''
+    document.file.save(name, ContentFile(content), save=False)
+    document.save()
+
+    if immediate:
+        transaction.on_commit(lambda: index_document_task.delay(str(document.id)))
+    return document
+
+
+def set_document_tags(document: Document, names: List[str]) -> Document:
+    """
+    设置文档标签（知识库中不存在的标签自动创建），并同步到向量的过滤字段
+    """
+    from apps.embedding.services import refresh_filter_attributes
+    from apps.knowledge_base.models import KnowledgeBase, KnowledgeBaseTag
+
+    with transaction.atomic():
+        results = [
+            KnowledgeBaseTag.objects.get_or_create(knowledge_base_id=document.knowledge_base_id, name=name)
+            for name in dict.fromkeys(names)
+        ]
+        if any(created for _, created in results):
+            # 标签列表属于知识库详情，与 add_tag 一样更新 updated_at 使详情的 ETag/Last-Modified 失效
+            KnowledgeBase.objects.filter(pk=document.knowledge_base_id).update(updated_at=timezone.now())
+        document.tags.set([tag for tag, _ in results])
+        refresh_filter_attributes(document)
+    return document
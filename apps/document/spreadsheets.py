@@ -0,0 +1,226 @@
+"""
+表格文档（CSV/TSV/Excel）流式解析
+
+逐行读取（csv 迭代器、基于 openpyxl 的流式XML解析、xlrd 按需加载工作表），按行窗口分块，
+每个分块都带上工作表名与表头，整个表格不会一次性读入内存，峰值内存与表格行数无关。
+"""
+import codecs
+import csv
+import io
+from dataclasses import dataclass, field
+from datetime import date, datetime, time
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .chunking import is_anchor
+
+CSV_FILE_TYPES = ('csv', 'tsv')
+EXCEL_FILE_TYPES = ('xlsx', 'xlsm', 'xls')
+SPREADSHEET_FILE_TYPES = CSV_FILE_TYPES + EXCEL_FILE_TYPES
+# 判断CSV编码时读取的字节数
+ENCODING_SAMPLE_SIZE = 64 * 1024
+CELL_SEPARATOR = ' | '
+
+# (工作表名, 行号(从1开始), 单元格值)
+SheetRow = Tuple[str, int, tuple]
+
+
+@dataclass
+class RowWindow:
+    """一个行窗口分块"""
+    sheet: str
+    row_start: int
+    row_end: int
+    text: str
+    metadata: Dict = field(default_factory=dict)
+
+
+def _detect_encoding(fileobj) -> str:
+    sample = fileobj.read(ENCODING_SAMPLE_SIZE)
+    fileobj.seek(0)
+    # 增量解码器不会因样本末尾被截断的多字节字符报错
+    try:
+        codecs.getincrementaldecoder('utf-8')().decode(sample)
+        return 'utf-8-sig'
+    except UnicodeDecodeError:
+        return 'gb18030'
+
+
+def _csv_rows(fileobj, file_type: str) -> Iterator[SheetRow]:
+    text = io.TextIOWrapper(fileobj, encoding=_detect_encoding(fileobj), errors='replace', newline='')
+    try:
+        reader = csv.reader(text, delimiter='\t' if file_type == 'tsv' else ',')
+        for number, row in enumerate(reader, 1):
+            yield '', number, tuple(row)
+    finally:
+        # 不关闭底层文件，由调用方负责
+        text.detach()
+
+
+def _xlsx_sheet_rows(source, title: str, reader) -> Iterator[SheetRow]:
+    """
+    逐行解析一个工作表的XML
+
+    openpyxl 自带的行解析会把 clear() 后的行元素留在 sheetData 节点下，内存随行数线性增长；
+    这里复用其单元格解析（共享字符串、日期格式），但只处理行，并把处理完的行从父节点移除。
+    """
+    from openpyxl.worksheet._reader import ROW_TAG, WorkSheetParser
+    from openpyxl.xml.constants import SHEET_MAIN_NS
+    from openpyxl.xml.functions import iterparse
+
+    sheet_data_tag = '{%s}sheetData' % SHEET_MAIN_NS
+    parser = WorkSheetParser(source, reader.shared_strings, data_only=True,
+                             epoch=reader.wb.epoch, date_formats=reader.wb._date_formats)
+    sheet_data = None
+    for event, element in iterparse(source, events=('start', 'end')):
+        if event == 'start':
+            if element.tag == sheet_data_tag:
+                sheet_data = element
+            continue
+        if element.tag != ROW_TAG:
+            continue
+        number, cells = parser.parse_row(element)
+        if sheet_data is not None:
+            sheet_data.remove(element)
+        values = [None] * max((cell['column'] for cell in cells), default=0)
+        for cell in cells:
+            values[cell['column'] - 1] = cell['value']
+        yield title, number, tuple(values)
+
+
+def _xlsx_rows(fileobj) -> Iterator[SheetRow]:
+    """
+    不使用 load_workbook(read_only=True)：工作表缺少 dimension 元素时（如 write_only 生成的文件），
+    它在打开时会完整解析一遍工作表来计算尺寸。这里只读取共享字符串与样式，
+    再逐个工作表流式解析。依赖 openpyxl 3.1 的内部接口（版本已在 requirements.txt 固定）。
+    """
+    from openpyxl.reader.excel import ExcelReader
+    from openpyxl.styles.stylesheet import apply_stylesheet
+
+    reader = ExcelReader(fileobj, read_only=True, data_only=True)
+    try:
+        reader.read_manifest()
+        reader.read_strings()
+        reader.read_workbook()
+        apply_stylesheet(reader.archive, reader.wb)
+        for sheet, rel in reader.parser.find_sheets():
+            if rel.target not in reader.valid_files or 'chartsheet' in rel.Type:
+                continue
+            with reader.archive.open(rel.target) as source:
+                yield from _xlsx_sheet_rows(source, sheet.name, reader)
+    finally:
+        reader.archive.close()
+
+
+def _xls_rows(fileobj) -> Iterator[SheetRow]:
+    import xlrd
+
+    # xls 为二进制格式（最多65536行），按需加载工作表，读完即释放
+    workbook = xlrd.open_workbook(file_contents=fileobj.read(), on_demand=True)
+    try:
+        for index in range(workbook.nsheets):
+            sheet = workbook.sheet_by_index(index)
+            for number in range(sheet.nrows):
+                yield sheet.name, number + 1, tuple(sheet.row_values(number))
+            workbook.unload_sheet(index)
+    finally:
+        workbook.release_resources()
+
+
+def iter_sheet_rows(fileobj, file_type: str) -> Iterator[SheetRow]:
+    """
+    逐行读取表格，fileobj 需以二进制方式打开且可seek
+    """
+    file_type = (file_type or '').lower()
+    if file_type in CSV_FILE_TYPES:
+        return _csv_rows(fileobj, file_type)
+    if file_type == 'xls':
+        return _xls_rows(fileobj)
+    return _xlsx_rows(fileobj)
+
+
+def format_cell(value) -> str:
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    if isinstance(value, datetime) and value.time() == time():
+        # Excel 日期单元格读出为零点的datetime
+        return value.date().isoformat()
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    return ' '.join(str(value).split())
+
+
+def _trim(cells: List[str]) -> List[str]:
+    while cells and not cells[-1]:
+        cells.pop()
+    return cells
+
+
+def iter_row_windows(rows: Iterable[SheetRow], chunk_size: int = 1000,
+                     max_rows: Optional[int] = None) -> Iterator[RowWindow]:
+    """
+    把行流按窗口组成分块：每个工作表第一个非空行作为表头，
+    每个分块以 工作表名 + 表头 开头，其后为若干完整数据行（行不会被截断）
+    """
+    chunk_size = max(1, chunk_size)
+    sheet = None
+    prefix = ''
+    header: List[str] = []
+    lines: List[str] = []
+    size = 0
+    row_start = row_end = 0
+
+    def flush():
+        return RowWindow(
+            sheet=sheet,
+            row_start=row_start,
+            row_end=row_end,
+            text=prefix + '\n'.join(lines),
+            metadata={'sheet': sheet, 'row_start': row_start, 'row_end': row_end},
+        )
+
+    for sheet_name, number, values in rows:
+        if sheet_name != sheet:
+            if lines:
+                yield flush()
+            sheet, header, lines, size = sheet_name, [], [], 0
+        cells = _trim([format_cell(value) for value in values])
+        if not cells:
+            continue
+        if not header:
+            header = [cell or f'列{index + 1}' for index, cell in enumerate(cells)]
+            title = f'工作表: {sheet}\n' if sheet else ''
+            prefix = title + CELL_SEPARATOR.join(header) + '\n'
+            continue
+        line = CELL_SEPARATOR.join(cells)
+        if lines and (len(prefix) + size + len(line) > chunk_size or (max_rows and len(lines) >= max_rows)):
+            yield flush()
+            lines, size = [], 0
+        if not lines:
+            row_start = number
+        lines.append(line)
+        size += len(line) + 1
+        row_end = number
+        # 与 split_text 相同的内容锚点：插入/删除行后，后续窗口边界能重新对齐，增量索引只需重算附近的分块
+        if len(prefix) + size >= chunk_size // 2 and is_anchor(line):
+            yield flush()
+            lines, size = [], 0
+    if lines:
+        yield flush()
+
+
+def validate_spreadsheet(content: bytes, file_type: str):
+    """读取第一行，尽早拒绝损坏的表格文件"""
+    from .parsers import UnsupportedFileType
+
+    rows = iter_sheet_rows(io.BytesIO(content), file_type)
+    try:
+        next(rows, None)
+    except ImportError:
+        # 缺少解析依赖属于部署问题，不作为文件错误
+        raise
+    except Exception as exc:
+        raise UnsupportedFileType(f'无法解析表格文件: {exc}') from exc
+    finally:
+        rows.close()
@@ -0,0 +1,51 @@
+"""
+文档处理异步任务
+"""
+from celery import shared_task
+
+
+@shared_task
+def index_document_task(document_id):
+    """解析并增量索引文档"""
+    from .models import Document
+    from .services import index_document
+
+    document = Document.objects.select_related('knowledge_base').filter(id=document_id).first()
+    if document is None or not document.file:
+        return None
+    index_document(document)
+    return document.chunks_count
+
+
+@shared_task
+def dispatch_scheduled_indexing():
+    """由 Celery beat 每分钟触发，在计划窗口内派发待处理文档"""
+    from .scheduling import dispatch_scheduled
+
+    report = dispatch_scheduled()
+    return {key: report[key] for key in ('dispatched', 'pending_documents', 'processing_documents')}
+
+
+@shared_task
+def crawl_web_source_task(source_id):
+    """采集网页数据源"""
+    from .models import WebSource
+    from .web import crawl_web_source
+
+    source = WebSource.objects.select_related('knowledge_base').filter(
+        id=source_id, knowledge_base__is_deleted=False
+    ).first()
+    if source is None:
+        return None
+    return crawl_web_source(source)
+
+
+@shared_task
+def dispatch_web_crawls():
+    """由 Celery beat 触发，为到达采集间隔的网页数据源提交采集任务"""
+    from .web import due_web_sources
+
+    sources = due_web_sources()
+    for source in sources:
+        crawl_web_source_task.delay(str(source.id))
+    return len(sources)
@@ -1,8 +1,15 @@
 """
 文档管理URL配置
 """
-from django.urls import path
+from django.urls import path, include
+from rest_framework.routers import DefaultRouter
+from .views import DocumentViewSet, WebSourceViewSet
+
+router = DefaultRouter()
+# 需在文档视图集之前注册，否则 web-sources 会被当作文档ID匹配
+router.register(r'web-sources', WebSourceViewSet, basename='web-source')
+router.register(r'', DocumentViewSet, basename='document')
 
 urlpatterns = [
-    # TODO: 添加文档管理相关的URL
-] 
\ No newline at end of file
+    path('', include(router.urls)),
+]
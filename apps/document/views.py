@@ -0,0 +1,152 @@
+"""
+文档管理视图
+"""
+from django.db import models
+from django.shortcuts import get_object_or_404
+from rest_framework import viewsets, status, permissions, mixins
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from apps.core.models import StatusChoices
+from apps.knowledge_base.models import KnowledgeBase, KnowledgeBaseShare
+from .models import Document, WebSource
+from .parsers import UnsupportedFileType
+from .scheduling import backlog
+from .serializers import DocumentSerializer, DocumentTagsSerializer, DocumentUploadSerializer, WebSourceSerializer
+from .services import set_document_tags, upload_document
+from .tasks import crawl_web_source_task, index_document_task
+
+WRITE_PERMISSIONS = [KnowledgeBaseShare.PermissionChoices.WRITE, KnowledgeBaseShare.PermissionChoices.ADMIN]
+
+
+def writable_knowledge_bases(user):
+    return KnowledgeBase.objects.filter(
+        models.Q(created_by=user) |
+        models.Q(shares__shared_with=user, shares__permission__in=WRITE_PERMISSIONS),
+    ).distinct()
+
+
+class DocumentViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin,
+                      mixins.DestroyModelMixin, viewsets.GenericViewSet):
+    """
+    文档管理视图集
+    """
+    queryset = Document.objects.all()
+    serializer_class = DocumentSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    # 上传与重新索引会触发解析与向量化
+    throttle_scopes = {'create': 'expensive', 'reindex': 'expensive'}
+
+    def get_queryset(self):
+        """
+        用户可访问知识库中的文档，可按 knowledge_base 过滤
+        """
+        user = self.request.user
+        queryset = self.queryset.filter(
+            models.Q(knowledge_base__created_by=user) |
+            models.Q(knowledge_base__shares__shared_with=user),
+            knowledge_base__is_deleted=False,
+        ).distinct().select_related('created_by').prefetch_related('tags')
+        knowledge_base_id = self.request.query_params.get('knowledge_base')
+        if knowledge_base_id:
+            queryset = queryset.filter(knowledge_base_id=knowledge_base_id)
+        return queryset
+
+    def writable_knowledge_bases(self):
+        return writable_knowledge_bases(self.request.user)
+
+    def create(self, request, *args, **kwargs):
+        """
+        上传文档
+        """
+        serializer = DocumentUploadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        kb = get_object_or_404(self.writable_knowledge_bases(), id=serializer.validated_data['knowledge_base'])
+        upload = serializer.validated_data['file']
+        name = serializer.validated_data.get('name') or upload.name
+        try:
+            document = upload_document(kb, name, upload.read(), request.user)
+        except UnsupportedFileType as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(DocumentSerializer(document).data, status=status.HTTP_201_CREATED)
+
+    def perform_destroy(self, instance):
+        """
+        软删除文档
+        """
+        get_object_or_404(self.writable_knowledge_bases(), id=instance.knowledge_base_id)
+        instance.soft_delete()
+
+    @action(detail=True, methods=['post'])
+    def reindex(self, request, pk=None):
+        """
+        手动（增量）重新索引文档
+        """
+        document = self.get_object()
+        get_object_or_404(self.writable_knowledge_bases(), id=document.knowledge_base_id)
+        document.status = StatusChoices.PROCESSING
+        document.save(update_fields=['status', 'updated_at'])
+        index_document_task.delay(str(document.id))
+        return Response(DocumentSerializer(document).data)
+
+    @action(detail=True, methods=['put'])
+    def tags(self, request, pk=None):
+        """
+        设置文档标签，检索时可按标签过滤
+        """
+        document = self.get_object()
+        get_object_or_404(self.writable_knowledge_bases(), id=document.knowledge_base_id)
+        serializer = DocumentTagsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        set_document_tags(document, serializer.validated_data['tags'])
+        return Response(DocumentSerializer(document).data)
+
+    @action(detail=False, methods=['get'])
+    def backlog(self, request):
+        """
+        待索引积压（当前用户可访问的知识库）
+        """
+        user = request.user
+        knowledge_base_ids = KnowledgeBase.objects.filter(
+            models.Q(created_by=user) | models.Q(shares__shared_with=user),
+        ).values_list('id', flat=True)
+        return Response(backlog(list(knowledge_base_ids)))
+
+
+class WebSourceViewSet(viewsets.ModelViewSet):
+    """
+    网页数据源视图集：网址或站点地图，采集后的页面作为文档索引
+    """
+    serializer_class = WebSourceSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    throttle_scopes = {'create': 'expensive', 'crawl': 'expensive'}
+    http_method_names = ['get', 'post', 'patch', 'delete']
+
+    def get_queryset(self):
+        queryset = WebSource.objects.filter(
+            knowledge_base__in=writable_knowledge_bases(self.request.user)
+        ).select_related('knowledge_base')
+        knowledge_base_id = self.request.query_params.get('knowledge_base')
+        if knowledge_base_id:
+            queryset = queryset.filter(knowledge_base_id=knowledge_base_id)
+        return queryset
+
+    def perform_create(self, serializer):
+        get_object_or_404(writable_knowledge_bases(self.request.user), id=serializer.validated_data['knowledge_base'].id)
+        source = serializer.save(created_by=self.request.user)
+        crawl_web_source_task.delay(str(source.id))
+
+    def perform_update(self, serializer):
+        serializer.save(knowledge_base=serializer.instance.knowledge_base)
+
+    @action(detail=True, methods=['post'])
+    def crawl(self, request, pk=None):
+        """
+        立即重新采集（未变化的页面通过条件请求跳过）
+        """
+        source = self.get_object()
+        if source.status == StatusChoices.PROCESSING:
+            return Response({'error': '数据源正在采集中'}, status=status.HTTP_409_CONFLICT)
+        source.status = StatusChoices.PENDING
+        source.save(update_fields=['status', 'updated_at'])
+        crawl_web_source_task.delay(str(source.id))
+        return Response(WebSourceSerializer(source).data, status=status.HTTP_202_ACCEPTED)
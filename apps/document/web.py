@@ -0,0 +1,417 @@
+"""
+网页数据源采集
+
+- 异步抓取（httpx.AsyncClient），全局并发与每个主机的并发分别限制；
+- 保存页面的 ETag/Last-Modified，重新采集时发送条件请求，304 的页面直接跳过；
+- 响应体按块增量解码，经 html2text 增量转换后写入 StreamSplitter 分块，不拼接整页HTML；
+- 分块按内容哈希增量入库（sync_document_chunk_stream），页面内容未变时不重新向量化。
+
+只允许 http/https，主机解析出的任一地址为内网、回环、链路本地（含云元数据 169.254.169.254）、
+保留或组播地址时拒绝；每次请求（包括站点地图中的网址与每一跳重定向）在发送前都会校验。
+WEB_CRAWLER['ALLOW_PRIVATE_HOSTS'] 打开时不校验地址，仅用于对本地HTTP服务器（如 python -m http.server）测试。
+"""
+import asyncio
+import codecs
+import gzip
+import hashlib
+import ipaddress
+import logging
+import socket
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+from xml.etree import ElementTree
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.utils import timezone
+
+from apps.core.models import StatusChoices
+from .chunking import StreamSplitter
+from .models import Document, WebSource
+
+logger = logging.getLogger('manxiai.document')
+
+SITEMAP_NS = '{http://www.sitemaps.org/schemas/sitemap/0.9}'
+HTML_CONTENT_TYPES = ('text/html', 'application/xhtml+xml')
+TEXT_CONTENT_TYPES = ('text/plain', 'text/markdown')
+NBSP_PLACEHOLDER = '&nbsp_place_holder;'
+
+
+class CrawlError(Exception):
+    """数据源无法采集（如站点地图无法获取或解析）"""
+
+
+class UnsafeUrlError(CrawlError):
+    """网址不允许采集（非 http/https 或指向内网地址）"""
+
+
+ALLOWED_SCHEMES = ('http', 'https')
+
+
+def _split_url(url: str):
+    parts = urlsplit(url)
+    if parts.scheme.lower() not in ALLOWED_SCHEMES:
+        raise UnsafeUrlError(f'只支持 http/https 网址: {url}')
+    if not parts.hostname:
+        raise UnsafeUrlError(f'网址缺少主机: {url}')
+    try:
+        port = parts.port or (443 if parts.scheme.lower() == 'https' else 80)
+    except ValueError:
+        raise UnsafeUrlError(f'网址端口无效: {url}')
+    return parts.hostname, port
+
+
+def is_public_address(address: str) -> bool:
+    ip = ipaddress.ip_address(address.split('%')[0])
+    if isinstance(ip, ipaddress.IPv6Address) and ip.ipv4_mapped is not None:
+        ip = ip.ipv4_mapped
+    return not (ip.is_private or ip.is_loopback or ip.is_link_local or ip.is_reserved
+                or ip.is_multicast or ip.is_unspecified)
+
+
+def _check_addresses(host: str, infos) -> None:
+    addresses = {info[4][0] for info in infos}
+    if not addresses:
+        raise UnsafeUrlError(f'无法解析主机: {host}')
+    blocked = sorted(address for address in addresses if not is_public_address(address))
+    if blocked:
+        raise UnsafeUrlError(f'主机 {host} 解析到不允许访问的地址: {", ".join(blocked)}')
+
+
+def validate_url(url: str) -> None:
+    """校验网址可以采集（同步，供序列化器使用），不允许时抛出 UnsafeUrlError"""
+    host, port = _split_url(url)
+    if settings.WEB_CRAWLER['ALLOW_PRIVATE_HOSTS']:
+        return
+    try:
+        infos = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    except OSError as exc:
+        raise UnsafeUrlError(f'无法解析主机 {host}: {exc}') from exc
+    _check_addresses(host, infos)
+
+
+async def avalidate_url(url: str) -> None:
+    """validate_url 的异步版本，采集时每次请求前调用"""
+    host, port = _split_url(url)
+    if settings.WEB_CRAWLER['ALLOW_PRIVATE_HOSTS']:
+        return
+    try:
+        infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    except OSError as exc:
+        raise UnsafeUrlError(f'无法解析主机 {host}: {exc}') from exc
+    _check_addresses(host, infos)
+
+
+def guarded_transport(**kwargs):
+    """
+    发送前校验目标地址的 httpx 传输层：客户端跟随重定向时每一跳都经过这里
+    """
+    import httpx
+
+    class GuardedTransport(httpx.AsyncHTTPTransport):
+        async def handle_async_request(self, request):
+            await avalidate_url(str(request.url))
+            return await super().handle_async_request(request)
+
+    return GuardedTransport(**kwargs)
+
+
+@dataclass
+class FetchResult:
+    """单个页面的抓取结果"""
+    url: str
+    status: str
+    pieces: List[str] = field(default_factory=list, repr=False)
+    etag: str = ''
+    last_modified: str = ''
+    content_hash: str = ''
+    size: int = 0
+    error: str = ''
+
+
+class HtmlTextStream:
+    """
+    HTML 增量转换为文本：每次写入一段HTML，返回已经可以确定的文本
+    """
+
+    def __init__(self):
+        import html2text
+
+        self.converter = html2text.HTML2Text()
+        self.converter.ignore_images = True
+        self.converter.body_width = 0
+
+    def _drain(self) -> str:
+        text = ''.join(self.converter.outtextlist)
+        self.converter.outtextlist = []
+        return text.replace(NBSP_PLACEHOLDER, ' ')
+
+    def feed(self, html: str) -> str:
+        self.converter.feed(html)
+        return self._drain()
+
+    def close(self) -> str:
+        self.converter.feed('')
+        return self.converter.finish().replace(NBSP_PLACEHOLDER, ' ')
+
+
+class WebCrawler:
+    """
+    异步网页抓取器
+    """
+
+    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200, max_concurrency: Optional[int] = None,
+                 per_host: Optional[int] = None, timeout: Optional[float] = None,
+                 max_page_bytes: Optional[int] = None):
+        config = settings.WEB_CRAWLER
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.max_concurrency = max_concurrency or config['MAX_CONCURRENCY']
+        self.per_host = per_host or config['PER_HOST_CONCURRENCY']
+        self.timeout = timeout or config['TIMEOUT']
+        self.max_page_bytes = max_page_bytes or config['MAX_PAGE_BYTES']
+        self._semaphore = None
+        self._hosts: Dict[str, asyncio.Semaphore] = {}
+
+    def client(self):
+        import httpx
+
+        return httpx.AsyncClient(
+            timeout=self.timeout,
+            follow_redirects=True,
+            max_redirects=settings.WEB_CRAWLER['MAX_REDIRECTS'],
+            headers={'User-Agent': settings.WEB_CRAWLER['USER_AGENT']},
+            transport=guarded_transport(limits=httpx.Limits(
+                max_connections=self.max_concurrency, max_keepalive_connections=self.max_concurrency,
+            )),
+        )
+
+    def _host_semaphore(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).netloc.lower()
+        if host not in self._hosts:
+            self._hosts[host] = asyncio.Semaphore(self.per_host)
+        return self._hosts[host]
+
+    async def _read_limited(self, response) -> bytes:
+        content = bytearray()
+        async for data in response.aiter_bytes():
+            content.extend(data)
+            if len(content) > self.max_page_bytes:
+                raise CrawlError(f'内容超过 {self.max_page_bytes} 字节')
+        return bytes(content)
+
+    async def sitemap_urls(self, client, url: str, limit: int) -> List[str]:
+        """
+        解析站点地图（支持 sitemapindex 嵌套与 .gz），返回最多 limit 个页面网址
+        """
+        import httpx
+
+        queue, seen, urls, known = [url], set(), [], set()
+        while queue and len(urls) < limit:
+            sitemap = queue.pop(0)
+            if sitemap in seen:
+                continue
+            seen.add(sitemap)
+            try:
+                async with client.stream('GET', sitemap) as response:
+                    response.raise_for_status()
+                    content = await self._read_limited(response)
+                if content[:2] == b'\x1f\x8b':
+                    content = gzip.decompress(content)
+                root = ElementTree.fromstring(content)
+            except (httpx.HTTPError, ElementTree.ParseError, OSError, CrawlError) as exc:
+                raise CrawlError(f'站点地图 {sitemap} 无法读取: {exc}') from exc
+            locations = [node.text.strip() for node in root.iter(f'{SITEMAP_NS}loc') if node.text]
+            if root.tag == f'{SITEMAP_NS}sitemapindex':
+                queue.extend(locations)
+            else:
+                for location in locations:
+                    if location not in known:
+                        known.add(location)
+                        urls.append(location)
+        return urls[:limit]
+
+    async def fetch(self, client, url: str, validators: Optional[Dict] = None) -> FetchResult:
+        """
+        抓取页面并增量转换、分块；validators 为上次保存的 etag/last_modified
+        """
+        import httpx
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        validators = validators or {}
+        headers = {}
+        if validators.get('etag'):
+            headers['If-None-Match'] = validators['etag']
+        if validators.get('last_modified'):
+            headers['If-Modified-Since'] = validators['last_modified']
+
+        async with self._semaphore, self._host_semaphore(url):
+            try:
+                async with client.stream('GET', url, headers=headers) as response:
+                    if response.status_code == 304:
+                        return FetchResult(url, 'unchanged', etag=validators.get('etag', ''),
+                                           last_modified=validators.get('last_modified', ''))
+                    response.raise_for_status()
+                    content_type = response.headers.get('content-type', '').split(';')[0].strip().lower()
+                    if content_type not in HTML_CONTENT_TYPES + TEXT_CONTENT_TYPES:
+                        return FetchResult(url, 'skipped', error=f'不支持的内容类型: {content_type or "未知"}')
+                    result = FetchResult(
+                        url, 'fetched',
+                        etag=response.headers.get('etag', ''),
+                        last_modified=response.headers.get('last-modified', ''),
+                    )
+                    await self._convert(response, content_type, result)
+                    return result
+            except (httpx.HTTPError, CrawlError) as exc:
+                return FetchResult(url, 'failed', error=str(exc) or exc.__class__.__name__)
+
+    async def _convert(self, response, content_type: str, result: FetchResult):
+        decoder = codecs.getincrementaldecoder(response.encoding or 'utf-8')(errors='replace')
+        html = HtmlTextStream() if content_type in HTML_CONTENT_TYPES else None
+        splitter = StreamSplitter(self.chunk_size, self.chunk_overlap)
+        digest = hashlib.sha256()
+        async for data in response.aiter_bytes():
+            result.size += len(data)
+            if result.size > self.max_page_bytes:
+                raise CrawlError(f'页面超过 {self.max_page_bytes} 字节')
+            digest.update(data)
+            text = decoder.decode(data)
+            result.pieces.extend(splitter.feed(html.feed(text) if html else text))
+        tail = decoder.decode(b'', final=True)
+        if html:
+            tail = html.feed(tail) + html.close()
+        result.pieces.extend(splitter.feed(tail))
+        result.pieces.extend(splitter.close())
+        result.content_hash = digest.hexdigest()
+
+
+def _page_documents(source: WebSource) -> Dict[str, Document]:
+    documents = Document.objects.filter(
+        knowledge_base_id=source.knowledge_base_id, metadata__file_web_source=str(source.id)
+    )
+    return {document.metadata.get('source_url'): document for document in documents}
+
+
+def store_page(source: WebSource, result: FetchResult, document: Optional[Document]) -> str:
+    """
+    保存抓取结果，返回最终状态：fetched / unchanged / failed / skipped
+    """
+    from .services import sync_document_chunk_stream
+
+    if result.status != 'fetched':
+        return result.status
+    if document is not None and document.content_hash == result.content_hash \
+            and document.status == StatusChoices.COMPLETED:
+        # 服务器不支持条件请求但内容未变：只更新校验信息
+        document.metadata = {**document.metadata, 'file_etag': result.etag,
+                             'file_last_modified': result.last_modified}
+        document.save(update_fields=['metadata', 'updated_at'])
+        return 'unchanged'
+    if document is None:
+        document = Document(knowledge_base_id=source.knowledge_base_id, created_by_id=source.created_by_id)
+    document.name = result.url[:255]
+    document.file_type = 'html'
+    document.file_size = result.size
+    document.metadata = {
+        **(document.metadata or {}),
+        'source_url': result.url,
+        'file_web_source': str(source.id),
+        'file_etag': result.etag,
+        'file_last_modified': result.last_modified,
+    }
+    document.status = StatusChoices.PROCESSING
+    document.error_message = ''
+    document.save()
+    try:
+        document.content_hash = result.content_hash
+        document.status = StatusChoices.COMPLETED
+        sync_document_chunk_stream(document, ((piece, {}) for piece in result.pieces))
+    except Exception as exc:
+        document.status = StatusChoices.FAILED
+        document.error_message = str(exc)
+        document.save(update_fields=['status', 'error_message', 'updated_at'])
+        return 'failed'
+    return 'fetched'
+
+
+async def acrawl(source: WebSource, crawler: Optional[WebCrawler] = None) -> Dict:
+    """
+    采集数据源：并发抓取，抓取完成的页面依次（在同一个同步线程中）入库
+    """
+    knowledge_base = await sync_to_async(lambda: source.knowledge_base)()
+    crawler = crawler or WebCrawler(knowledge_base.chunk_size, knowledge_base.chunk_overlap)
+    documents = await sync_to_async(_page_documents)(source)
+    counts = {'fetched': 0, 'unchanged': 0, 'failed': 0, 'skipped': 0, 'removed': 0}
+    failures = []
+
+    async with crawler.client() as client:
+        if source.source_type == WebSource.SourceTypeChoices.SITEMAP:
+            urls = await crawler.sitemap_urls(client, source.url, source.max_pages)
+        else:
+            urls = [source.url]
+
+        async def crawl_one(url):
+            document = documents.get(url)
+            validators = {}
+            if document is not None and document.status == StatusChoices.COMPLETED:
+                validators = {'etag': document.metadata.get('file_etag'),
+                              'last_modified': document.metadata.get('file_last_modified')}
+            result = await crawler.fetch(client, url, validators)
+            status = await sync_to_async(store_page)(source, result, document)
+            counts[status] += 1
+            if status == 'failed':
+                failures.append({'url': url, 'error': result.error})
+            # 已入库的页面释放分块文本
+            result.pieces = []
+
+        await asyncio.gather(*[crawl_one(url) for url in urls])
+
+    # 站点地图中已不存在的页面
+    if source.source_type == WebSource.SourceTypeChoices.SITEMAP:
+        current = set(urls)
+        stale = [document for url, document in documents.items() if url not in current]
+        for document in stale:
+            await sync_to_async(document.soft_delete)()
+        counts['removed'] = len(stale)
+    return {'pages': len(urls), **counts, 'failures': failures[:20]}
+
+
+def crawl_web_source(source: WebSource, crawler: Optional[WebCrawler] = None) -> Dict:
+    """
+    同步入口（Celery任务），记录采集状态与结果
+    """
+    source.status = StatusChoices.PROCESSING
+    source.save(update_fields=['status', 'updated_at'])
+    try:
+        result = async_to_sync(acrawl)(source, crawler)
+    except Exception as exc:
+        source.status = StatusChoices.FAILED
+        source.error_message = str(exc)
+        source.last_crawled_at = timezone.now()
+        source.save(update_fields=['status', 'error_message', 'last_crawled_at', 'updated_at'])
+        logger.warning('网页数据源 %s 采集失败: %s', source.id, exc)
+        if not isinstance(exc, CrawlError):
+            raise
+        return {'error': str(exc)}
+    source.status = StatusChoices.COMPLETED
+    source.error_message = ''
+    source.last_result = result
+    source.last_crawled_at = timezone.now()
+    source.save(update_fields=['status', 'error_message', 'last_result', 'last_crawled_at', 'updated_at'])
+    logger.info('网页数据源 %s 采集完成: %s', source.id, {k: v for k, v in result.items() if k != 'failures'})
+    return result
+
+
+def due_web_sources(now=None):
+    """到达重新采集时间的数据源"""
+    now = now or timezone.now()
+    sources = WebSource.objects.filter(
+        crawl_interval__isnull=False, knowledge_base__is_deleted=False
+    ).exclude(status=StatusChoices.PROCESSING)
+    return [
+        source for source in sources
+        if source.last_crawled_at is None
+        or (now - source.last_crawled_at).total_seconds() >= source.crawl_interval * 60
+    ]
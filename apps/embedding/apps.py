@@ -4,4 +4,14 @@ from django.apps import AppConfig
 class EmbeddingConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.embedding'
-    verbose_name = '向量化处理' 
\ No newline at end of file
+    verbose_name = '向量化处理'
+
+    def ready(self):
+        from django.db.models.signals import post_migrate
+
+        def create_vector_indexes(sender, using='default', **kwargs):
+            from django.conf import settings
+            from .indexes import ensure_vector_indexes
+            ensure_vector_indexes(settings.EMBEDDING_DIMENSIONS, using=using)
+
+        post_migrate.connect(create_vector_indexes, sender=self, weak=False)
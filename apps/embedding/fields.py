@@ -0,0 +1,16 @@
+"""
+向量字段
+"""
+from pgvector.django import VectorField
+
+
+class HalfVectorField(VectorField):
+    """
+    pgvector 半精度向量(halfvec)，只用于查询和索引表达式中的类型转换
+    """
+    description = 'Half precision vector'
+
+    def db_type(self, connection):
+        if self.dimensions is None:
+            return 'halfvec'
+        return 'halfvec(%d)' % self.dimensions
@@ -0,0 +1,178 @@
+"""
+检索过滤条件
+
+标签、文档类型、日期与元数据在写入向量时冗余到 ChunkEmbedding 上（均有索引），
+过滤条件与向量距离排序在同一条SQL中执行，而不是取回 top_k 之后再过滤。
+"""
+import uuid
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Any, Dict, List, Optional
+
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+TAG_MODES = ('any', 'all')
+
+
+@dataclass
+class SearchFilters:
+    """
+    检索过滤条件
+
+    tags 为知识库标签名称，tag_mode 为 any（任一）或 all（全部）；
+    metadata 为包含匹配（JSON @>），如 {"lang": "zh"}。
+    """
+    tags: List[str] = field(default_factory=list)
+    tag_mode: str = 'any'
+    document_types: List[str] = field(default_factory=list)
+    document_ids: List[str] = field(default_factory=list)
+    date_from: Optional[date] = None
+    date_to: Optional[date] = None
+    metadata: Dict[str, Any] = field(default_factory=dict)
+    # 由 resolve() 根据知识库把标签名称解析为ID
+    tag_ids: Optional[List[str]] = None
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict]) -> Optional['SearchFilters']:
+        """从请求参数构建，参数无效时抛出ValueError，未设置任何条件时返回None"""
+        if not data:
+            return None
+        if not isinstance(data, dict):
+            raise ValueError('filters 必须是对象')
+
+        def as_list(name):
+            value = data.get(name) or []
+            if isinstance(value, str):
+                value = [value]
+            if not isinstance(value, list):
+                raise ValueError(f'{name} 必须是列表')
+            return [str(item) for item in value]
+
+        def as_date(name):
+            value = data.get(name)
+            if not value:
+                return None
+            parsed = parse_date(str(value))
+            if parsed is None:
+                raise ValueError(f'{name} 日期格式应为 YYYY-MM-DD')
+            return parsed
+
+        def as_uuids(name):
+            try:
+                return [str(uuid.UUID(item)) for item in as_list(name)]
+            except ValueError:
+                raise ValueError(f'{name} 必须是UUID列表')
+
+        tag_mode = data.get('tag_mode') or 'any'
+        if tag_mode not in TAG_MODES:
+            raise ValueError(f'tag_mode 只能是 {"/".join(TAG_MODES)}')
+        metadata = data.get('metadata') or {}
+        if not isinstance(metadata, dict):
+            raise ValueError('metadata 必须是对象')
+        filters = cls(
+            tags=as_list('tags'),
+            tag_mode=tag_mode,
+            document_types=[item.lower() for item in as_list('document_types')],
+            document_ids=as_uuids('document_ids'),
+            date_from=as_date('date_from'),
+            date_to=as_date('date_to'),
+            metadata=metadata,
+        )
+        return None if filters.is_empty else filters
+
+    @property
+    def is_empty(self) -> bool:
+        return not (self.tags or self.document_types or self.document_ids
+                    or self.date_from or self.date_to or self.metadata)
+
+    def resolve(self, knowledge_base) -> 'SearchFilters':
+        """返回标签已解析为该知识库标签ID的副本"""
+        from apps.knowledge_base.models import KnowledgeBaseTag
+
+        tag_ids = None
+        if self.tags:
+            tag_ids = [
+                str(tag_id) for tag_id in KnowledgeBaseTag.objects.filter(
+                    knowledge_base=knowledge_base, name__in=self.tags
+                ).values_list('id', flat=True)
+            ]
+        return SearchFilters(
+            tags=self.tags, tag_mode=self.tag_mode, document_types=self.document_types,
+            document_ids=self.document_ids, date_from=self.date_from, date_to=self.date_to,
+            metadata=self.metadata, tag_ids=tag_ids,
+        )
+
+    def _matches_nothing(self) -> bool:
+        # 任一标签不存在时 all 不可能满足；全部不存在时 any 也不可能满足
+        if not self.tags or self.tag_ids is None:
+            return False
+        if self.tag_mode == 'all':
+            return len(self.tag_ids) < len(set(self.tags))
+        return not self.tag_ids
+
+    def apply_to_embeddings(self, queryset):
+        """作用于 ChunkEmbedding 查询集（使用冗余字段与其索引）"""
+        if self._matches_nothing():
+            return queryset.none()
+        if self.tag_ids:
+            lookup = 'tag_ids__contains' if self.tag_mode == 'all' else 'tag_ids__overlap'
+            queryset = queryset.filter(**{lookup: self.tag_ids})
+        if self.document_types:
+            queryset = queryset.filter(document_type__in=self.document_types)
+        if self.document_ids:
+            queryset = queryset.filter(chunk__document_id__in=self.document_ids)
+        if self.date_from:
+            queryset = queryset.filter(document_date__gte=self.date_from)
+        if self.date_to:
+            queryset = queryset.filter(document_date__lte=self.date_to)
+        if self.metadata:
+            queryset = queryset.filter(metadata__contains=self.metadata)
+        return queryset
+
+    def apply_to_chunks(self, queryset):
+        """作用于 DocumentChunk 查询集（关键词检索）"""
+        if self._matches_nothing():
+            return queryset.none()
+        if self.tag_ids:
+            if self.tag_mode == 'all':
+                for tag_id in self.tag_ids:
+                    queryset = queryset.filter(document__tags=tag_id)
+            else:
+                queryset = queryset.filter(document__tags__in=self.tag_ids).distinct()
+        if self.document_types:
+            queryset = queryset.filter(document__file_type__in=self.document_types)
+        if self.document_ids:
+            queryset = queryset.filter(document_id__in=self.document_ids)
+        if self.date_from:
+            queryset = queryset.filter(document__created_at__date__gte=self.date_from)
+        if self.date_to:
+            queryset = queryset.filter(document__created_at__date__lte=self.date_to)
+        if self.metadata:
+            queryset = queryset.filter(
+                Q(metadata__contains=self.metadata) | Q(document__metadata__contains=self.metadata)
+            )
+        return queryset
+
+
+def filter_attributes(document, chunk_metadata: Optional[Dict] = None) -> Dict[str, Any]:
+    """
+    写入向量时冗余的过滤字段，同一文档实例只计算一次标签
+    """
+    tag_ids = getattr(document, '_filter_tag_ids', None)
+    if tag_ids is None:
+        tag_ids = []
+        if document.pk and not document._state.adding:
+            tag_ids = [str(tag_id) for tag_id in document.tags.values_list('id', flat=True)]
+        document._filter_tag_ids = tag_ids
+    # file_ 前缀为内部字段（如上传时记录的 file_hash）
+    metadata = {key: value for key, value in (document.metadata or {}).items() if not key.startswith('file_')}
+    metadata.update(chunk_metadata or {})
+    created_at = document.created_at
+    return {
+        'tag_ids': tag_ids,
+        'document_type': (document.file_type or '').lower(),
+        'document_date': timezone.localtime(created_at).date() if created_at else None,
+        'metadata': metadata,
+    }
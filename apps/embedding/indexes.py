@@ -0,0 +1,77 @@
+"""
+向量索引管理
+
+每个 (维度, 量化方式) 组合建立一个HNSW部分表达式索引：
+float32 使用 vector(N) 索引，float16 使用 halfvec(N) 索引（体积约为一半），
+int8 不建数据库ANN索引，候选检索在进程内完成。
+"""
+import logging
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connections, DatabaseError
+
+from . import quantization
+
+logger = logging.getLogger('manxiai.embedding')
+
+INDEX_TYPES = {
+    quantization.NONE: ('vector', 'vector_cosine_ops'),
+    quantization.FLOAT16: ('halfvec', 'halfvec_cosine_ops'),
+}
+
+
+def index_name(dimensions: int, mode: str) -> str:
+    return f'embeddings_hnsw_{mode}_{dimensions}'
+
+
+def vector_index_sql(dimensions: int, mode: str) -> str:
+    vector_type, opclass = INDEX_TYPES[mode]
+    options = settings.VECTOR_DATABASE
+    return (
+        f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {index_name(dimensions, mode)} '
+        f'ON {options["TABLE_NAME"]} USING hnsw ((vector::{vector_type}({int(dimensions)})) {opclass}) '
+        f'WITH (m = {int(options["HNSW_M"])}, ef_construction = {int(options["HNSW_EF_CONSTRUCTION"])}) '
+        f"WHERE dimensions = {int(dimensions)} AND quantization = '{mode}'"
+    )
+
+
+def ensure_vector_indexes(dimensions: int, using: str = 'default'):
+    """
+    确保指定维度的向量索引存在（幂等，CONCURRENTLY 不阻塞写入）
+    """
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return
+    for mode in INDEX_TYPES:
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(vector_index_sql(dimensions, mode))
+        except DatabaseError as exc:
+            # halfvec 需要 pgvector >= 0.7，旧版本只保留float32索引
+            logger.warning('创建向量索引 %s 失败: %s', index_name(dimensions, mode), exc)
+
+
+@lru_cache(maxsize=None)
+def pgvector_version(using: str = 'default') -> tuple:
+    """已安装的pgvector扩展版本，如 (0, 8, 0)"""
+    with connections[using].cursor() as cursor:
+        cursor.execute("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+        row = cursor.fetchone()
+    if not row:
+        return ()
+    return tuple(int(part) for part in row[0].split('.') if part.isdigit())
+
+
+def set_filtered_search_params(using: str = 'default'):
+    """
+    带过滤条件的HNSW检索：在当前事务内调大 ef_search，pgvector >= 0.8 时开启迭代扫描，
+    过滤掉的候选会继续从索引中补足，而不是返回不足 top_k 条
+    """
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('SET LOCAL hnsw.ef_search = %s', [int(settings.VECTOR_DATABASE['HNSW_EF_SEARCH_FILTERED'])])
+        if pgvector_version(using) >= (0, 8):
+            cursor.execute("SET LOCAL hnsw.iterative_scan = 'strict_order'")
@@ -1,5 +1,134 @@
 """
-向量化处理模型 - 待完善
+向量化处理模型
 """
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
 from django.db import models
-# TODO: 实现向量化处理相关模型 
\ No newline at end of file
+from django.utils import timezone
+from pgvector.django import VectorField
+from apps.core.models import BaseModel, StatusChoices
+
+
+class QuantizationChoices(models.TextChoices):
+    """向量量化方式"""
+    NONE = 'none', '不量化(float32)'
+    FLOAT16 = 'float16', '半精度(halfvec)'
+    INT8 = 'int8', 'int8标量量化'
+
+
+class ChunkEmbedding(BaseModel):
+    """
+    分块向量
+
+    vector 列不限定维度，按 dimensions 与 quantization 建立部分表达式索引，
+    使不同维度、不同量化方式的知识库可以共存于同一张表。
+    同一分块在重新向量化期间可同时拥有新旧两个模型的向量，检索只使用知识库当前生效的模型。
+    """
+    uuid_version = 7
+
+    chunk = models.ForeignKey(
+        'document.DocumentChunk',
+        on_delete=models.CASCADE,
+        related_name='embeddings',
+        verbose_name='分块'
+    )
+    knowledge_base = models.ForeignKey(
+        'knowledge_base.KnowledgeBase',
+        on_delete=models.CASCADE,
+        related_name='embeddings',
+        verbose_name='知识库'
+    )
+    model_name = models.CharField(max_length=100, verbose_name='向量模型')
+    dimensions = models.IntegerField(verbose_name='向量维度')
+    vector = VectorField(verbose_name='向量')
+    quantization = models.CharField(
+        max_length=20,
+        choices=QuantizationChoices.choices,
+        default=QuantizationChoices.NONE,
+        verbose_name='量化方式'
+    )
+    # int8 量化编码：4字节float32缩放系数 + dimensions字节int8
+    quantized = models.BinaryField(null=True, blank=True, verbose_name='量化编码')
+    # 检索过滤字段，从文档冗余而来，使过滤条件能在向量检索的同一查询中走索引（见 filters.py）
+    tag_ids = ArrayField(models.CharField(max_length=36), default=list, blank=True, verbose_name='标签ID')
+    document_type = models.CharField(max_length=20, blank=True, default='', verbose_name='文档类型')
+    document_date = models.DateField(null=True, blank=True, verbose_name='文档日期')
+    metadata = models.JSONField(default=dict, blank=True, verbose_name='元数据')
+
+    class Meta:
+        db_table = 'embeddings'
+        verbose_name = '分块向量'
+        verbose_name_plural = '分块向量'
+        indexes = [
+            models.Index(fields=['knowledge_base', 'model_name', 'dimensions', 'quantization']),
+            models.Index(fields=['knowledge_base', 'document_type', 'document_date']),
+            GinIndex(fields=['tag_ids'], name='embeddings_tag_ids_gin'),
+            GinIndex(fields=['metadata'], opclasses=['jsonb_path_ops'], name='embeddings_metadata_gin'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['chunk', 'model_name', 'dimensions'], name='embeddings_chunk_model_unique'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.chunk_id} ({self.model_name})"
+
+
+class ReembedJob(BaseModel):
+    """
+    知识库重新向量化任务
+
+    在后台为所有分块生成目标模型的影子向量，期间检索仍使用原模型，
+    完成后切换知识库设置中的生效模型并清理旧向量。
+    """
+    knowledge_base = models.ForeignKey(
+        'knowledge_base.KnowledgeBase',
+        on_delete=models.CASCADE,
+        related_name='reembed_jobs',
+        verbose_name='知识库'
+    )
+    source_model = models.CharField(max_length=100, verbose_name='原向量模型')
+    source_dimensions = models.IntegerField(verbose_name='原向量维度')
+    target_model = models.CharField(max_length=100, verbose_name='目标向量模型')
+    target_dimensions = models.IntegerField(verbose_name='目标向量维度')
+    status = models.CharField(
+        max_length=20,
+        choices=StatusChoices.choices,
+        default=StatusChoices.PENDING,
+        verbose_name='状态'
+    )
+    total_chunks = models.IntegerField(default=0, verbose_name='分块总数')
+    processed_chunks = models.IntegerField(default=0, verbose_name='已处理分块数')
+    rows_per_second = models.FloatField(default=0, verbose_name='限速(分块/秒)')
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name='开始时间')
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name='结束时间')
+    error_message = models.TextField(blank=True, default='', verbose_name='错误信息')
+
+    class Meta:
+        db_table = 'embedding_reembed_jobs'
+        verbose_name = '重新向量化任务'
+        verbose_name_plural = '重新向量化任务'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.knowledge_base_id}: {self.source_model} -> {self.target_model}"
+
+    @property
+    def is_active(self):
+        return self.status in (StatusChoices.PENDING, StatusChoices.PROCESSING)
+
+    @property
+    def progress(self):
+        if not self.total_chunks:
+            return 1.0 if self.status == StatusChoices.COMPLETED else 0.0
+        return min(1.0, self.processed_chunks / self.total_chunks)
+
+    @property
+    def eta_seconds(self):
+        """按已处理速度估算剩余秒数"""
+        if self.status != StatusChoices.PROCESSING or not self.started_at or not self.processed_chunks:
+            return None
+        elapsed = (timezone.now() - self.started_at).total_seconds()
+        remaining = max(0, self.total_chunks - self.processed_chunks)
+        return round(remaining * elapsed / self.processed_chunks, 1)
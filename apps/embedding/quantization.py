@@ -0,0 +1,122 @@
+"""
+向量量化
+
+float16 在数据库中以 halfvec 表达式索引实现；int8 使用逐向量对称标量量化，
+在进程内扫描量化编码得到候选集，再用原始 float32 向量精确重排。
+本模块不依赖Django，基准测试可直接使用。
+"""
+import struct
+from typing import Iterator, List, Optional, Sequence
+
+import numpy as np
+
+NONE = 'none'
+FLOAT16 = 'float16'
+INT8 = 'int8'
+
+# 编码头：float32 缩放系数
+INT8_HEADER = struct.Struct('<f')
+# 分块计算，避免一次性把全部int8编码转换为float32
+SCAN_BLOCK_ROWS = 65536
+
+
+def quantize_int8(vector: Sequence[float]) -> bytes:
+    """
+    对称标量量化：codes = round(v / max|v| * 127)
+    """
+    array = np.asarray(vector, dtype=np.float32)
+    max_abs = float(np.max(np.abs(array))) if array.size else 0.0
+    scale = max_abs / 127.0 if max_abs > 0 else 1.0
+    codes = np.clip(np.rint(array / scale), -127, 127).astype(np.int8)
+    return INT8_HEADER.pack(scale) + codes.tobytes()
+
+
+def dequantize_int8(blob: bytes) -> np.ndarray:
+    blob = bytes(blob)
+    (scale,) = INT8_HEADER.unpack_from(blob)
+    codes = np.frombuffer(blob, dtype=np.int8, offset=INT8_HEADER.size)
+    return codes.astype(np.float32) * scale
+
+
+def encode_for_storage(vector: Sequence[float], mode: str) -> Optional[bytes]:
+    """返回需要写入 quantized 列的编码，只有 int8 需要单独存储"""
+    if mode == INT8:
+        return quantize_int8(vector)
+    return None
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """按分数从高到低返回前k个下标"""
+    if k <= 0 or scores.size == 0:
+        return np.empty(0, dtype=np.int64)
+    k = min(k, scores.size)
+    candidates = np.argpartition(-scores, k - 1)[:k]
+    return candidates[np.argsort(-scores[candidates])]
+
+
+class Int8Index:
+    """
+    进程内int8候选索引
+
+    内存占用为每条向量 dimensions + 4 字节，是float32的约1/4。
+    """
+
+    def __init__(self, ids: List, codes: np.ndarray, scales: np.ndarray):
+        self.ids = ids
+        self.codes = codes
+        self.scales = scales
+
+    @classmethod
+    def from_blobs(cls, ids: List, blobs: List[bytes]):
+        if not blobs:
+            return cls([], np.empty((0, 0), dtype=np.int8), np.empty(0, dtype=np.float32))
+        header = INT8_HEADER.size
+        rows = [bytes(blob) for blob in blobs]
+        scales = np.array([INT8_HEADER.unpack_from(row)[0] for row in rows], dtype=np.float32)
+        codes = np.frombuffer(b''.join(row[header:] for row in rows), dtype=np.int8).reshape(len(rows), -1)
+        return cls(list(ids), codes, scales)
+
+    @classmethod
+    def from_vectors(cls, ids: List, vectors: np.ndarray):
+        return cls.from_blobs(ids, [quantize_int8(vector) for vector in vectors])
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + self.scales.nbytes
+
+    def __len__(self):
+        return len(self.ids)
+
+    def scores(self, query: Sequence[float]) -> np.ndarray:
+        """近似内积（对归一化向量即余弦相似度）"""
+        query = np.asarray(query, dtype=np.float32)
+        result = np.empty(len(self.ids), dtype=np.float32)
+        for start in range(0, len(self.ids), SCAN_BLOCK_ROWS):
+            block = self.codes[start:start + SCAN_BLOCK_ROWS].astype(np.float32)
+            result[start:start + SCAN_BLOCK_ROWS] = block @ query
+        return result * self.scales
+
+    def search(self, query: Sequence[float], k: int) -> List:
+        if not self.ids:
+            return []
+        return [self.ids[i] for i in top_k_indices(self.scores(query), k)]
+
+    def ranked(self, query: Sequence[float], batch_size: int, max_batch_size: int) -> Iterator[List]:
+        """按近似分数从高到低分批返回ID：首批 batch_size 个，之后每批翻倍，不超过 max_batch_size"""
+        scores = self.scores(query)
+        remaining = len(self.ids)
+        while remaining > 0:
+            order = top_k_indices(scores, min(batch_size, remaining))
+            # 已返回的不再参与后续批次的排序
+            scores[order] = -np.inf
+            remaining -= len(order)
+            batch_size = min(batch_size * 2, max_batch_size)
+            yield [self.ids[i] for i in order]
+
+
+def cosine_similarity(query: Sequence[float], vectors: np.ndarray) -> np.ndarray:
+    query = np.asarray(query, dtype=np.float32)
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1) * (np.linalg.norm(query) or 1.0)
+    norms[norms == 0] = 1.0
+    return (vectors @ query) / norms
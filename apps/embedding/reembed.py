@@ -0,0 +1,202 @@
+"""
+知识库在线重新向量化
+
+1. 创建任务，记录原模型与目标模型；
+2. 后台按限速分批为缺少目标向量的分块生成影子向量，检索仍使用原模型，
+   新写入的分块由 embed_chunks 同时生成两个模型的向量；
+3. 全部分块都有目标向量后，在事务内切换知识库设置中的生效模型（锁定设置行，与写入互斥）；
+4. 分批删除原模型向量。
+"""
+import logging
+import time
+from typing import Optional
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from apps.core.models import StatusChoices
+from .indexes import ensure_vector_indexes
+from .models import ChunkEmbedding, ReembedJob
+from .search import bump_embeddings_version, get_search_settings
+from .services import active_embedding_model, build_embedding, resolve_embedding_model
+
+logger = logging.getLogger('manxiai.embedding')
+
+
+class ReembedError(Exception):
+    """无法创建重新向量化任务"""
+
+
+def start_reembed(knowledge_base, model_name: Optional[str] = None, dimensions: Optional[int] = None,
+                  rows_per_second: Optional[float] = None) -> ReembedJob:
+    """
+    创建重新向量化任务并提交到后台执行
+    """
+    from .tasks import reembed_knowledge_base_task
+
+    source = active_embedding_model(knowledge_base)
+    target = resolve_embedding_model(model_name, dimensions)
+    if (target.name, target.dimensions) == (source.name, source.dimensions):
+        raise ReembedError('目标模型与当前生效模型相同')
+    if rows_per_second is None:
+        rows_per_second = settings.VECTOR_DATABASE['REEMBED_ROWS_PER_SECOND']
+
+    with transaction.atomic():
+        # 锁定设置行，保证同一知识库同时只有一个进行中的任务
+        from apps.knowledge_base.models import KnowledgeBaseSettings
+        KnowledgeBaseSettings.objects.select_for_update().get_or_create(knowledge_base=knowledge_base)
+        if ReembedJob.objects.filter(
+            knowledge_base=knowledge_base, status__in=[StatusChoices.PENDING, StatusChoices.PROCESSING]
+        ).exists():
+            raise ReembedError('该知识库已有进行中的重新向量化任务')
+        job = ReembedJob.objects.create(
+            knowledge_base=knowledge_base,
+            source_model=source.name,
+            source_dimensions=source.dimensions,
+            target_model=target.name,
+            target_dimensions=target.dimensions,
+            rows_per_second=rows_per_second,
+        )
+    transaction.on_commit(lambda: reembed_knowledge_base_task.delay(str(job.id)))
+    return job
+
+
+def cancel_reembed(job: ReembedJob) -> ReembedJob:
+    """取消任务，已生成的影子向量随之删除"""
+    ReembedJob.objects.filter(
+        id=job.id, status__in=[StatusChoices.PENDING, StatusChoices.PROCESSING]
+    ).update(status=StatusChoices.CANCELLED, finished_at=timezone.now(), updated_at=timezone.now())
+    job.refresh_from_db()
+    if job.status == StatusChoices.CANCELLED:
+        _delete_profile(job.knowledge_base_id, job.target_model, job.target_dimensions)
+    return job
+
+
+def _pending_chunks(job: ReembedJob):
+    from apps.document.models import DocumentChunk
+
+    return DocumentChunk.objects.filter(knowledge_base_id=job.knowledge_base_id).exclude(
+        Exists(ChunkEmbedding.objects.filter(
+            chunk=OuterRef('pk'), model_name=job.target_model, dimensions=job.target_dimensions
+        ))
+    )
+
+
+def _delete_profile(knowledge_base_id, model_name: str, dimensions: int, batch_size: int = 1000) -> int:
+    """分批删除某个模型的全部向量，避免长事务"""
+    queryset = ChunkEmbedding.objects.filter(
+        knowledge_base_id=knowledge_base_id, model_name=model_name, dimensions=dimensions
+    )
+    deleted = 0
+    while True:
+        ids = list(queryset.values_list('id', flat=True)[:batch_size])
+        if not ids:
+            if deleted:
+                bump_embeddings_version(knowledge_base_id)
+            return deleted
+        deleted += ChunkEmbedding.objects.filter(id__in=ids).delete()[0]
+
+
+def _is_cancelled(job: ReembedJob) -> bool:
+    return ReembedJob.objects.filter(id=job.id, status=StatusChoices.CANCELLED).exists()
+
+
+def _flip(job: ReembedJob) -> bool:
+    """所有分块都有目标向量时切换生效模型，返回是否切换成功"""
+    from apps.knowledge_base.models import KnowledgeBaseSettings
+
+    with transaction.atomic():
+        kb_settings, _ = KnowledgeBaseSettings.objects.select_for_update().get_or_create(
+            knowledge_base_id=job.knowledge_base_id
+        )
+        # 加锁后再次确认，期间写入的分块由双写覆盖
+        if _pending_chunks(job).exists() or _is_cancelled(job):
+            return False
+        kb_settings.embedding_model = job.target_model
+        kb_settings.embedding_dimensions = job.target_dimensions
+        kb_settings.save(update_fields=['embedding_model', 'embedding_dimensions', 'updated_at'])
+        job.status = StatusChoices.COMPLETED
+        job.processed_chunks = job.total_chunks
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'processed_chunks', 'finished_at', 'updated_at'])
+    return True
+
+
+def _fill(job: ReembedJob, model, batch_size: int) -> bool:
+    """为缺少目标向量的分块按限速生成向量，任务被取消时返回False"""
+    from apps.document.models import Document
+
+    documents = {}
+    while True:
+        if _is_cancelled(job):
+            return False
+        batch = list(
+            _pending_chunks(job).order_by('id').only(
+                'id', 'knowledge_base_id', 'document_id', 'content', 'metadata'
+            )[:batch_size]
+        )
+        if not batch:
+            return True
+        # 过滤字段取自文档，同一文档跨批次复用（标签只查询一次）
+        missing = {chunk.document_id for chunk in batch} - documents.keys()
+        documents.update(Document.objects.in_bulk(missing))
+        for chunk in batch:
+            chunk.document = documents[chunk.document_id]
+        started = time.monotonic()
+        mode, _ = get_search_settings(job.knowledge_base)
+        vectors = model.embed([chunk.content for chunk in batch])
+        embeddings = [build_embedding(chunk, vector, model.name, mode) for chunk, vector in zip(batch, vectors)]
+        try:
+            with transaction.atomic():
+                ChunkEmbedding.objects.bulk_create(embeddings, ignore_conflicts=True)
+                bump_embeddings_version(job.knowledge_base_id)
+        except IntegrityError:
+            # 分块在此期间被删除，下一轮重新选取
+            continue
+        job.processed_chunks += len(batch)
+        job.total_chunks = max(job.total_chunks, job.processed_chunks)
+        job.save(update_fields=['processed_chunks', 'total_chunks', 'updated_at'])
+        if job.rows_per_second > 0:
+            time.sleep(max(0.0, len(batch) / job.rows_per_second - (time.monotonic() - started)))
+
+
+def run_reembed(job: ReembedJob, batch_size: Optional[int] = None) -> ReembedJob:
+    """
+    执行重新向量化任务
+    """
+    batch_size = batch_size or settings.VECTOR_DATABASE['REEMBED_BATCH_SIZE']
+    if job.status != StatusChoices.PENDING:
+        return job
+    model = resolve_embedding_model(job.target_model, job.target_dimensions)
+    # 先建好目标维度的部分索引（影子索引），切换后检索立即可用
+    ensure_vector_indexes(job.target_dimensions)
+
+    job.status = StatusChoices.PROCESSING
+    job.started_at = timezone.now()
+    job.total_chunks = job.knowledge_base.chunks.count()
+    job.processed_chunks = job.total_chunks - _pending_chunks(job).count()
+    job.save(update_fields=['status', 'started_at', 'total_chunks', 'processed_chunks', 'updated_at'])
+
+    try:
+        while True:
+            if not _fill(job, model, batch_size):
+                job.refresh_from_db()
+                return job
+            if _flip(job):
+                break
+    except Exception as exc:
+        job.status = StatusChoices.FAILED
+        job.error_message = str(exc)
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'error_message', 'finished_at', 'updated_at'])
+        raise
+
+    # 写入分块时持有设置行的共享锁（document.services.reconcile_embeddings），_flip 的排他锁要等
+    # 按原设置生成向量的写入全部提交后才能取得，之后的写入会按新设置补齐向量；这里再补齐一次兜底
+    _fill(job, model, batch_size)
+    deleted = _delete_profile(job.knowledge_base_id, job.source_model, job.source_dimensions)
+    logger.info('知识库 %s 已切换到向量模型 %s(%s)，清理旧向量 %s 条',
+                job.knowledge_base_id, job.target_model, job.target_dimensions, deleted)
+    return job
@@ -0,0 +1,212 @@
+"""
+向量检索
+
+先用量化表示快速召回 top_k * rescore_multiplier 个候选，
+再用原始float32向量对候选精确计算余弦距离并重排。
+"""
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import List, Optional, Sequence
+
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import router, transaction
+from django.db.models import F, Subquery, Value
+from django.db.models.functions import Cast
+from pgvector.django import CosineDistance, VectorField
+from pgvector.utils import to_db
+
+from . import quantization
+from .fields import HalfVectorField
+from .indexes import set_filtered_search_params
+from .models import ChunkEmbedding
+
+
+@dataclass
+class VectorHit:
+    """向量检索结果，score为余弦相似度"""
+    chunk_id: str
+    score: float
+
+
+class Int8IndexCache:
+    """
+    按知识库缓存的进程内int8索引，知识库向量版本（KnowledgeBaseSettings.embeddings_version）变化后重建
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, queryset, cache_key, version) -> quantization.Int8Index:
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(cache_key)
+                return entry[1]
+
+        rows = list(queryset.exclude(quantized=None).values_list('id', 'quantized'))
+        index = quantization.Int8Index.from_blobs([row[0] for row in rows], [row[1] for row in rows])
+        with self._lock:
+            self._entries[cache_key] = (version, index)
+            self._entries.move_to_end(cache_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return index
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# int8带过滤检索时每批交给数据库筛选的候选ID数上限
+FILTER_BATCH_MAX = 10000
+
+int8_cache = Int8IndexCache(settings.VECTOR_DATABASE['INT8_CACHE_SIZE'])
+
+
+def embeddings_version(knowledge_base_id) -> int:
+    """知识库当前的向量版本，按主键读取一个字段"""
+    from apps.knowledge_base.models import KnowledgeBaseSettings
+
+    version = KnowledgeBaseSettings.objects.filter(knowledge_base_id=knowledge_base_id).values_list(
+        'embeddings_version', flat=True).first()
+    return version or 0
+
+
+def bump_embeddings_version(knowledge_base_id):
+    """知识库的向量写入、删除或重新编码后调用，事务提交后递增向量版本，使各进程的int8索引重建"""
+    from apps.knowledge_base.models import KnowledgeBaseSettings
+
+    def bump():
+        KnowledgeBaseSettings.objects.filter(knowledge_base_id=knowledge_base_id).update(
+            embeddings_version=F('embeddings_version') + 1)
+    transaction.on_commit(bump)
+
+
+def get_search_settings(knowledge_base):
+    """
+    读取知识库的量化配置，未创建设置时使用默认值；
+    量化方式修改后、重新编码完成前返回原来（仍生效）的量化方式
+    """
+    try:
+        kb_settings = knowledge_base.settings
+    except ObjectDoesNotExist:
+        return quantization.NONE, 4
+    return kb_settings.effective_quantization, kb_settings.rescore_multiplier
+
+
+def get_embedding_profile(knowledge_base):
+    """知识库当前生效的向量模型 (名称, 维度)，尚未固定时使用默认向量模型"""
+    try:
+        kb_settings = knowledge_base.settings
+    except ObjectDoesNotExist:
+        kb_settings = None
+    if kb_settings is not None and kb_settings.embedding_model:
+        return kb_settings.embedding_model, kb_settings.embedding_dimensions or settings.EMBEDDING_DIMENSIONS
+
+    from apps.model_management.registry import get_embedding_model
+    model = get_embedding_model()
+    return model.name, model.dimensions or settings.EMBEDDING_DIMENSIONS
+
+
+class VectorSearcher:
+    """
+    单个知识库的向量检索，只检索知识库当前生效模型的向量
+    """
+
+    def __init__(self, knowledge_base, dimensions: Optional[int] = None,
+                 mode: Optional[str] = None, rescore_multiplier: Optional[int] = None,
+                 model_name: Optional[str] = None, filters=None):
+        self.knowledge_base = knowledge_base
+        if filters is not None and filters.tag_ids is None:
+            filters = filters.resolve(knowledge_base)
+        self.filters = filters
+        if model_name is None or dimensions is None:
+            default_model, default_dimensions = get_embedding_profile(knowledge_base)
+            model_name = model_name or default_model
+            dimensions = dimensions or default_dimensions
+        self.model_name = model_name
+        self.dimensions = dimensions
+        if mode is None or rescore_multiplier is None:
+            default_mode, default_multiplier = get_search_settings(knowledge_base)
+            mode = mode or default_mode
+            rescore_multiplier = rescore_multiplier or default_multiplier
+        self.mode = mode
+        self.rescore_multiplier = max(1, rescore_multiplier)
+
+    def base_queryset(self, using: Optional[str] = None):
+        return ChunkEmbedding.objects.db_manager(using).filter(
+            knowledge_base=self.knowledge_base,
+            model_name=self.model_name,
+            dimensions=self.dimensions,
+            quantization=self.mode,
+        )
+
+    def queryset(self, using: Optional[str] = None):
+        queryset = self.base_queryset(using)
+        if self.filters is not None:
+            queryset = self.filters.apply_to_embeddings(queryset)
+        return queryset
+
+    def _distance(self, query, field_class=VectorField):
+        """与索引表达式一致的距离计算，保证规划器能命中部分表达式索引"""
+        field = field_class(dimensions=self.dimensions)
+        return CosineDistance(Cast('vector', field), Cast(Value(to_db(query)), field))
+
+    def _exact(self, queryset, query, top_k, use_index: bool = True) -> List[VectorHit]:
+        # 不做类型转换时与索引表达式不一致，规划器只能按过滤条件取行后逐条计算
+        distance = self._distance(query) if use_index else CosineDistance('vector', query)
+        rows = queryset.annotate(
+            distance=distance
+        ).order_by('distance').values_list('chunk_id', 'distance')[:top_k]
+        return [VectorHit(chunk_id, 1.0 - distance) for chunk_id, distance in rows]
+
+    def candidates(self, query: Sequence[float], limit: int, using: Optional[str] = None):
+        """量化候选召回，返回ChunkEmbedding主键的查询集或列表"""
+        if self.mode == quantization.FLOAT16:
+            return Subquery(
+                self.queryset(using).annotate(
+                    approx=self._distance(query, HalfVectorField)
+                ).order_by('approx').values('id')[:limit]
+            )
+        index = int8_cache.get(
+            self.base_queryset(using), (self.knowledge_base.pk, self.model_name, self.dimensions),
+            embeddings_version(self.knowledge_base.pk),
+        )
+        if self.filters is None:
+            return index.search(query, limit)
+        # 过滤条件在数据库中判断：按近似分数从高到低分批取候选ID，由SQL筛出满足条件的，凑够 limit 个为止
+        queryset = self.queryset(using)
+        found = []
+        for batch in index.ranked(query, limit, max(limit, FILTER_BATCH_MAX)):
+            matched = set(queryset.filter(id__in=batch).values_list('id', flat=True))
+            found.extend(item for item in batch if item in matched)
+            if len(found) >= limit:
+                break
+        return found[:limit]
+
+    def _search(self, query: Sequence[float], top_k: int, using: Optional[str] = None) -> List[VectorHit]:
+        if self.mode == quantization.NONE:
+            return self._exact(self.queryset(using), query, top_k)
+        candidate_ids = self.candidates(query, top_k * self.rescore_multiplier, using)
+        return self._exact(ChunkEmbedding.objects.db_manager(using).filter(id__in=candidate_ids), query, top_k)
+
+    def search(self, query: Sequence[float], top_k: int) -> List[VectorHit]:
+        """
+        无过滤条件时直接检索；有过滤条件时过滤在同一查询内完成：
+        匹配行数少时按过滤索引取行后精确计算，否则走带过滤的HNSW（迭代扫描补足结果）
+        """
+        if self.filters is None:
+            return self._search(query, top_k)
+        threshold = settings.VECTOR_DATABASE['PREFILTER_EXACT_THRESHOLD']
+        queryset = self.queryset()
+        if queryset[:threshold + 1].count() <= threshold:
+            return self._exact(queryset, query, top_k, use_index=False)
+        # 先按路由确定读库（进入事务后路由只会返回主库），检索参数与查询都在该库的同一事务内
+        using = router.db_for_read(ChunkEmbedding)
+        with transaction.atomic(using=using):
+            set_filtered_search_params(using=using)
+            return self._search(query, top_k, using)
@@ -0,0 +1,32 @@
+"""
+向量化处理序列化器
+"""
+from rest_framework import serializers
+from .models import ReembedJob
+
+
+class ReembedJobSerializer(serializers.ModelSerializer):
+    """
+    重新向量化任务序列化器
+    """
+    progress = serializers.FloatField(read_only=True)
+    eta_seconds = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = ReembedJob
+        fields = [
+            'id', 'knowledge_base', 'source_model', 'source_dimensions',
+            'target_model', 'target_dimensions', 'status', 'total_chunks', 'processed_chunks',
+            'progress', 'eta_seconds', 'rows_per_second', 'started_at', 'finished_at',
+            'error_message', 'created_at', 'updated_at'
+        ]
+        read_only_fields = fields
+
+
+class ReembedRequestSerializer(serializers.Serializer):
+    """
+    发起重新向量化请求
+    """
+    model_name = serializers.CharField(max_length=100, required=False, allow_blank=True)
+    dimensions = serializers.IntegerField(required=False, min_value=1)
+    rows_per_second = serializers.FloatField(required=False, min_value=0)
@@ -0,0 +1,142 @@
+"""
+向量化处理服务
+"""
+import dataclasses
+from typing import List, Optional
+
+from django.db import transaction
+from django.utils import timezone
+
+from apps.core.models import StatusChoices
+from . import quantization
+from .filters import filter_attributes
+from .models import ChunkEmbedding, ReembedJob
+from .search import bump_embeddings_version, get_embedding_profile
+
+
+def resolve_embedding_model(model_name: Optional[str] = None, dimensions: Optional[int] = None):
+    """按名称与维度获取向量模型，维度与模型配置不同时按指定维度生成"""
+    from apps.model_management.registry import get_embedding_model
+
+    model = get_embedding_model(model_name or None)
+    if dimensions and dimensions != model.dimensions:
+        model = dataclasses.replace(model, dimensions=dimensions)
+    return model
+
+
+def active_embedding_model(knowledge_base, pin: bool = True):
+    """
+    知识库当前生效的向量模型
+
+    pin 为 True 时把尚未固定的默认模型写入知识库设置，之后修改全局默认模型不会影响已有知识库。
+    """
+    from apps.knowledge_base.models import KnowledgeBaseSettings
+
+    model = resolve_embedding_model(*get_embedding_profile(knowledge_base))
+    if pin and KnowledgeBaseSettings.objects.filter(
+        knowledge_base=knowledge_base, embedding_model=''
+    ).update(embedding_model=model.name, embedding_dimensions=model.dimensions, updated_at=timezone.now()):
+        knowledge_base.settings.refresh_from_db()
+    return model
+
+
+def shadow_embedding_models(knowledge_base) -> List:
+    """正在进行的重新向量化任务的目标模型，新写入的分块需要同时生成其向量"""
+    jobs = ReembedJob.objects.filter(
+        knowledge_base=knowledge_base, status=StatusChoices.PROCESSING
+    ).values_list('target_model', 'target_dimensions')
+    return [resolve_embedding_model(name, dimensions) for name, dimensions in jobs]
+
+
+def build_embedding(chunk, vector, model_name: str, mode: str) -> ChunkEmbedding:
+    """
+    按知识库量化方式构建（未保存的）分块向量，并冗余文档的过滤字段
+    """
+    return ChunkEmbedding(
+        chunk=chunk,
+        knowledge_base_id=chunk.knowledge_base_id,
+        model_name=model_name,
+        dimensions=len(vector),
+        vector=vector,
+        quantization=mode,
+        quantized=quantization.encode_for_storage(vector, mode),
+        **filter_attributes(chunk.document, chunk.metadata),
+    )
+
+
+def refresh_filter_attributes(document) -> int:
+    """文档标签、类型或元数据变化后更新其向量上的冗余过滤字段"""
+    document._filter_tag_ids = None
+    attributes = filter_attributes(document)
+    # 元数据与分块自身的元数据合并，需要逐分块更新
+    chunk_metadata = dict(document.chunks.values_list('id', 'metadata'))
+    embeddings = list(ChunkEmbedding.objects.filter(chunk__document=document).only('id', 'chunk_id'))
+    for embedding in embeddings:
+        embedding.tag_ids = attributes['tag_ids']
+        embedding.document_type = attributes['document_type']
+        embedding.document_date = attributes['document_date']
+        embedding.metadata = {**attributes['metadata'], **(chunk_metadata.get(embedding.chunk_id) or {})}
+        embedding.updated_at = timezone.now()
+    ChunkEmbedding.objects.bulk_update(
+        embeddings, ['tag_ids', 'document_type', 'document_date', 'metadata', 'updated_at'], batch_size=500
+    )
+    return len(embeddings)
+
+
+def _encode_batches(queryset, mode: str, batch_size: int, relabel: bool = True) -> int:
+    """分批按 mode 重新编码 queryset 中的向量，relabel 为 False 时只写入量化数据、不改变量化标记"""
+    fields = ['quantization', 'quantized', 'updated_at'] if relabel else ['quantized', 'updated_at']
+    processed = 0
+    while True:
+        batch = list(queryset.only('id', 'vector').order_by('id')[:batch_size])
+        if not batch:
+            break
+        now = timezone.now()
+        for embedding in batch:
+            if relabel:
+                embedding.quantization = mode
+            embedding.quantized = quantization.encode_for_storage(embedding.vector, mode)
+            embedding.updated_at = now
+        with transaction.atomic():
+            ChunkEmbedding.objects.bulk_update(batch, fields)
+        processed += len(batch)
+    return processed
+
+
+def requantize_knowledge_base(knowledge_base, batch_size: int = 500) -> int:
+    """
+    把知识库已有向量重新编码为设置中的量化方式，完成后切换生效的量化方式，返回处理的数量
+
+    原始float32向量始终保留，因此量化方式可以随时切换。目标为int8时先分批补齐量化数据，
+    不改变量化标记，检索与写入仍使用原来的方式；之后锁住知识库设置，补齐剩余部分并一次性
+    切换全部向量的量化标记与生效方式，检索不会看到只完成一部分的结果。
+    """
+    from apps.knowledge_base.models import KnowledgeBaseSettings
+
+    embeddings = ChunkEmbedding.objects.filter(knowledge_base=knowledge_base)
+    target = KnowledgeBaseSettings.objects.filter(knowledge_base=knowledge_base).values_list(
+        'vector_quantization', flat=True).first() or quantization.NONE
+    processed = 0
+    if target == quantization.INT8:
+        processed += _encode_batches(embeddings.filter(quantized=None), target, batch_size, relabel=False)
+
+    with transaction.atomic():
+        kb_settings = KnowledgeBaseSettings.objects.select_for_update().filter(knowledge_base=knowledge_base).first()
+        # 期间设置可能再次修改，以锁定后的设置为准
+        target = kb_settings.vector_quantization if kb_settings is not None else quantization.NONE
+        stale = embeddings.exclude(quantization=target)
+        if target == quantization.INT8:
+            processed += _encode_batches(stale.filter(quantized=None), target, batch_size, relabel=False)
+            processed += stale.update(quantization=target, updated_at=timezone.now())
+        else:
+            processed += stale.update(quantization=target, quantized=None, updated_at=timezone.now())
+        if kb_settings is not None and kb_settings.active_quantization:
+            kb_settings.active_quantization = ''
+            kb_settings.save(update_fields=['active_quantization', 'updated_at'])
+        bump_embeddings_version(knowledge_base.pk)
+
+    # 切换前读取了原设置、在切换后才提交的写入
+    stragglers = _encode_batches(embeddings.exclude(quantization=target), target, batch_size)
+    if stragglers:
+        bump_embeddings_version(knowledge_base.pk)
+    return processed + stragglers
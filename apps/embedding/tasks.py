@@ -0,0 +1,28 @@
+"""
+向量化处理异步任务
+"""
+from celery import shared_task
+
+
+@shared_task
+def requantize_knowledge_base_task(knowledge_base_id):
+    """按知识库量化设置重新编码向量"""
+    from apps.knowledge_base.models import KnowledgeBase
+    from .services import requantize_knowledge_base
+
+    knowledge_base = KnowledgeBase.objects.filter(id=knowledge_base_id).first()
+    if knowledge_base is None:
+        return 0
+    return requantize_knowledge_base(knowledge_base)
+
+
+@shared_task
+def reembed_knowledge_base_task(job_id):
+    """执行知识库重新向量化任务"""
+    from .models import ReembedJob
+    from .reembed import run_reembed
+
+    job = ReembedJob.objects.select_related('knowledge_base').filter(id=job_id).first()
+    if job is None:
+        return None
+    return run_reembed(job).status
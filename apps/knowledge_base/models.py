@@ -3,7 +3,7 @@
 """
 from django.db import models
 from django.contrib.auth import get_user_model
-from apps.core.models import BaseModel, UserRelatedModel, SoftDeleteModel, StatusChoices
+from apps.core.models import LIVE, BaseModel, UserRelatedModel, SoftDeleteModel, StatusChoices
 
 User = get_user_model()
 
@@ -39,6 +39,15 @@ class KnowledgeBase(UserRelatedModel, SoftDeleteModel):
         verbose_name = '知识库'
         verbose_name_plural = '知识库'
         ordering = ['-created_at']
+        # 只索引未删除的行，软删除的行累积时索引大小与查询速度不受影响
+        indexes = [
+            # 名称唯一性校验、按创建者列出
+            models.Index(fields=['created_by', 'name'], condition=LIVE, name='kb_live_owner_name_idx'),
+            # 公开知识库列表（按创建时间倒序）
+            models.Index(fields=['-created_at'], condition=LIVE & models.Q(is_public=True),
+                         name='kb_live_public_idx'),
+            models.Index(fields=['-created_at'], condition=LIVE, name='kb_live_created_idx'),
+        ]
     
     def __str__(self):
         return self.name
@@ -46,7 +55,7 @@ class KnowledgeBase(UserRelatedModel, SoftDeleteModel):
     def update_stats(self):
         """更新统计信息"""
         from apps.document.models import Document
-        documents = Document.objects.filter(knowledge_base=self, is_deleted=False)
+        documents = Document.objects.filter(knowledge_base=self)
         self.documents_count = documents.count()
         self.chunks_count = sum(doc.chunks_count for doc in documents)
         self.total_size = sum(doc.file_size for doc in documents)
@@ -148,6 +157,28 @@ class KnowledgeBaseSettings(BaseModel):
         verbose_name='检索模式'
     )
     
+    # 向量量化设置
+    vector_quantization = models.CharField(
+        max_length=20,
+        choices=[
+            ('none', '不量化(float32)'),
+            ('float16', '半精度(halfvec)'),
+            ('int8', 'int8标量量化')
+        ],
+        default='none',
+        verbose_name='向量量化方式'
+    )
+    rescore_multiplier = models.IntegerField(default=4, verbose_name='重排候选倍数')
+    # 向量当前使用的量化方式，为空表示与 vector_quantization 相同；修改 vector_quantization 后
+    # 由后台任务重新编码全部向量再切换，期间写入与检索仍使用这里的方式
+    active_quantization = models.CharField(max_length=20, blank=True, default='', verbose_name='生效的量化方式')
+    # 知识库向量写入、删除或重新编码后递增（不更新 updated_at），进程内int8索引据此判断是否需要重建
+    embeddings_version = models.BigIntegerField(default=0, verbose_name='向量版本')
+    
+    # 当前生效的向量模型，首次向量化时固定下来，之后只能通过重新向量化任务切换
+    embedding_model = models.CharField(max_length=100, blank=True, default='', verbose_name='向量模型')
+    embedding_dimensions = models.IntegerField(null=True, blank=True, verbose_name='向量维度')
+    
     # 其他设置
     enable_rerank = models.BooleanField(default=False, verbose_name='启用重排序')
     rerank_model = models.CharField(
@@ -163,4 +194,8 @@ class KnowledgeBaseSettings(BaseModel):
         verbose_name_plural = '知识库设置'
     
     def __str__(self):
-        return f"{self.knowledge_base.name} - Settings" 
\ No newline at end of file
+        return f"{self.knowledge_base.name} - Settings"
+
+    @property
+    def effective_quantization(self) -> str:
+        return self.active_quantization or self.vector_quantization 
\ No newline at end of file
@@ -0,0 +1,217 @@
+"""
+软删除知识库的永久清理
+
+软删除超过保留期（KB_PURGE['RETENTION_DAYS']）的知识库，连同其文档、文件、分块、向量、
+标签、分享、设置、网页数据源与重新向量化任务一起删除；引用该知识库的工作流只解除关联。
+
+按依赖从叶子到根逐表删除，每批最多 BATCH_SIZE 行、各自一个短事务，批次之间暂停
+BATCH_PAUSE 秒；配置了只读副本时，复制延迟超过 DB_REPLICAS['MAX_LAG'] 会等待追上后再继续，
+避免长时间持锁与副本延迟。每一批都在删除的事务内锁定知识库行并确认其仍处于软删除状态，
+恢复操作要等当前批次提交，期间被恢复的知识库在下一批停止清理。
+dry_run 只统计将要删除的行数与文件大小，不做任何修改。
+"""
+import logging
+import time
+from collections import Counter
+from datetime import timedelta
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import KnowledgeBase, KnowledgeBaseSettings, KnowledgeBaseShare, KnowledgeBaseTag
+
+logger = logging.getLogger('manxiai.knowledge_base')
+
+
+class PurgeAborted(Exception):
+    """清理过程中知识库被恢复"""
+
+
+def purge_candidates(retention_days: Optional[int] = None, limit: Optional[int] = None) -> List[KnowledgeBase]:
+    """软删除时间早于保留期的知识库，最早删除的优先"""
+    config = settings.KB_PURGE
+    retention_days = config['RETENTION_DAYS'] if retention_days is None else retention_days
+    limit = config['MAX_KNOWLEDGE_BASES'] if limit is None else limit
+    cutoff = timezone.now() - timedelta(days=retention_days)
+    return list(KnowledgeBase.all_objects.filter(
+        is_deleted=True, deleted_at__lte=cutoff,
+    ).order_by('deleted_at')[:limit])
+
+
+def _steps(knowledge_base_id):
+    """(名称, 查询集) 按删除顺序排列，前面的表不再被后面的表引用"""
+    from apps.document.models import Document, DocumentChunk, WebSource
+    from apps.embedding.models import ChunkEmbedding, ReembedJob
+
+    document_tags = Document.tags.through
+    return [
+        ('chunk_embeddings', ChunkEmbedding.objects.filter(knowledge_base_id=knowledge_base_id)),
+        # 分块与向量的 knowledge_base 应与所属文档一致，不一致的数据也一并清理
+        ('chunk_embeddings', ChunkEmbedding.objects.filter(
+            chunk__knowledge_base_id=knowledge_base_id,
+        ).exclude(knowledge_base_id=knowledge_base_id)),
+        ('document_chunks', DocumentChunk.objects.filter(knowledge_base_id=knowledge_base_id)),
+        ('document_chunks', DocumentChunk.objects.filter(
+            document__knowledge_base_id=knowledge_base_id,
+        ).exclude(knowledge_base_id=knowledge_base_id)),
+        ('document_tags', document_tags.objects.filter(document__knowledge_base_id=knowledge_base_id)),
+        ('documents', Document.all_objects.filter(knowledge_base_id=knowledge_base_id)),
+        ('web_sources', WebSource.objects.filter(knowledge_base_id=knowledge_base_id)),
+        ('reembed_jobs', ReembedJob.objects.filter(knowledge_base_id=knowledge_base_id)),
+        ('tags', KnowledgeBaseTag.objects.filter(knowledge_base_id=knowledge_base_id)),
+        ('shares', KnowledgeBaseShare.objects.filter(knowledge_base_id=knowledge_base_id)),
+        ('settings', KnowledgeBaseSettings.objects.filter(knowledge_base_id=knowledge_base_id)),
+    ]
+
+
+class KnowledgeBasePurger:
+    """
+    分批删除软删除的知识库
+    """
+
+    def __init__(self, batch_size: Optional[int] = None, pause: Optional[float] = None, dry_run: bool = False):
+        config = settings.KB_PURGE
+        self.batch_size = batch_size or config['BATCH_SIZE']
+        self.pause = config['BATCH_PAUSE'] if pause is None else pause
+        self.dry_run = dry_run
+        self.rows: Counter = Counter()
+        self.batches = 0
+        self.files = 0
+        self.bytes = 0
+        self.file_errors = 0
+
+    def _throttle(self):
+        """批次之间暂停，并等待只读副本追上"""
+        if self.pause > 0:
+            time.sleep(self.pause)
+        aliases = settings.DB_REPLICAS['ALIASES']
+        if not aliases:
+            return
+        from apps.core.replicas import replica_monitor
+
+        max_lag = settings.DB_REPLICAS['MAX_LAG']
+        deadline = time.monotonic() + settings.KB_PURGE['MAX_LAG_WAIT']
+        while time.monotonic() < deadline:
+            lags = []
+            for alias in aliases:
+                try:
+                    lags.append(replica_monitor.measure_lag(alias))
+                except Exception:
+                    # 不可用的副本不参与读流量，不等待
+                    continue
+            if all(lag is not None and lag <= max_lag for lag in lags):
+                return
+            time.sleep(max(self.pause, 1.0))
+        logger.warning('等待只读副本追上超时，继续清理')
+
+    def _ensure_deleted(self, knowledge_base_id):
+        """在当前事务内锁定知识库行并确认仍处于软删除状态，恢复（更新该行）要等事务提交"""
+        locked = KnowledgeBase.all_objects.select_for_update().filter(
+            pk=knowledge_base_id, is_deleted=True,
+        ).values_list('pk', flat=True)
+        if not list(locked):
+            raise PurgeAborted(f'知识库 {knowledge_base_id} 已恢复，停止清理')
+
+    def _delete_files(self, documents: List[Dict]):
+        """数据库删除提交后再删除文件；其他文档仍引用的文件保留"""
+        from apps.document.models import Document
+
+        names = [document['file'] for document in documents if document['file']]
+        if not names:
+            return
+        shared = set(Document.all_objects.filter(file__in=names).values_list('file', flat=True))
+        storage = Document._meta.get_field('file').storage
+        for document in documents:
+            name = document['file']
+            if not name or name in shared:
+                continue
+            try:
+                storage.delete(name)
+            except Exception as exc:
+                self.file_errors += 1
+                logger.warning('删除文档文件 %s 失败: %s', name, exc)
+                continue
+            self.files += 1
+            self.bytes += document['file_size']
+
+    def _delete_batches(self, knowledge_base_id, name: str, queryset):
+        model = queryset.model
+        is_documents = name == 'documents'
+        while True:
+            pks = list(queryset.order_by().values_list('pk', flat=True)[:self.batch_size])
+            if not pks:
+                return
+            documents = []
+            if is_documents:
+                documents = list(model._base_manager.filter(pk__in=pks).values('file', 'file_size'))
+            with transaction.atomic():
+                self._ensure_deleted(knowledge_base_id)
+                # 依赖表已清空，Django 直接执行一条 DELETE，不加载对象
+                deleted, _ = model._base_manager.filter(pk__in=pks).delete()
+            self.rows[name] += deleted
+            self.batches += 1
+            if documents:
+                self._delete_files(documents)
+            self._throttle()
+
+    def purge(self, knowledge_base: KnowledgeBase) -> bool:
+        """清理单个知识库，返回是否完成（dry_run 时只统计）"""
+        from apps.workflow.models import Workflow
+
+        knowledge_base_id = knowledge_base.pk
+        try:
+            for name, queryset in _steps(knowledge_base_id):
+                if self.dry_run:
+                    self.rows[name] += queryset.count()
+                    if name == 'documents':
+                        self.bytes += queryset.aggregate(total=Sum('file_size'))['total'] or 0
+                    continue
+                self._delete_batches(knowledge_base_id, name, queryset)
+
+            workflows = Workflow.all_objects.filter(knowledge_base_id=knowledge_base_id)
+            if self.dry_run:
+                self.rows['workflows_detached'] += workflows.count()
+                self.rows['knowledge_bases'] += 1
+                return True
+            with transaction.atomic():
+                self._ensure_deleted(knowledge_base_id)
+                self.rows['workflows_detached'] += workflows.update(knowledge_base=None)
+                deleted, _ = KnowledgeBase.all_objects.filter(pk=knowledge_base_id, is_deleted=True).delete()
+            self.rows['knowledge_bases'] += deleted
+        except PurgeAborted as exc:
+            logger.warning(str(exc))
+            return False
+        logger.info('已清理软删除的知识库 %s（%s）', knowledge_base_id, knowledge_base.name)
+        return True
+
+    def report(self) -> Dict:
+        return {
+            'dry_run': self.dry_run,
+            'rows': dict(self.rows),
+            'batches': self.batches,
+            'files_deleted': self.files,
+            'bytes_freed': self.bytes,
+            'file_errors': self.file_errors,
+        }
+
+
+def purge_deleted_knowledge_bases(dry_run: bool = False, retention_days: Optional[int] = None,
+                                  limit: Optional[int] = None) -> Dict:
+    """
+    清理到期的软删除知识库，返回统计（各表删除行数、批次数、删除的文件数与字节数、耗时）
+    """
+    started = time.perf_counter()
+    candidates = purge_candidates(retention_days, limit)
+    purger = KnowledgeBasePurger(dry_run=dry_run)
+    aborted = [str(kb.pk) for kb in candidates if not purger.purge(kb)]
+    report = {
+        'candidates': len(candidates),
+        'aborted': aborted,
+        **purger.report(),
+        'duration_seconds': round(time.perf_counter() - started, 3),
+    }
+    logger.info('软删除知识库清理%s: %s', '（演练）' if dry_run else '', report)
+    return report
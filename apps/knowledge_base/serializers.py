@@ -2,6 +2,7 @@
 知识库管理序列化器
 """
 from rest_framework import serializers
+from apps.core.rows import RowSerializer
 from .models import KnowledgeBase, KnowledgeBaseShare, KnowledgeBaseTag, KnowledgeBaseSettings
 
 
@@ -32,7 +33,6 @@ class KnowledgeBaseSerializer(serializers.ModelSerializer):
         if KnowledgeBase.objects.filter(
             name=value,
             created_by=user,
-            is_deleted=False
         ).exclude(id=self.instance.id if self.instance else None).exists():
             raise serializers.ValidationError("知识库名称已存在")
         return value
@@ -59,6 +59,25 @@ class KnowledgeBaseShareSerializer(serializers.ModelSerializer):
         ]
 
 
+class KnowledgeBaseShareRowSerializer(RowSerializer):
+    """
+    知识库分享列表的行序列化器，输出与 KnowledgeBaseShareSerializer 相同
+    """
+    model = KnowledgeBaseShare
+    fields = {
+        'id': 'id',
+        'knowledge_base': 'knowledge_base',
+        'knowledge_base_name': 'knowledge_base__name',
+        'shared_with': 'shared_with',
+        'shared_with_name': 'shared_with__username',
+        'shared_with_email': 'shared_with__email',
+        'permission': 'permission',
+        'permissions': 'permissions',
+        'created_at': 'created_at',
+        'updated_at': 'updated_at',
+    }
+
+
 class KnowledgeBaseTagSerializer(serializers.ModelSerializer):
     """
     知识库标签序列化器
@@ -73,13 +92,36 @@ class KnowledgeBaseSettingsSerializer(serializers.ModelSerializer):
     """
     知识库设置序列化器
     """
+    # 修改量化方式后，重新编码完成前检索仍使用的量化方式
+    active_quantization = serializers.CharField(source='effective_quantization', read_only=True)
     class Meta:
         model = KnowledgeBaseSettings
         fields = [
             'id', 'auto_index', 'index_schedule', 'search_mode',
+            'vector_quantization', 'active_quantization', 'rescore_multiplier',
+            'embedding_model', 'embedding_dimensions',
             'enable_rerank', 'rerank_model', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'created_at', 'updated_at']
+        # 向量模型只能通过重新向量化任务切换
+        read_only_fields = ['id', 'embedding_model', 'embedding_dimensions', 'created_at', 'updated_at']
+
+    def update(self, instance, validated_data):
+        # 只保存提交的字段，不覆盖后台任务并发修改的生效量化方式与向量版本
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        instance.save(update_fields=[*validated_data, 'updated_at'])
+        return instance
+    
+    def validate_index_schedule(self, value):
+        """验证索引计划为有效的cron表达式"""
+        if not value:
+            return value
+        from apps.document.scheduling import parse_schedule
+        try:
+            parse_schedule(value)
+        except ValueError as exc:
+            raise serializers.ValidationError(str(exc))
+        return ' '.join(value.split())
 
 
 class KnowledgeBaseListSerializer(serializers.ModelSerializer):
@@ -101,6 +143,27 @@ class KnowledgeBaseListSerializer(serializers.ModelSerializer):
         ]
 
 
+class KnowledgeBaseListRowSerializer(RowSerializer):
+    """
+    知识库列表的行序列化器，输出与 KnowledgeBaseListSerializer 相同
+    """
+    model = KnowledgeBase
+    fields = {
+        'id': 'id',
+        'name': 'name',
+        'description': 'description',
+        'icon': 'icon',
+        'status': 'status',
+        'is_public': 'is_public',
+        'documents_count': 'documents_count',
+        'chunks_count': 'chunks_count',
+        'total_size': 'total_size',
+        'created_by_name': 'created_by__username',
+        'created_at': 'created_at',
+        'updated_at': 'updated_at',
+    }
+
+
 class KnowledgeBaseCreateSerializer(serializers.ModelSerializer):
     """
     创建知识库序列化器
@@ -118,7 +181,6 @@ class KnowledgeBaseCreateSerializer(serializers.ModelSerializer):
         if KnowledgeBase.objects.filter(
             name=value,
             created_by=user,
-            is_deleted=False
         ).exists():
             raise serializers.ValidationError("知识库名称已存在")
         return value 
\ No newline at end of file
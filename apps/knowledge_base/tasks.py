@@ -0,0 +1,12 @@
+"""
+知识库异步任务
+"""
+from celery import shared_task
+
+
+@shared_task
+def purge_deleted_knowledge_bases(dry_run=False, retention_days=None, limit=None):
+    """由 Celery beat 每天触发，永久删除超过保留期的软删除知识库"""
+    from .purge import purge_deleted_knowledge_bases as purge
+
+    return purge(dry_run=dry_run, retention_days=retention_days, limit=limit)
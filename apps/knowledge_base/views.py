@@ -6,23 +6,79 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from apps.core.conditional import Version, collection_version, conditional_get, latest
+from apps.core.replicas import ReplicaReadMixin
+from apps.core.rows import RowListMixin
 from .models import KnowledgeBase, KnowledgeBaseShare, KnowledgeBaseTag, KnowledgeBaseSettings
 from .serializers import (
     KnowledgeBaseSerializer, KnowledgeBaseListSerializer, KnowledgeBaseCreateSerializer,
-    KnowledgeBaseShareSerializer, KnowledgeBaseTagSerializer, KnowledgeBaseSettingsSerializer
+    KnowledgeBaseShareSerializer, KnowledgeBaseTagSerializer, KnowledgeBaseSettingsSerializer,
+    KnowledgeBaseListRowSerializer, KnowledgeBaseShareRowSerializer
 )
 
 User = get_user_model()
 
 
-class KnowledgeBaseViewSet(viewsets.ModelViewSet):
+def _accessible(view, pk):
+    """当前用户可访问的该知识库查询集，主键格式无效时返回None（交给视图返回404）"""
+    try:
+        return view.get_queryset().filter(pk=pk)
+    except (TypeError, ValueError, ValidationError):
+        return None
+
+
+def knowledge_base_version(view, request, pk=None):
+    """详情：知识库与创建者（created_by_name）的更新时间，标签增删时会更新知识库的 updated_at"""
+    queryset = _accessible(view, pk)
+    row = queryset.values('updated_at', 'created_by__updated_at').first() if queryset is not None else None
+    if row is None:
+        return None
+    return Version(
+        parts=(row['updated_at'], row['created_by__updated_at']),
+        last_modified=latest(row['updated_at'], row['created_by__updated_at']),
+    )
+
+
+def knowledge_base_settings_version(view, request, pk=None):
+    queryset = _accessible(view, pk)
+    updated_at = queryset.values_list('settings__updated_at', flat=True).first() if queryset is not None else None
+    if updated_at is None:
+        return None
+    return Version(parts=(updated_at,), last_modified=updated_at)
+
+
+def knowledge_base_shares_version(view, request, pk=None):
+    """分享列表：知识库名称、分享记录与被分享用户"""
+    queryset = _accessible(view, pk)
+    updated_at = queryset.values_list('updated_at', flat=True).first() if queryset is not None else None
+    if updated_at is None:
+        return None
+    shares = collection_version(
+        KnowledgeBaseShare.objects.filter(knowledge_base_id=pk), 'shared_with__updated_at'
+    )
+    return Version(parts=(updated_at, *shares.parts))
+
+
+def knowledge_base_list_version(view, request, queryset=None):
+    """列表：知识库与创建者的更新时间；未指定查询集时为列表接口（含过滤）的查询集"""
+    if queryset is None:
+        queryset = view.filter_queryset(view.get_queryset())
+    return collection_version(queryset, 'created_by__updated_at')
+
+
+class KnowledgeBaseViewSet(ReplicaReadMixin, RowListMixin, viewsets.ModelViewSet):
     """
     知识库管理视图集
     """
-    queryset = KnowledgeBase.objects.filter(is_deleted=False)
+    queryset = KnowledgeBase.objects.all()
     serializer_class = KnowledgeBaseSerializer
+    # 列表接口按行投影序列化，输出与 KnowledgeBaseListSerializer 相同
+    row_serializer_class = KnowledgeBaseListRowSerializer
     permission_classes = [permissions.IsAuthenticated]
+    replica_actions = ('list', 'retrieve', 'shares', 'public', 'shared_with_me')
+    throttle_scopes = {'reembed': 'expensive'}
     
     def get_queryset(self):
         """
@@ -45,6 +101,14 @@ class KnowledgeBaseViewSet(viewsets.ModelViewSet):
             return KnowledgeBaseCreateSerializer
         return KnowledgeBaseSerializer
     
+    @conditional_get(knowledge_base_list_version)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+    
+    @conditional_get(knowledge_base_version)
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+    
     def perform_create(self, serializer):
         """
         创建知识库时设置创建者
@@ -110,14 +174,14 @@ class KnowledgeBaseViewSet(viewsets.ModelViewSet):
             return Response({'error': '分享记录不存在'}, status=status.HTTP_404_NOT_FOUND)
     
     @action(detail=True, methods=['get'])
+    @conditional_get(knowledge_base_shares_version)
     def shares(self, request, pk=None):
         """
         获取知识库分享列表
         """
         kb = self.get_object()
         shares = KnowledgeBaseShare.objects.filter(knowledge_base=kb)
-        serializer = KnowledgeBaseShareSerializer(shares, many=True)
-        return Response(serializer.data)
+        return Response(KnowledgeBaseShareRowSerializer().serialize(shares))
     
     @action(detail=True, methods=['post'])
     def add_tag(self, request, pk=None):
@@ -140,6 +204,8 @@ class KnowledgeBaseViewSet(viewsets.ModelViewSet):
         if not created:
             return Response({'error': '标签已存在'}, status=status.HTTP_400_BAD_REQUEST)
         
+        # 标签列表属于知识库详情，更新 updated_at 使详情的 ETag/Last-Modified 失效
+        kb.save(update_fields=['updated_at'])
         serializer = KnowledgeBaseTagSerializer(tag)
         return Response(serializer.data)
     
@@ -157,27 +223,70 @@ class KnowledgeBaseViewSet(viewsets.ModelViewSet):
         try:
             tag = KnowledgeBaseTag.objects.get(knowledge_base=kb, name=tag_name)
             tag.delete()
+            kb.save(update_fields=['updated_at'])
             return Response({'message': '标签删除成功'})
         except KnowledgeBaseTag.DoesNotExist:
             return Response({'error': '标签不存在'}, status=status.HTTP_404_NOT_FOUND)
     
-    @action(detail=True, methods=['get', 'put'])
-    def settings(self, request, pk=None):
+    # 方法名不能为 settings，否则会覆盖 APIView.settings（DRF 配置）
+    @action(detail=True, methods=['get', 'put'], url_path='settings', url_name='settings')
+    @conditional_get(knowledge_base_settings_version)
+    def kb_settings(self, request, pk=None):
         """
         获取或更新知识库设置
         """
         kb = self.get_object()
-        settings, created = KnowledgeBaseSettings.objects.get_or_create(knowledge_base=kb)
         
         if request.method == 'GET':
+            settings, created = KnowledgeBaseSettings.objects.get_or_create(knowledge_base=kb)
             serializer = KnowledgeBaseSettingsSerializer(settings)
             return Response(serializer.data)
         elif request.method == 'PUT':
-            serializer = KnowledgeBaseSettingsSerializer(settings, data=request.data, partial=True)
-            if serializer.is_valid():
+            from apps.embedding.tasks import requantize_knowledge_base_task
+
+            with transaction.atomic():
+                # 与重新编码任务的切换互斥
+                settings, created = KnowledgeBaseSettings.objects.select_for_update().get_or_create(knowledge_base=kb)
+                active = settings.effective_quantization
+                serializer = KnowledgeBaseSettingsSerializer(settings, data=request.data, partial=True)
+                if not serializer.is_valid():
+                    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
                 serializer.save()
-                return Response(serializer.data)
-            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+                if settings.vector_quantization != active:
+                    # 新的量化方式在后台重新编码全部向量后生效，期间检索仍使用原来的方式
+                    settings.active_quantization = active
+                    settings.save(update_fields=['active_quantization'])
+                    transaction.on_commit(lambda: requantize_knowledge_base_task.delay(str(kb.id)))
+            return Response(KnowledgeBaseSettingsSerializer(settings).data)
+    
+    @action(detail=True, methods=['get', 'post', 'delete'])
+    def reembed(self, request, pk=None):
+        """
+        重新向量化：GET查看最近一次任务进度，POST发起，DELETE取消进行中的任务
+        """
+        from apps.embedding.models import ReembedJob
+        from apps.embedding.reembed import ReembedError, cancel_reembed, start_reembed
+        from apps.embedding.serializers import ReembedJobSerializer, ReembedRequestSerializer
+
+        kb = self.get_object()
+        job = ReembedJob.objects.filter(knowledge_base=kb).first()
+
+        if request.method == 'POST':
+            serializer = ReembedRequestSerializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+            try:
+                job = start_reembed(kb, **serializer.validated_data)
+            except ReembedError as exc:
+                return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+            return Response(ReembedJobSerializer(job).data, status=status.HTTP_201_CREATED)
+
+        if job is None:
+            return Response({'error': '没有重新向量化任务'}, status=status.HTTP_404_NOT_FOUND)
+        if request.method == 'DELETE':
+            if not job.is_active:
+                return Response({'error': '任务已结束'}, status=status.HTTP_400_BAD_REQUEST)
+            job = cancel_reembed(job)
+        return Response(ReembedJobSerializer(job).data)
     
     @action(detail=True, methods=['post'])
     def update_stats(self, request, pk=None):
@@ -189,21 +298,24 @@ class KnowledgeBaseViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(kb)
         return Response(serializer.data)
     
+    def public_queryset(self):
+        return KnowledgeBase.objects.filter(is_public=True)
+    
+    def shared_with_me_queryset(self):
+        return KnowledgeBase.objects.filter(shares__shared_with=self.request.user)
+    
     @action(detail=False, methods=['get'])
+    @conditional_get(lambda view, request: knowledge_base_list_version(view, request, view.public_queryset()))
     def public(self, request):
         """
         获取公开的知识库
         """
-        public_kbs = KnowledgeBase.objects.filter(is_public=True, is_deleted=False)
-        serializer = KnowledgeBaseListSerializer(public_kbs, many=True)
-        return Response(serializer.data)
+        return Response(self.get_row_serializer().serialize(self.public_queryset()))
     
     @action(detail=False, methods=['get'])
+    @conditional_get(lambda view, request: knowledge_base_list_version(view, request, view.shared_with_me_queryset()))
     def shared_with_me(self, request):
         """
         获取分享给我的知识库
         """
-        shares = KnowledgeBaseShare.objects.filter(shared_with=request.user)
-        kbs = [share.knowledge_base for share in shares]
-        serializer = KnowledgeBaseListSerializer(kbs, many=True)
-        return Response(serializer.data) 
\ No newline at end of file
+        return Response(self.get_row_serializer().serialize(self.shared_with_me_queryset())) 
\ No newline at end of file
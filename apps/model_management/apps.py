@@ -4,4 +4,16 @@ from django.apps import AppConfig
 class ModelManagementConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.model_management'
-    verbose_name = '模型管理' 
\ No newline at end of file
+    verbose_name = '模型管理'
+
+    def ready(self):
+        from django.db.models.signals import post_save, post_delete
+        from .models import ModelProvider, AIModel
+        from .registry import registry
+
+        def invalidate_registry(sender, **kwargs):
+            registry.invalidate()
+
+        for model in (ModelProvider, AIModel):
+            post_save.connect(invalidate_registry, sender=model, weak=False)
+            post_delete.connect(invalidate_registry, sender=model, weak=False)
@@ -0,0 +1,197 @@
+"""
+查询向量缓存
+
+检索时的查询文本按 (供应商配置, 模型, 维度, 规范化文本) 缓存向量，分两级：
+- 进程内LRU：有界，命中时没有任何网络往返；
+- Redis：所有worker共享，值为float32原始字节（1536维约6KB），带过期时间。
+
+Redis不可用时只使用进程内缓存一段时间，不影响检索。
+"""
+import hashlib
+import logging
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+from django.conf import settings
+
+logger = logging.getLogger('manxiai.model_management')
+
+KEY_PREFIX = 'manxiai:qemb'
+STATS_KEY = f'{KEY_PREFIX}:stats'
+
+
+def normalize_query(text: str) -> str:
+    """全角/半角等统一（NFKC），合并连续空白"""
+    return ' '.join(unicodedata.normalize('NFKC', text or '').split())
+
+
+class QueryEmbeddingCache:
+    """
+    两级查询向量缓存
+    """
+
+    RETRY_INTERVAL = 30.0
+
+    def __init__(self, max_entries: int = 2048, ttl: int = 86400, use_redis: bool = True, client=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.use_redis = use_redis
+        self._client = client
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._retry_at = 0.0
+        self._stats = {'local_hits': 0, 'redis_hits': 0, 'misses': 0}
+        # 尚未累加到Redis共享统计的进程内命中数，随下一次Redis请求一起提交
+        self._pending_local_hits = 0
+
+    @staticmethod
+    def make_key(provider: str, model: str, dimensions: Optional[int], text: str) -> str:
+        """provider 为供应商配置标识（ProviderConfig.key），不同供应商的同名模型、修改后的配置互不复用"""
+        digest = hashlib.blake2b(normalize_query(text).encode('utf-8'), digest_size=16).hexdigest()
+        return f'{KEY_PREFIX}:{provider}:{model}:{dimensions or 0}:{digest}'
+
+    def _redis(self):
+        if not self.use_redis or time.monotonic() < self._retry_at:
+            return None
+        if self._client is None:
+            from apps.core.redis import get_redis
+            self._client = get_redis()
+        return self._client
+
+    def _redis_failed(self, exc):
+        logger.warning('查询向量缓存的Redis不可用，%s 秒内只使用进程内缓存: %s', self.RETRY_INTERVAL, exc)
+        self._retry_at = time.monotonic() + self.RETRY_INTERVAL
+
+    def _local_get(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+            return vector
+
+    def _local_set(self, key: str, vector: List[float]):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = vector
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _count(self, name: str):
+        with self._lock:
+            self._stats[name] += 1
+            if name == 'local_hits':
+                self._pending_local_hits += 1
+
+    def _take_pending(self) -> int:
+        with self._lock:
+            pending, self._pending_local_hits = self._pending_local_hits, 0
+            return pending
+
+    def _redis_get(self, client, key: str) -> Optional[List[float]]:
+        pending = self._take_pending()
+        pipe = client.pipeline(transaction=False)
+        pipe.get(key)
+        pipe.hincrby(STATS_KEY, 'lookups', 1)
+        if pending:
+            pipe.hincrby(STATS_KEY, 'local_hits', pending)
+        blob = pipe.execute()[0]
+        if blob is None:
+            return None
+        return np.frombuffer(blob, dtype=np.float32).tolist()
+
+    def _redis_set(self, client, key: str, vector: List[float]):
+        pipe = client.pipeline(transaction=False)
+        pipe.set(key, np.asarray(vector, dtype=np.float32).tobytes(), ex=self.ttl)
+        pipe.hincrby(STATS_KEY, 'misses', 1)
+        pipe.execute()
+
+    def get_or_embed(self, provider: str, model: str, dimensions: Optional[int], text: str,
+                     embed: Callable[[str], List[float]]) -> List[float]:
+        """
+        返回缓存的查询向量，未命中时调用 embed(规范化文本) 并写入两级缓存
+        """
+        normalized = normalize_query(text)
+        key = self.make_key(provider, model, dimensions, normalized)
+        vector = self._local_get(key)
+        if vector is not None:
+            self._count('local_hits')
+            return vector
+
+        client = self._redis()
+        if client is not None:
+            try:
+                vector = self._redis_get(client, key)
+            except Exception as exc:
+                self._redis_failed(exc)
+            if vector is not None:
+                self._count('redis_hits')
+                self._local_set(key, vector)
+                return vector
+
+        self._count('misses')
+        vector = embed(normalized)
+        self._local_set(key, vector)
+        client = self._redis()
+        if client is not None:
+            try:
+                self._redis_set(client, key, vector)
+            except Exception as exc:
+                self._redis_failed(exc)
+        return vector
+
+    def stats(self) -> Dict:
+        """本进程统计，以及Redis中所有worker的共享统计"""
+        with self._lock:
+            local = dict(self._stats, size=len(self._entries), max_entries=self.max_entries)
+        total = local['local_hits'] + local['redis_hits'] + local['misses']
+        local['hit_rate'] = round((total - local['misses']) / total, 4) if total else 0.0
+        report = {'process': local}
+
+        client = self._redis()
+        if client is not None:
+            try:
+                pending = self._take_pending()
+                if pending:
+                    client.hincrby(STATS_KEY, 'local_hits', pending)
+                raw = client.hgetall(STATS_KEY)
+            except Exception as exc:
+                self._redis_failed(exc)
+            else:
+                shared = {key.decode(): int(value) for key, value in raw.items()}
+                lookups = shared.get('lookups', 0)
+                misses = shared.get('misses', 0)
+                local_hits = shared.get('local_hits', 0)
+                total = lookups + local_hits
+                report['shared'] = {
+                    'local_hits': local_hits,
+                    'redis_hits': max(0, lookups - misses),
+                    'misses': misses,
+                    'hit_rate': round((total - misses) / total, 4) if total else 0.0,
+                }
+        return report
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._stats = {'local_hits': 0, 'redis_hits': 0, 'misses': 0}
+            self._pending_local_hits = 0
+
+
+def build_query_cache() -> QueryEmbeddingCache:
+    """BACKEND: redis 两级缓存，local 只用进程内缓存，none 关闭"""
+    config = settings.QUERY_EMBEDDING_CACHE
+    backend = config['BACKEND']
+    return QueryEmbeddingCache(
+        max_entries=config['MAX_ENTRIES'] if backend != 'none' else 0,
+        ttl=config['TTL'],
+        use_redis=backend == 'redis',
+    )
+
+
+query_embedding_cache = build_query_cache()
@@ -0,0 +1,380 @@
+"""
+模型供应商客户端
+
+每个供应商持有一个长连接复用的HTTP连接池，并在调用前经过供应商级别的限流。
+"""
+import asyncio
+import hashlib
+import logging
+import math
+import random
+import json
+import re
+import socket
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from .limits import ProviderLimiter, estimate_tokens
+
+logger = logging.getLogger('manxiai.model_management')
+
+# 可重试的上游状态码
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class ProviderError(Exception):
+    """供应商调用失败"""
+
+
+@dataclass
+class ProviderConfig:
+    """
+    供应商配置快照，与ORM对象解耦以便在线程和事件循环中共享
+    """
+    key: str
+    provider_type: str
+    base_url: str = ''
+    api_key: str = ''
+    max_connections: int = 20
+    max_concurrency: int = 16
+    tokens_per_minute: int = 0
+    timeout: float = 60.0
+    extra: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def provider_id(self) -> str:
+        """供应商标识：模型管理中的供应商主键，或 settings / local，不随配置变更"""
+        return self.key.split(':', 1)[0]
+
+    @classmethod
+    def from_provider(cls, provider):
+        return cls(
+            key=f'{provider.pk}:{provider.updated_at.timestamp() if provider.updated_at else 0}',
+            provider_type=provider.provider_type,
+            base_url=provider.base_url,
+            api_key=provider.api_key,
+            max_connections=provider.max_connections,
+            max_concurrency=provider.max_concurrency,
+            tokens_per_minute=provider.tokens_per_minute,
+            timeout=provider.timeout,
+            extra=provider.extra_config or {},
+        )
+
+
+@dataclass
+class ChatResult:
+    """对话结果"""
+    text: str
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    model: str = ''
+
+    @property
+    def total_tokens(self):
+        return self.prompt_tokens + self.completion_tokens
+
+
+def messages_tokens(messages: List[Dict[str, str]]) -> int:
+    return sum(estimate_tokens(message.get('content') or '') for message in messages)
+
+
+class BaseProviderClient:
+    """
+    供应商客户端基类
+
+    子类实现 _chat / _embed，异步接口默认在线程池中执行同步实现。
+    """
+
+    def __init__(self, config: ProviderConfig):
+        self.config = config
+        self.limiter = ProviderLimiter(config.max_concurrency, config.tokens_per_minute)
+
+    def chat(self, model: str, messages: List[Dict[str, str]], **params) -> ChatResult:
+        estimated = messages_tokens(messages) + int(params.get('max_tokens') or 0)
+        with self.limiter.slot(estimated):
+            return self._chat(model, messages, **params)
+
+    def embed(self, model: str, texts: List[str], dimensions: Optional[int] = None) -> List[List[float]]:
+        if not texts:
+            return []
+        estimated = sum(estimate_tokens(text) for text in texts)
+        with self.limiter.slot(estimated):
+            return self._embed(model, texts, dimensions)
+
+    def rerank(self, model: str, query: str, documents: List[str]) -> List[float]:
+        """返回每个文档与查询的相关度得分，顺序与 documents 一致"""
+        if not documents:
+            return []
+        estimated = sum(estimate_tokens(text) for text in documents) + estimate_tokens(query) * len(documents)
+        with self.limiter.slot(estimated):
+            return self._rerank(model, query, documents)
+
+    async def achat(self, model: str, messages: List[Dict[str, str]], **params) -> ChatResult:
+        return await asyncio.to_thread(self.chat, model, messages, **params)
+
+    async def aembed(self, model: str, texts: List[str], dimensions: Optional[int] = None) -> List[List[float]]:
+        return await asyncio.to_thread(self.embed, model, texts, dimensions)
+
+    def _chat(self, model, messages, **params) -> ChatResult:
+        raise NotImplementedError
+
+    def _embed(self, model, texts, dimensions) -> List[List[float]]:
+        raise NotImplementedError
+
+    def _rerank(self, model, query, documents) -> List[float]:
+        raise ProviderError(f'供应商类型 {self.config.provider_type} 不支持重排序模型')
+
+    def close(self):
+        pass
+
+    def __del__(self):
+        # 注册表替换下来的客户端可能仍被解析结果或进行中的请求持有，不再被引用时才关闭连接
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class OpenAICompatibleClient(BaseProviderClient):
+    """
+    OpenAI兼容接口客户端，基于httpx连接池复用keep-alive连接
+    """
+
+    def __init__(self, config: ProviderConfig):
+        super().__init__(config)
+        import httpx
+
+        headers = {'Content-Type': 'application/json'}
+        if config.api_key:
+            headers['Authorization'] = f'Bearer {config.api_key}'
+        self._http = httpx.Client(
+            base_url=(config.base_url or 'https://api.openai.com/v1').rstrip('/'),
+            headers=headers,
+            timeout=config.timeout,
+            limits=httpx.Limits(
+                max_connections=config.max_connections,
+                max_keepalive_connections=config.max_connections,
+            ),
+        )
+
+    def _retry_delay(self, response, attempt: int) -> float:
+        """优先遵循Retry-After，否则指数退避并加入抖动，避免各worker同时重试"""
+        retry_after = response.headers.get('retry-after') if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), 60.0)
+            except ValueError:
+                pass
+        base = self.config.extra.get('retry_backoff', 1.0) * (2 ** attempt)
+        return random.uniform(base / 2, base)
+
+    def _post(self, path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        import httpx
+
+        max_retries = self.config.extra.get('max_retries', 2)
+        for attempt in range(max_retries + 1):
+            response = None
+            try:
+                response = self._http.post(path, json=payload)
+            except httpx.TransportError as exc:
+                if attempt >= max_retries:
+                    raise ProviderError(f'请求供应商失败: {exc}') from exc
+            else:
+                if response.status_code < 400:
+                    return response.json()
+                if response.status_code not in RETRYABLE_STATUS or attempt >= max_retries:
+                    raise ProviderError(f'供应商返回错误 {response.status_code}: {response.text[:500]}')
+            delay = self._retry_delay(response, attempt)
+            logger.warning('供应商请求失败，%.2f 秒后重试 (%s/%s)', delay, attempt + 1, max_retries)
+            time.sleep(delay)
+
+    def _chat(self, model, messages, **params) -> ChatResult:
+        data = self._post('/chat/completions', {'model': model, 'messages': messages, **params})
+        usage = data.get('usage') or {}
+        return ChatResult(
+            text=data['choices'][0]['message']['content'] or '',
+            prompt_tokens=usage.get('prompt_tokens', 0),
+            completion_tokens=usage.get('completion_tokens', 0),
+            model=data.get('model', model),
+        )
+
+    def _embed(self, model, texts, dimensions) -> List[List[float]]:
+        payload = {'model': model, 'input': texts}
+        if dimensions and not model.startswith('text-embedding-ada'):
+            payload['dimensions'] = dimensions
+        data = self._post('/embeddings', payload)
+        items = sorted(data['data'], key=lambda item: item['index'])
+        return [item['embedding'] for item in items]
+
+    def close(self):
+        self._http.close()
+
+
+TOKEN_PATTERN = re.compile(r'[一-鿿]|[A-Za-z0-9_]+')
+
+
+class LocalStubClient(BaseProviderClient):
+    """
+    本地确定性模拟供应商，用于离线压测与基准测试
+
+    向量使用特征哈希生成：共享词越多的文本向量越相近，检索结果可复现。
+    extra_config.latency_ms 可模拟网络延迟。
+    """
+
+    DEFAULT_DIMENSIONS = 1536
+
+    def _sleep(self):
+        latency_ms = self.config.extra.get('latency_ms', 0)
+        if latency_ms:
+            time.sleep(latency_ms / 1000.0)
+
+    @staticmethod
+    def _hash(token: str) -> int:
+        return int.from_bytes(hashlib.blake2b(token.encode('utf-8'), digest_size=8).digest(), 'big')
+
+    def embed_text(self, text: str, dimensions: int) -> List[float]:
+        vector = [0.0] * dimensions
+        for token in TOKEN_PATTERN.findall(text.lower()):
+            value = self._hash(token)
+            sign = 1.0 if value & 1 else -1.0
+            vector[(value >> 1) % dimensions] += sign
+        norm = math.sqrt(sum(x * x for x in vector))
+        if norm == 0:
+            # 空文本给一个固定方向，避免零向量导致余弦距离无定义
+            vector[0] = 1.0
+            return vector
+        return [x / norm for x in vector]
+
+    def _embed(self, model, texts, dimensions) -> List[List[float]]:
+        self._sleep()
+        dimensions = dimensions or self.config.extra.get('dimensions', self.DEFAULT_DIMENSIONS)
+        return [self.embed_text(text, dimensions) for text in texts]
+
+    def _rerank(self, model, query, documents) -> List[float]:
+        self._sleep()
+        dimensions = self.config.extra.get('dimensions', self.DEFAULT_DIMENSIONS)
+        query_vector = self.embed_text(query, dimensions)
+        return [
+            sum(a * b for a, b in zip(query_vector, self.embed_text(document, dimensions)))
+            for document in documents
+        ]
+
+    def _chat(self, model, messages, **params) -> ChatResult:
+        self._sleep()
+        prompt = messages[-1].get('content', '') if messages else ''
+        digest = hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:12]
+        text = f'[stub:{model}:{digest}] {prompt[:200]}'
+        return ChatResult(
+            text=text,
+            prompt_tokens=messages_tokens(messages),
+            completion_tokens=estimate_tokens(text),
+            model=model,
+        )
+
+
+class LocalModelClient(BaseProviderClient):
+    """
+    本地模型服务客户端（apps.model_management.local_server）
+
+    模型只在模型服务进程中加载，worker 通过 Unix socket 调用；连接由客户端持有的连接池复用
+    （最多保留 max_connections 条空闲连接），服务端把所有worker的并发请求合并成批次推理。
+    base_url 为socket路径，留空时使用 settings 配置。
+    """
+
+    def __init__(self, config: ProviderConfig):
+        super().__init__(config)
+        from django.conf import settings
+
+        path = config.base_url or settings.LOCAL_MODEL_SERVER['SOCKET']
+        self.socket_path = path[len('unix://'):] if path.startswith('unix://') else path
+        # 空闲连接，后进先出
+        self._idle: List[socket.socket] = []
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def _connect(self) -> socket.socket:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.config.timeout)
+        try:
+            sock.connect(self.socket_path)
+        except OSError as exc:
+            sock.close()
+            raise ProviderError(f'无法连接本地模型服务 {self.socket_path}: {exc}') from exc
+        return sock
+
+    def _acquire(self) -> socket.socket:
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        return self._connect()
+
+    def _release(self, sock: socket.socket):
+        """归还连接；连接池已满或客户端已关闭时直接关闭"""
+        with self._lock:
+            if not self._closed and len(self._idle) < self.config.max_connections:
+                self._idle.append(sock)
+                return
+        sock.close()
+
+    def _request(self, payload: Dict[str, Any]):
+        import numpy as np
+
+        from .local_server import recv_frame, send_frame
+
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        # 空闲连接可能因模型服务重启而失效，失败后用新建的连接重试一次
+        for attempt in range(2):
+            sock = self._acquire() if attempt == 0 else self._connect()
+            try:
+                send_frame(sock, body)
+                header = json.loads(recv_frame(sock))
+                data = recv_frame(sock) if header.get('ok') else None
+            except (OSError, ConnectionError) as exc:
+                sock.close()
+                if attempt or isinstance(exc, socket.timeout):
+                    raise ProviderError(f'本地模型服务调用失败: {exc}') from exc
+                continue
+            except BaseException:
+                sock.close()
+                raise
+            self._release(sock)
+            if data is None:
+                raise ProviderError(f'本地模型服务返回错误: {header.get("error")}')
+            return np.frombuffer(data, dtype=np.float32).reshape(header['shape'])
+
+    def _embed(self, model, texts, dimensions) -> List[List[float]]:
+        import numpy as np
+
+        vectors = self._request({'op': 'embed', 'model': model, 'texts': texts})
+        if dimensions and dimensions < vectors.shape[1]:
+            # 与OpenAI dimensions参数一致：截断后重新归一化
+            vectors = vectors[:, :dimensions]
+            vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        return vectors.tolist()
+
+    def _rerank(self, model, query, documents) -> List[float]:
+        return self._request({'op': 'rerank', 'model': model, 'query': query, 'documents': documents}).tolist()
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            sockets, self._idle = self._idle, []
+        for sock in sockets:
+            sock.close()
+
+
+CLIENT_CLASSES = {
+    'openai': OpenAICompatibleClient,
+    'openai_compatible': OpenAICompatibleClient,
+    'local_stub': LocalStubClient,
+    'local': LocalModelClient,
+}
+
+
+def build_client(config: ProviderConfig) -> BaseProviderClient:
+    client_class = CLIENT_CLASSES.get(config.provider_type)
+    if client_class is None:
+        raise ProviderError(f'不支持的供应商类型: {config.provider_type}')
+    return client_class(config)
@@ -0,0 +1,291 @@
+"""
+模型调用限流与请求合并
+"""
+import copy
+import hashlib
+import json
+import logging
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+logger = logging.getLogger('manxiai.model_management')
+
+
+class RateLimitTimeout(Exception):
+    """在等待时间内未获取到配额，retry_after 为预计还需等待的秒数（未知时为None）"""
+
+    def __init__(self, message: str = '', retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class ModelRateLimited(APIException):
+    """
+    接口中模型配额等待超时（RateLimitTimeout）时返回 503，Retry-After 为预计等待秒数
+    """
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = '模型调用繁忙，请稍后重试'
+    default_code = 'model_rate_limited'
+
+    def __init__(self, retry_after: Optional[float] = None, detail=None):
+        super().__init__(detail)
+        # DRF 的异常处理按 wait 设置 Retry-After 响应头
+        self.wait = max(1, math.ceil(retry_after or 1))
+
+
+class BaseBucket:
+    """
+    令牌桶基类，子类实现 try_acquire
+    """
+
+    def __init__(self, capacity: float, refill_per_second: float):
+        self.capacity = float(capacity)
+        self.refill_per_second = float(refill_per_second)
+
+    @classmethod
+    def per_minute(cls, amount: float, *args, **kwargs):
+        return cls(amount, amount / 60.0, *args, **kwargs)
+
+    def try_acquire(self, amount: float = 1) -> float:
+        raise NotImplementedError
+
+    def acquire(self, amount: float = 1, timeout: Optional[float] = None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self.try_acquire(amount)
+            if wait <= 0:
+                return
+            if deadline is not None and time.monotonic() + wait > deadline:
+                raise RateLimitTimeout(f'等待配额超时，还需 {wait:.2f} 秒', retry_after=wait)
+            time.sleep(wait)
+
+
+class TokenBucket(BaseBucket):
+    """
+    进程内令牌桶
+
+    capacity为桶容量，refill_per_second为每秒补充量。
+    单次申请量超过容量时按容量计算，避免超大请求永远无法通过。
+    """
+
+    def __init__(self, capacity: float, refill_per_second: float):
+        super().__init__(capacity, refill_per_second)
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.refill_per_second)
+            self._updated = now
+
+    def try_acquire(self, amount: float = 1) -> float:
+        """
+        尝试扣减配额，成功返回0，失败返回需要等待的秒数
+        """
+        amount = min(float(amount), self.capacity)
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if self._tokens >= amount:
+                self._tokens -= amount
+                return 0.0
+            return (amount - self._tokens) / self.refill_per_second
+
+
+# 原子地补充并扣减令牌，使用Redis服务器时间避免各worker时钟偏差
+REDIS_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local amount = tonumber(ARGV[3])
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+local data = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(data[1]) or capacity
+local ts = tonumber(data[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens >= amount then
+    tokens = tokens - amount
+else
+    wait = (amount - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return tostring(wait)
+"""
+
+
+class RedisTokenBucket(BaseBucket):
+    """
+    基于Redis的共享令牌桶，所有gunicorn/Celery worker共用同一份配额
+
+    Redis不可用时降级为进程内令牌桶一段时间，避免限流组件本身造成故障。
+    """
+
+    RETRY_INTERVAL = 30.0
+
+    def __init__(self, capacity: float, refill_per_second: float, key: str, client=None):
+        super().__init__(capacity, refill_per_second)
+        self.key = key
+        self._client = client
+        self._script = None
+        self._fallback = TokenBucket(capacity, refill_per_second)
+        self._retry_at = 0.0
+
+    def _get_script(self):
+        if self._script is None:
+            if self._client is None:
+                from apps.core.redis import get_redis
+                self._client = get_redis()
+            self._script = self._client.register_script(REDIS_BUCKET_SCRIPT)
+        return self._script
+
+    def try_acquire(self, amount: float = 1) -> float:
+        amount = min(float(amount), self.capacity)
+        if time.monotonic() < self._retry_at:
+            return self._fallback.try_acquire(amount)
+        try:
+            wait = self._get_script()(keys=[self.key], args=[self.capacity, self.refill_per_second, amount])
+        except Exception as exc:
+            logger.warning('Redis限流不可用，%s 秒内降级为进程内限流: %s', self.RETRY_INTERVAL, exc)
+            self._retry_at = time.monotonic() + self.RETRY_INTERVAL
+            return self._fallback.try_acquire(amount)
+        return float(wait)
+
+
+class ProviderLimiter:
+    """
+    供应商级别的并发与每分钟Token限制
+    """
+
+    def __init__(self, max_concurrency: int = 0, tokens_per_minute: int = 0,
+                 acquire_timeout: Optional[float] = None):
+        self._semaphore = threading.BoundedSemaphore(max_concurrency) if max_concurrency > 0 else None
+        self._tokens = TokenBucket.per_minute(tokens_per_minute) if tokens_per_minute > 0 else None
+        self.acquire_timeout = acquire_timeout
+
+    @contextmanager
+    def slot(self, estimated_tokens: int = 0):
+        if self._tokens is not None and estimated_tokens:
+            self._tokens.acquire(estimated_tokens, timeout=self.acquire_timeout)
+        if self._semaphore is not None:
+            if not self._semaphore.acquire(timeout=self.acquire_timeout):
+                raise RateLimitTimeout('等待并发槽位超时')
+        try:
+            yield
+        finally:
+            if self._semaphore is not None:
+                self._semaphore.release()
+
+
+class ModelRateLimiter:
+    """
+    单个模型的每分钟请求数与每分钟Token数限制
+
+    provider 为供应商标识，不同供应商下的同名模型配额相互独立。
+    """
+
+    def __init__(self, name: str, requests_per_minute: int = 0, tokens_per_minute: int = 0,
+                 backend: str = 'local', timeout: Optional[float] = None, provider: str = ''):
+        self.name = name
+        self.provider = provider
+        self.timeout = timeout
+        self._requests = self._build(backend, 'rpm', requests_per_minute)
+        self._tokens = self._build(backend, 'tpm', tokens_per_minute)
+
+    def _build(self, backend, kind, per_minute):
+        if per_minute <= 0:
+            return None
+        if backend == 'redis':
+            return RedisTokenBucket.per_minute(per_minute, key=f'manxiai:ratelimit:{self.provider}:{self.name}:{kind}')
+        return TokenBucket.per_minute(per_minute)
+
+    @property
+    def enabled(self):
+        return self._requests is not None or self._tokens is not None
+
+    def acquire(self, tokens: int = 0):
+        if self._requests is not None:
+            self._requests.acquire(1, timeout=self.timeout)
+        if self._tokens is not None and tokens:
+            self._tokens.acquire(tokens, timeout=self.timeout)
+
+
+class _InFlight:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class RequestCoalescer:
+    """
+    合并进程内相同的并发请求
+
+    相同键的请求同时到达时只有第一个真正调用上游，其余等待其结果。
+    每个等待者拿到结果的深拷贝，调用方修改结果（如归一化、切片向量列表）不会相互影响。
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, _InFlight] = {}
+        self._lock = threading.Lock()
+        self.coalesced = 0
+
+    @staticmethod
+    def make_key(*parts: Any) -> str:
+        payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def run(self, key: str, func: Callable[[], Any]) -> Any:
+        with self._lock:
+            inflight = self._inflight.get(key)
+            leader = inflight is None
+            if leader:
+                inflight = self._inflight[key] = _InFlight()
+            else:
+                inflight.waiters += 1
+                self.coalesced += 1
+
+        if not leader:
+            inflight.event.wait()
+            if inflight.error is not None:
+                raise inflight.error
+            return copy.deepcopy(inflight.result)
+
+        try:
+            result = func()
+            with self._lock:
+                # 移出后不会再有新的等待者
+                self._inflight.pop(key, None)
+                waiters = inflight.waiters
+            if waiters:
+                # 发起者返回原对象，等待者从调用方无法修改的快照拷贝
+                inflight.result = copy.deepcopy(result)
+            return result
+        except Exception as exc:
+            inflight.error = exc
+            raise
+        finally:
+            with self._lock:
+                if self._inflight.get(key) is inflight:
+                    del self._inflight[key]
+            inflight.event.set()
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    粗略估算Token数：中日韩字符按1个计，其余按4个字符1个计
+    """
+    if not text:
+        return 0
+    cjk = sum(1 for char in text if '一' <= char <= '鿿')
+    return cjk + (len(text) - cjk) // 4 + 1
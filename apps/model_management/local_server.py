@@ -0,0 +1,302 @@
+"""
+本地模型服务
+
+sentence-transformers 向量模型与 cross-encoder 重排序模型在每个 gunicorn / Celery worker 中各加载一份
+会占用数百MB内存且冷启动慢。本服务作为独立进程运行，每个模型只加载一次，
+通过 Unix socket 接收所有worker的请求，并把同一模型的并发请求动态合并成批次推理。
+
+协议：每帧为 4字节大端长度 + 内容。
+- 请求：一帧JSON，{"op": "embed", "model": ..., "texts": [...]}
+  或 {"op": "rerank", "model": ..., "query": ..., "documents": [...]}，{"op": "ping"} 用于探活；
+- 响应：一帧JSON头 {"ok": true, "shape": [...]}，随后一帧 float32 原始字节；
+  失败时只有一帧 {"ok": false, "error": ...}。
+
+启动: python start.py model_server
+"""
+import asyncio
+import json
+import logging
+import os
+import socket
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger('manxiai.model_management')
+
+HEADER = struct.Struct('>I')
+# 单帧上限，防止异常请求耗尽内存
+MAX_FRAME_BYTES = 64 * 1024 * 1024
+OPERATIONS = ('embed', 'rerank')
+
+
+class ModelServerError(Exception):
+    """本地模型服务调用失败"""
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        count = sock.recv_into(view[received:], size - received)
+        if not count:
+            raise ConnectionError('本地模型服务关闭了连接')
+        received += count
+    return bytes(buffer)
+
+
+def send_frame(sock: socket.socket, payload: bytes):
+    sock.sendall(HEADER.pack(len(payload)) + payload)
+
+
+def recv_frame(sock: socket.socket) -> bytes:
+    (size,) = HEADER.unpack(_recv_exact(sock, HEADER.size))
+    if size > MAX_FRAME_BYTES:
+        raise ModelServerError(f'响应过大: {size} 字节')
+    return _recv_exact(sock, size)
+
+
+async def _read_frame(reader: asyncio.StreamReader) -> bytes:
+    (size,) = HEADER.unpack(await reader.readexactly(HEADER.size))
+    if size > MAX_FRAME_BYTES:
+        raise ModelServerError(f'请求过大: {size} 字节')
+    return await reader.readexactly(size)
+
+
+def _write_frame(writer: asyncio.StreamWriter, payload: bytes):
+    writer.write(HEADER.pack(len(payload)) + payload)
+
+
+class ModelHost:
+    """
+    按名称懒加载并缓存模型，同一模型只加载一次
+    """
+
+    def __init__(self, device: str = 'cpu'):
+        self.device = device
+        self._models: Dict[Tuple[str, str], object] = {}
+        self._lock = threading.Lock()
+
+    def get(self, op: str, name: str):
+        key = (op, name)
+        model = self._models.get(key)
+        if model is not None:
+            return model
+        with self._lock:
+            model = self._models.get(key)
+            if model is None:
+                started = time.monotonic()
+                if op == 'embed':
+                    from sentence_transformers import SentenceTransformer
+                    model = SentenceTransformer(name, device=self.device)
+                else:
+                    from sentence_transformers import CrossEncoder
+                    model = CrossEncoder(name, device=self.device)
+                self._models[key] = model
+                logger.info('本地模型服务加载模型 %s/%s，耗时 %.1f 秒', op, name, time.monotonic() - started)
+            return model
+
+    def embed(self, name: str, texts: List[str], batch_size: int) -> np.ndarray:
+        model = self.get('embed', name)
+        return model.encode(
+            texts, batch_size=batch_size, convert_to_numpy=True,
+            normalize_embeddings=True, show_progress_bar=False,
+        ).astype(np.float32, copy=False)
+
+    def rerank(self, name: str, pairs: List[Tuple[str, str]], batch_size: int) -> np.ndarray:
+        model = self.get('rerank', name)
+        scores = model.predict(pairs, batch_size=batch_size, convert_to_numpy=True, show_progress_bar=False)
+        return np.asarray(scores, dtype=np.float32).reshape(len(pairs))
+
+
+class DynamicBatcher:
+    """
+    动态批处理：收到第一个请求后最多再等待 max_wait 秒或凑满 max_batch_size 条，
+    把期间到达的所有请求合并为一次推理，再按顺序把结果切分回各个请求
+    """
+
+    def __init__(self, run: Callable[[list], np.ndarray], executor: ThreadPoolExecutor,
+                 max_batch_size: int = 64, max_wait: float = 0.005):
+        self.run = run
+        self.executor = executor
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait)
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.stats = {'requests': 0, 'items': 0, 'batches': 0}
+        self._task = asyncio.get_running_loop().create_task(self._loop())
+
+    async def submit(self, items: list) -> np.ndarray:
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((items, future))
+        return await future
+
+    async def _collect(self):
+        batch = [await self.queue.get()]
+        size = len(batch[0][0])
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_wait
+        while size < self.max_batch_size:
+            try:
+                pending = self.queue.get_nowait()
+            except asyncio.QueueEmpty:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    pending = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+            batch.append(pending)
+            size += len(pending[0])
+        return batch
+
+    async def _loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            flat = [item for items, _ in batch for item in items]
+            self.stats['requests'] += len(batch)
+            self.stats['items'] += len(flat)
+            self.stats['batches'] += 1
+            try:
+                result = await loop.run_in_executor(self.executor, self.run, flat)
+            except Exception as exc:
+                logger.exception('本地模型推理失败')
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(ModelServerError(str(exc)))
+                continue
+            offset = 0
+            for items, future in batch:
+                if not future.done():
+                    future.set_result(result[offset:offset + len(items)])
+                offset += len(items)
+
+    def close(self):
+        self._task.cancel()
+
+
+class ModelServer:
+    """
+    Unix socket 模型服务，每个 (操作, 模型) 一个动态批处理队列
+    """
+
+    def __init__(self, socket_path: str, device: str = 'cpu', max_batch_size: int = 64,
+                 max_wait_ms: float = 5.0, inference_threads: int = 1):
+        self.socket_path = socket_path
+        self.host = ModelHost(device)
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        # 推理在线程池中执行，CPU推理默认单线程串行（模型内部已使用多核）
+        self.executor = ThreadPoolExecutor(max_workers=max(1, inference_threads),
+                                           thread_name_prefix='model-server')
+        self._batchers: Dict[Tuple[str, str], DynamicBatcher] = {}
+
+    def batcher(self, op: str, model: str) -> DynamicBatcher:
+        key = (op, model)
+        batcher = self._batchers.get(key)
+        if batcher is None:
+            if op == 'embed':
+                run = lambda texts: self.host.embed(model, texts, self.max_batch_size)  # noqa: E731
+            else:
+                run = lambda pairs: self.host.rerank(model, pairs, self.max_batch_size)  # noqa: E731
+            batcher = self._batchers[key] = DynamicBatcher(
+                run, self.executor, self.max_batch_size, self.max_wait
+            )
+        return batcher
+
+    async def dispatch(self, request: Dict) -> np.ndarray:
+        op = request.get('op')
+        model = request.get('model')
+        if op not in OPERATIONS:
+            raise ModelServerError(f'不支持的操作: {op}')
+        if not model:
+            raise ModelServerError('缺少 model')
+        if op == 'embed':
+            items = [str(text) for text in request.get('texts') or []]
+        else:
+            query = str(request.get('query') or '')
+            items = [(query, str(document)) for document in request.get('documents') or []]
+        if not items:
+            return np.zeros((0,), dtype=np.float32)
+        return await self.batcher(op, model).submit(items)
+
+    def stats(self) -> Dict:
+        return {f'{op}:{model}': dict(batcher.stats) for (op, model), batcher in self._batchers.items()}
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """一个连接上顺序处理多个请求，客户端按线程复用连接"""
+        try:
+            while True:
+                try:
+                    request = json.loads(await _read_frame(reader))
+                except asyncio.IncompleteReadError:
+                    break
+                if not isinstance(request, dict):
+                    request = {}
+                if request.get('op') == 'ping':
+                    _write_frame(writer, json.dumps({'ok': True, 'stats': self.stats()}).encode())
+                    await writer.drain()
+                    continue
+                try:
+                    result = await self.dispatch(request)
+                except Exception as exc:
+                    _write_frame(writer, json.dumps({'ok': False, 'error': str(exc)}, ensure_ascii=False).encode())
+                else:
+                    result = np.ascontiguousarray(result, dtype=np.float32)
+                    _write_frame(writer, json.dumps({'ok': True, 'shape': list(result.shape)}).encode())
+                    _write_frame(writer, result.tobytes())
+                await writer.drain()
+        except (ConnectionError, ModelServerError, ValueError) as exc:
+            logger.warning('本地模型服务连接异常: %s', exc)
+        finally:
+            writer.close()
+
+    def preload(self, embedding_models: List[str], rerank_models: List[str]):
+        for name in embedding_models:
+            self.host.get('embed', name)
+        for name in rerank_models:
+            self.host.get('rerank', name)
+
+    async def serve_forever(self):
+        if os.path.exists(self.socket_path):
+            # 上次异常退出遗留的socket文件
+            os.unlink(self.socket_path)
+        # 在 bind 时就以 0660 创建socket文件，之后再 chmod 会有一段时间按默认umask可被其他用户连接
+        umask = os.umask(0o117)
+        try:
+            server = await asyncio.start_unix_server(self.handle, path=self.socket_path)
+        finally:
+            os.umask(umask)
+        logger.info('本地模型服务已启动: %s', self.socket_path)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            for batcher in self._batchers.values():
+                batcher.close()
+            self.executor.shutdown(wait=False)
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+
+def serve(config: Optional[Dict] = None):
+    """按 settings.LOCAL_MODEL_SERVER 启动服务（阻塞）"""
+    from django.conf import settings
+
+    config = config or settings.LOCAL_MODEL_SERVER
+    server = ModelServer(
+        config['SOCKET'],
+        device=config['DEVICE'],
+        max_batch_size=config['MAX_BATCH_SIZE'],
+        max_wait_ms=config['MAX_WAIT_MS'],
+        inference_threads=config['INFERENCE_THREADS'],
+    )
+    # 启动前加载常用模型，避免第一个请求承担冷启动
+    server.preload(config['PRELOAD_EMBEDDING'], config['PRELOAD_RERANK'])
+    asyncio.run(server.serve_forever())
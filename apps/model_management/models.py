@@ -1 +1,76 @@
- 
\ No newline at end of file
+"""
+模型管理模型
+"""
+from django.db import models
+from apps.core.models import BaseModel
+
+
+class ModelProvider(BaseModel):
+    """
+    模型供应商
+    """
+    class ProviderTypeChoices(models.TextChoices):
+        OPENAI = 'openai', 'OpenAI'
+        OPENAI_COMPATIBLE = 'openai_compatible', 'OpenAI兼容接口'
+        LOCAL_STUB = 'local_stub', '本地模拟(压测用)'
+        LOCAL = 'local', '本地模型服务'
+
+    name = models.CharField(max_length=100, unique=True, verbose_name='供应商名称')
+    provider_type = models.CharField(
+        max_length=30,
+        choices=ProviderTypeChoices.choices,
+        default=ProviderTypeChoices.OPENAI_COMPATIBLE,
+        verbose_name='供应商类型'
+    )
+    base_url = models.CharField(max_length=500, blank=True, default='', verbose_name='接口地址')
+    api_key = models.CharField(max_length=500, blank=True, default='', verbose_name='API密钥')
+    is_active = models.BooleanField(default=True, verbose_name='是否启用')
+
+    # 连接池与限流
+    max_connections = models.IntegerField(default=20, verbose_name='连接池大小')
+    max_concurrency = models.IntegerField(default=16, verbose_name='最大并发请求数')
+    tokens_per_minute = models.IntegerField(default=0, verbose_name='每分钟Token上限(0为不限)')
+    timeout = models.FloatField(default=60.0, verbose_name='请求超时(秒)')
+    extra_config = models.JSONField(default=dict, blank=True, verbose_name='扩展配置')
+
+    class Meta:
+        db_table = 'model_providers'
+        verbose_name = '模型供应商'
+        verbose_name_plural = '模型供应商'
+
+    def __str__(self):
+        return self.name
+
+
+class AIModel(BaseModel):
+    """
+    模型定义
+    """
+    class ModelTypeChoices(models.TextChoices):
+        LLM = 'llm', '大语言模型'
+        EMBEDDING = 'embedding', '向量模型'
+        RERANK = 'rerank', '重排序模型'
+
+    provider = models.ForeignKey(
+        ModelProvider,
+        on_delete=models.CASCADE,
+        related_name='models',
+        verbose_name='供应商'
+    )
+    name = models.CharField(max_length=100, verbose_name='模型名称')
+    model_type = models.CharField(max_length=20, choices=ModelTypeChoices.choices, verbose_name='模型类型')
+    dimensions = models.IntegerField(null=True, blank=True, verbose_name='向量维度')
+    context_length = models.IntegerField(null=True, blank=True, verbose_name='上下文长度')
+    requests_per_minute = models.IntegerField(default=0, verbose_name='每分钟请求上限(0为不限)')
+    tokens_per_minute = models.IntegerField(default=0, verbose_name='每分钟Token上限(0为不限)')
+    is_default = models.BooleanField(default=False, verbose_name='是否默认')
+    is_active = models.BooleanField(default=True, verbose_name='是否启用')
+
+    class Meta:
+        db_table = 'ai_models'
+        unique_together = ['provider', 'name']
+        verbose_name = '模型'
+        verbose_name_plural = '模型'
+
+    def __str__(self):
+        return f"{self.provider.name}/{self.name}"
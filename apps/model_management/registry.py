@@ -0,0 +1,231 @@
+"""
+模型注册表
+
+按供应商缓存客户端（连接池与限流器随之在进程内复用），
+并把模型名称解析为可直接调用的 BoundModel。
+"""
+import asyncio
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+
+from .cache import query_embedding_cache
+from .clients import BaseProviderClient, ChatResult, ProviderConfig, build_client, messages_tokens
+from .limits import ModelRateLimiter, RequestCoalescer, estimate_tokens
+
+# 进程内共享，相同模型、相同请求内容的并发调用只请求一次上游
+coalescer = RequestCoalescer()
+
+
+@dataclass
+class BoundModel:
+    """
+    绑定了供应商客户端的模型
+
+    调用顺序：先合并相同的在途请求，再经过模型级限流，最后进入供应商客户端。
+    """
+    client: BaseProviderClient
+    name: str
+    model_type: str
+    dimensions: Optional[int] = None
+    limiter: Optional[ModelRateLimiter] = None
+    coalescer: Optional[RequestCoalescer] = field(default=None, repr=False)
+
+    def _call(self, key_parts, estimated_tokens, func):
+        def limited():
+            if self.limiter is not None:
+                self.limiter.acquire(estimated_tokens)
+            return func()
+
+        if self.coalescer is None:
+            return limited()
+        return self.coalescer.run(
+            RequestCoalescer.make_key(self.client.config.provider_id, self.name, *key_parts), limited
+        )
+
+    def chat(self, messages: List[Dict[str, str]], **params) -> ChatResult:
+        estimated = messages_tokens(messages) + int(params.get('max_tokens') or 0)
+        return self._call(
+            ('chat', messages, params), estimated,
+            lambda: self.client.chat(self.name, messages, **params),
+        )
+
+    async def achat(self, messages: List[Dict[str, str]], **params) -> ChatResult:
+        return await asyncio.to_thread(self.chat, messages, **params)
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        estimated = sum(estimate_tokens(text) for text in texts)
+        return self._call(
+            ('embed', texts, self.dimensions), estimated,
+            lambda: self.client.embed(self.name, texts, self.dimensions),
+        )
+
+    async def aembed(self, texts: List[str]) -> List[List[float]]:
+        return await asyncio.to_thread(self.embed, texts)
+
+    def rerank(self, query: str, documents: List[str]) -> List[float]:
+        estimated = sum(estimate_tokens(text) for text in documents) + estimate_tokens(query) * len(documents)
+        return self._call(
+            ('rerank', query, documents), estimated,
+            lambda: self.client.rerank(self.name, query, documents),
+        )
+
+    def embed_query(self, text: str) -> List[float]:
+        """检索查询向量化，经过两级查询向量缓存，重复的查询不再请求上游"""
+        return query_embedding_cache.get_or_embed(
+            self.client.config.key, self.name, self.dimensions, text, lambda normalized: self.embed([normalized])[0]
+        )
+
+
+class ModelRegistry:
+    """
+    进程内模型注册表
+    """
+
+    def __init__(self, resolve_ttl: float = 30.0):
+        self.resolve_ttl = resolve_ttl
+        self._clients: Dict[str, BaseProviderClient] = {}
+        self._resolved: Dict[Tuple[str, Optional[str]], Tuple[float, BoundModel]] = {}
+        self._limiters: Dict[Tuple, ModelRateLimiter] = {}
+        self._lock = threading.Lock()
+
+    def client_for(self, config: ProviderConfig) -> BaseProviderClient:
+        """
+        获取供应商客户端，配置变更后重建
+
+        旧客户端不再分发，但可能仍有请求在使用，不在此关闭，
+        等持有它的解析结果与请求都结束、对象被回收时关闭连接池（BaseProviderClient.__del__）。
+        """
+        with self._lock:
+            client = self._clients.get(config.key)
+            if client is None:
+                for key in [k for k, old in self._clients.items() if old.config.provider_id == config.provider_id]:
+                    del self._clients[key]
+                client = build_client(config)
+                self._clients[config.key] = client
+            return client
+
+    def limiter_for(self, provider_id: str, name: str, requests_per_minute: int, tokens_per_minute: int):
+        """获取模型限流器，本地令牌桶需要跨解析结果保持状态，因此在此缓存"""
+        if requests_per_minute <= 0 and tokens_per_minute <= 0:
+            return None
+        key = (provider_id, name, requests_per_minute, tokens_per_minute)
+        with self._lock:
+            limiter = self._limiters.get(key)
+            if limiter is None:
+                limiter = self._limiters[key] = ModelRateLimiter(
+                    name,
+                    requests_per_minute,
+                    tokens_per_minute,
+                    backend=settings.MODEL_RATE_LIMIT_BACKEND,
+                    timeout=settings.MODEL_RATE_LIMIT_TIMEOUT,
+                    provider=provider_id,
+                )
+            return limiter
+
+    @staticmethod
+    def default_config() -> ProviderConfig:
+        """未在模型管理中配置时，使用settings中的全局配置"""
+        if settings.DEFAULT_MODEL_PROVIDER == 'local':
+            return ModelRegistry.local_config()
+        return ProviderConfig(
+            key=f'settings:{settings.DEFAULT_MODEL_PROVIDER}:{settings.OPENAI_BASE_URL}',
+            provider_type=settings.DEFAULT_MODEL_PROVIDER,
+            base_url=settings.OPENAI_BASE_URL,
+            api_key=settings.OPENAI_API_KEY,
+            max_concurrency=settings.MODEL_PROVIDER_MAX_CONCURRENCY,
+            tokens_per_minute=settings.MODEL_PROVIDER_TOKENS_PER_MINUTE,
+        )
+
+    @staticmethod
+    def local_config() -> ProviderConfig:
+        """本地模型服务，未配置重排序模型供应商时也使用它"""
+        socket_path = settings.LOCAL_MODEL_SERVER['SOCKET']
+        return ProviderConfig(
+            key=f'local:{socket_path}',
+            provider_type='local',
+            base_url=socket_path,
+            max_concurrency=settings.MODEL_PROVIDER_MAX_CONCURRENCY,
+            timeout=settings.LOCAL_MODEL_SERVER['TIMEOUT'],
+        )
+
+    def resolve(self, model_type: str, name: Optional[str] = None) -> BoundModel:
+        cache_key = (model_type, name)
+        now = time.monotonic()
+        cached = self._resolved.get(cache_key)
+        if cached and cached[0] > now:
+            return cached[1]
+
+        from .models import AIModel
+
+        queryset = AIModel.objects.select_related('provider').filter(
+            model_type=model_type,
+            is_active=True,
+            provider__is_active=True,
+        )
+        ai_model = queryset.filter(name=name).first() if name else queryset.filter(is_default=True).first()
+
+        if ai_model is not None:
+            config = ProviderConfig.from_provider(ai_model.provider)
+            bound = BoundModel(
+                client=self.client_for(config),
+                name=ai_model.name,
+                model_type=model_type,
+                dimensions=ai_model.dimensions,
+                limiter=self.limiter_for(
+                    config.provider_id, ai_model.name, ai_model.requests_per_minute, ai_model.tokens_per_minute
+                ),
+                coalescer=coalescer,
+            )
+        else:
+            is_embedding = model_type == AIModel.ModelTypeChoices.EMBEDDING
+            if model_type == AIModel.ModelTypeChoices.RERANK:
+                config, default_name = self.local_config(), settings.RERANK_MODEL
+            else:
+                config = self.default_config()
+                default_name = settings.EMBEDDING_MODEL if is_embedding else settings.LLM_MODEL
+            model_name = name or default_name
+            bound = BoundModel(
+                client=self.client_for(config),
+                name=model_name,
+                model_type=model_type,
+                dimensions=settings.EMBEDDING_DIMENSIONS if is_embedding else None,
+                limiter=self.limiter_for(
+                    config.provider_id, model_name, settings.MODEL_REQUESTS_PER_MINUTE, settings.MODEL_TOKENS_PER_MINUTE
+                ),
+                coalescer=coalescer,
+            )
+
+        self._resolved[cache_key] = (now + self.resolve_ttl, bound)
+        return bound
+
+    def invalidate(self):
+        self._resolved.clear()
+
+    def close(self):
+        with self._lock:
+            for client in self._clients.values():
+                client.close()
+            self._clients.clear()
+        self.invalidate()
+
+
+registry = ModelRegistry()
+
+
+def get_llm(name: Optional[str] = None) -> BoundModel:
+    """获取大语言模型，未指定名称时使用默认模型"""
+    return registry.resolve('llm', name)
+
+
+def get_embedding_model(name: Optional[str] = None) -> BoundModel:
+    """获取向量模型，未指定名称时使用默认模型"""
+    return registry.resolve('embedding', name)
+
+
+def get_rerank_model(name: Optional[str] = None) -> BoundModel:
+    """获取重排序模型，未在模型管理中配置时使用本地模型服务"""
+    return registry.resolve('rerank', name)
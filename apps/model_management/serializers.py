@@ -0,0 +1,41 @@
+"""
+模型管理序列化器
+"""
+from rest_framework import serializers
+from .models import ModelProvider, AIModel
+
+
+class ModelProviderSerializer(serializers.ModelSerializer):
+    """
+    模型供应商序列化器
+    """
+    api_key = serializers.CharField(write_only=True, required=False, allow_blank=True)
+    has_api_key = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ModelProvider
+        fields = [
+            'id', 'name', 'provider_type', 'base_url', 'api_key', 'has_api_key', 'is_active',
+            'max_connections', 'max_concurrency', 'tokens_per_minute', 'timeout', 'extra_config',
+            'created_at', 'updated_at'
+        ]
+        read_only_fields = ['id', 'created_at', 'updated_at']
+
+    def get_has_api_key(self, obj):
+        return bool(obj.api_key)
+
+
+class AIModelSerializer(serializers.ModelSerializer):
+    """
+    模型序列化器
+    """
+    provider_name = serializers.CharField(source='provider.name', read_only=True)
+
+    class Meta:
+        model = AIModel
+        fields = [
+            'id', 'provider', 'provider_name', 'name', 'model_type', 'dimensions',
+            'context_length', 'requests_per_minute', 'tokens_per_minute',
+            'is_default', 'is_active', 'created_at', 'updated_at'
+        ]
+        read_only_fields = ['id', 'provider_name', 'created_at', 'updated_at']
@@ -1,8 +1,14 @@
 """
 模型管理URL配置
 """
-from django.urls import path
+from django.urls import path, include
+from rest_framework.routers import DefaultRouter
+from .views import ModelProviderViewSet, AIModelViewSet
+
+router = DefaultRouter()
+router.register(r'providers', ModelProviderViewSet, basename='model-provider')
+router.register(r'models', AIModelViewSet, basename='ai-model')
 
 urlpatterns = [
-    # TODO: 添加模型管理相关的URL
-] 
\ No newline at end of file
+    path('', include(router.urls)),
+]
@@ -0,0 +1,77 @@
+"""
+模型管理视图
+"""
+from django.db import transaction
+from rest_framework import viewsets, status, permissions
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from .cache import query_embedding_cache
+from .clients import ProviderError
+from .limits import ModelRateLimited, RateLimitTimeout
+from .models import ModelProvider, AIModel
+from .registry import registry
+from .serializers import ModelProviderSerializer, AIModelSerializer
+
+
+class ModelProviderViewSet(viewsets.ModelViewSet):
+    """
+    模型供应商管理视图集
+    """
+    queryset = ModelProvider.objects.all()
+    serializer_class = ModelProviderSerializer
+    permission_classes = [permissions.IsAdminUser]
+
+
+class AIModelViewSet(viewsets.ModelViewSet):
+    """
+    模型管理视图集
+    """
+    queryset = AIModel.objects.select_related('provider')
+    serializer_class = AIModelSerializer
+    permission_classes = [permissions.IsAdminUser]
+    filterset_fields = ['provider', 'model_type', 'is_active']
+    throttle_scopes = {'test': 'expensive'}
+
+    def perform_save(self, serializer):
+        with transaction.atomic():
+            ai_model = serializer.save()
+            # 同类型只保留一个默认模型
+            if ai_model.is_default:
+                AIModel.objects.filter(
+                    model_type=ai_model.model_type, is_default=True
+                ).exclude(id=ai_model.id).update(is_default=False)
+        registry.invalidate()
+
+    def perform_create(self, serializer):
+        self.perform_save(serializer)
+
+    def perform_update(self, serializer):
+        self.perform_save(serializer)
+
+    @action(detail=True, methods=['post'])
+    def test(self, request, pk=None):
+        """
+        测试模型连通性
+        """
+        ai_model = self.get_object()
+        bound = registry.resolve(ai_model.model_type, ai_model.name)
+        try:
+            if ai_model.model_type == AIModel.ModelTypeChoices.EMBEDDING:
+                vectors = bound.embed(['ping'])
+                return Response({'dimensions': len(vectors[0])})
+            result = bound.chat([{'role': 'user', 'content': 'ping'}], max_tokens=8)
+            return Response({'text': result.text, 'total_tokens': result.total_tokens})
+        except ProviderError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_502_BAD_GATEWAY)
+        except RateLimitTimeout as exc:
+            raise ModelRateLimited(exc.retry_after)
+
+    @action(detail=False, methods=['get', 'delete'], url_path='query-cache')
+    def query_cache(self, request):
+        """
+        查询向量缓存命中率（本进程与全部worker）；DELETE 清空本进程缓存
+        """
+        if request.method == 'DELETE':
+            query_embedding_cache.clear()
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        return Response(query_embedding_cache.stats())
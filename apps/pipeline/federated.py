@@ -0,0 +1,148 @@
+"""
+跨知识库联合检索
+
+并发检索用户可访问的所有知识库（自己创建的与通过 KnowledgeBaseShare 分享的），
+每个知识库有独立的超时预算，超时或出错的知识库不影响其它结果（返回部分结果）。
+各知识库的得分经 normalize_score 归一化后合并为全局 top_k。
+相同向量模型的查询向量化请求由模型注册表的请求合并只调用一次上游。
+"""
+import asyncio
+import contextvars
+import functools
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.db import close_old_connections, models
+
+from apps.model_management.limits import RateLimitTimeout
+from .retrieval import RetrievalService, normalize_score
+
+# 独立线程池：超时的检索继续在后台运行，请求不必等待其结束（事件循环的默认线程池关闭时会等待）
+executor = ThreadPoolExecutor(
+    max_workers=settings.FEDERATED_SEARCH['MAX_CONCURRENCY'] * 4, thread_name_prefix='federated-search'
+)
+
+
+def accessible_knowledge_bases(user):
+    """用户可访问的知识库：自己创建的 + 分享给用户的"""
+    from apps.knowledge_base.models import KnowledgeBase
+
+    return KnowledgeBase.objects.filter(
+        models.Q(created_by=user) | models.Q(shares__shared_with=user),
+    ).distinct()
+
+
+@dataclass
+class KnowledgeBaseOutcome:
+    """单个知识库的检索情况"""
+    knowledge_base_id: str
+    name: str
+    status: str = 'ok'
+    took_ms: int = 0
+    count: int = 0
+    error: str = ''
+    retry_after: Optional[float] = None
+    results: List[Dict] = field(default_factory=list, repr=False)
+
+    def to_dict(self):
+        data = {
+            'knowledge_base': str(self.knowledge_base_id),
+            'name': self.name,
+            'status': self.status,
+            'took_ms': self.took_ms,
+            'count': self.count,
+        }
+        if self.error:
+            data['error'] = self.error
+        if self.retry_after is not None:
+            data['retry_after'] = round(self.retry_after, 2)
+        return data
+
+
+def _search_knowledge_base(knowledge_base, query: str, top_k: int, search_mode: Optional[str], filters=None):
+    try:
+        service = RetrievalService(knowledge_base, filters=filters)
+        mode = search_mode or service.search_mode
+        chunks = service.search(query, top_k=top_k, search_mode=mode)
+        return [
+            {
+                **chunk.to_dict(),
+                'knowledge_base': str(knowledge_base.id),
+                'knowledge_base_name': knowledge_base.name,
+                'search_mode': mode,
+                'raw_score': chunk.score,
+                'score': normalize_score(mode, chunk.score),
+            }
+            for chunk in chunks
+        ]
+    finally:
+        close_old_connections()
+
+
+class FederatedSearch:
+    """
+    联合检索
+    """
+
+    def __init__(self, knowledge_bases, timeout: Optional[float] = None, max_concurrency: Optional[int] = None):
+        config = settings.FEDERATED_SEARCH
+        self.knowledge_bases = list(knowledge_bases)
+        self.timeout = timeout if timeout is not None else config['TIMEOUT']
+        self.max_concurrency = max_concurrency or config['MAX_CONCURRENCY']
+
+    async def _run_one(self, knowledge_base, semaphore, query, top_k, search_mode, filters) -> KnowledgeBaseOutcome:
+        outcome = KnowledgeBaseOutcome(knowledge_base.id, knowledge_base.name)
+        # 排队时间不计入超时预算
+        await semaphore.acquire()
+        started = time.perf_counter()
+        # 线程池不会传递上下文变量，显式带上（请求的读写分离路由状态）
+        search = functools.partial(_search_knowledge_base, knowledge_base, query, top_k, search_mode, filters)
+        future = asyncio.get_running_loop().run_in_executor(executor, contextvars.copy_context().run, search)
+
+        def release(done):
+            # 超时后线程中的查询不会被中断，名额保留到线程结束，同时运行的查询数不超过并发上限
+            semaphore.release()
+            if not done.cancelled():
+                # 超时后的异常无人读取，在此取出避免“异常未被读取”的告警
+                done.exception()
+
+        future.add_done_callback(release)
+
+        try:
+            # shield 使超时只丢弃结果，不取消 future，线程结束时仍会释放名额
+            outcome.results = await asyncio.wait_for(asyncio.shield(future), self.timeout)
+            outcome.count = len(outcome.results)
+        except asyncio.TimeoutError:
+            outcome.status = 'timeout'
+        except RateLimitTimeout as exc:
+            outcome.status = 'rate_limited'
+            outcome.error = str(exc)
+            outcome.retry_after = exc.retry_after
+        except Exception as exc:
+            outcome.status = 'error'
+            outcome.error = str(exc)
+        outcome.took_ms = int((time.perf_counter() - started) * 1000)
+        return outcome
+
+    async def asearch(self, query: str, top_k: int = 10, search_mode: Optional[str] = None,
+                      filters=None) -> Dict:
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        outcomes = await asyncio.gather(*[
+            self._run_one(knowledge_base, semaphore, query, top_k, search_mode, filters)
+            for knowledge_base in self.knowledge_bases
+        ])
+        merged = [result for outcome in outcomes for result in outcome.results]
+        merged.sort(key=lambda result: result['score'], reverse=True)
+        return {
+            'query': query,
+            'results': merged[:top_k],
+            'knowledge_bases': [outcome.to_dict() for outcome in outcomes],
+            'partial': any(outcome.status != 'ok' for outcome in outcomes),
+        }
+
+    def search(self, query: str, top_k: int = 10, search_mode: Optional[str] = None, filters=None) -> Dict:
+        return async_to_sync(self.asearch)(query, top_k, search_mode, filters)
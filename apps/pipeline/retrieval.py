@@ -0,0 +1,184 @@
+"""
+知识库检索服务
+
+支持三种检索模式：
+- semantic: 向量检索（见 apps.embedding.search）
+- keyword: PostgreSQL全文检索，中文经jieba分词
+- hybrid: 两路结果按倒数排名融合(RRF)
+"""
+import logging
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.core.exceptions import ObjectDoesNotExist
+
+from apps.document.chunking import tokenize_for_search
+from apps.document.models import DocumentChunk
+
+logger = logging.getLogger('manxiai.pipeline')
+
+SEARCH_MODES = ('semantic', 'keyword', 'hybrid')
+# RRF平滑常数
+RRF_K = 60
+# 混合检索时每一路多召回的倍数
+HYBRID_FETCH_MULTIPLIER = 2
+TSQUERY_UNSAFE = re.compile(r'[^\w一-鿿]')
+# 关键词检索得分归一化时 ts_rank 映射为0.5的值
+KEYWORD_RANK_HALF = 0.1
+
+
+def normalize_score(search_mode: str, score: float) -> float:
+    """
+    把各检索模式的原始得分映射到[0, 1]，便于跨知识库合并排序
+
+    semantic 为余弦相似度，keyword 为无上界的 ts_rank，hybrid 为RRF得分（两路均排第一时最大）。
+    """
+    if search_mode == 'semantic':
+        return max(0.0, min(1.0, score))
+    if search_mode == 'keyword':
+        return score / (score + KEYWORD_RANK_HALF) if score > 0 else 0.0
+    return min(1.0, score * (RRF_K + 1) / 2)
+
+
+@dataclass
+class RetrievedChunk:
+    """检索结果"""
+    chunk_id: str
+    document_id: str
+    document_name: str
+    content: str
+    score: float
+    metadata: Dict[str, Any] = field(default_factory=dict)
+    # 启用重排序时为重排序模型得分，score 仍为检索得分
+    rerank_score: Optional[float] = None
+
+    def to_dict(self):
+        data = {
+            'chunk_id': str(self.chunk_id),
+            'document_id': str(self.document_id),
+            'document_name': self.document_name,
+            'content': self.content,
+            'score': self.score,
+            'metadata': self.metadata,
+        }
+        if self.rerank_score is not None:
+            data['rerank_score'] = self.rerank_score
+        return data
+
+
+class RetrievalService:
+    """
+    单个知识库的检索服务
+    """
+
+    def __init__(self, knowledge_base, filters=None):
+        self.knowledge_base = knowledge_base
+        # 过滤条件（apps.embedding.filters.SearchFilters），标签名称按本知识库解析
+        self.filters = filters.resolve(knowledge_base) if filters is not None else None
+        try:
+            kb_settings = knowledge_base.settings
+        except ObjectDoesNotExist:
+            kb_settings = None
+        self.search_mode = kb_settings.search_mode if kb_settings else 'semantic'
+        self.enable_rerank = bool(kb_settings and kb_settings.enable_rerank)
+        self.rerank_model = (kb_settings.rerank_model or None) if kb_settings else None
+
+    def embedding_model(self):
+        from apps.embedding.services import active_embedding_model
+        return active_embedding_model(self.knowledge_base, pin=False)
+
+    def embed_query(self, query: str) -> List[float]:
+        return self.embedding_model().embed_query(query)
+
+    def semantic_search(self, query: str, top_k: int) -> List[Tuple[str, float]]:
+        from apps.embedding.search import VectorSearcher
+
+        model = self.embedding_model()
+        searcher = VectorSearcher(
+            self.knowledge_base, dimensions=model.dimensions, model_name=model.name, filters=self.filters
+        )
+        hits = searcher.search(model.embed_query(query), top_k)
+        threshold = self.knowledge_base.similarity_threshold
+        return [(hit.chunk_id, hit.score) for hit in hits if hit.score >= threshold]
+
+    def keyword_search(self, query: str, top_k: int) -> List[Tuple[str, float]]:
+        terms = []
+        for token in tokenize_for_search(query):
+            token = TSQUERY_UNSAFE.sub('', token)
+            if token and token not in terms:
+                terms.append(token)
+        if not terms:
+            return []
+        search_query = SearchQuery(' | '.join(terms), config='simple', search_type='raw')
+        # 与 document_chunks_search_gin 索引表达式一致
+        search_vector = SearchVector('search_text', config='simple')
+        queryset = DocumentChunk.objects.filter(knowledge_base=self.knowledge_base)
+        if self.filters is not None:
+            queryset = self.filters.apply_to_chunks(queryset)
+        rows = queryset.annotate(
+            search=search_vector
+        ).filter(
+            search=search_query
+        ).annotate(
+            rank=SearchRank(search_vector, search_query)
+        ).order_by('-rank').values_list('id', 'rank')[:top_k]
+        return list(rows)
+
+    def hybrid_search(self, query: str, top_k: int) -> List[Tuple[str, float]]:
+        fetch = top_k * HYBRID_FETCH_MULTIPLIER
+        scores: Dict[str, float] = {}
+        for ranked in (self.semantic_search(query, fetch), self.keyword_search(query, fetch)):
+            for rank, (chunk_id, _) in enumerate(ranked):
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (RRF_K + rank + 1)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+
+    def search(self, query: str, top_k: Optional[int] = None,
+               search_mode: Optional[str] = None) -> List[RetrievedChunk]:
+        """
+        检索知识库，返回按相关度排序的分块
+        """
+        top_k = top_k or self.knowledge_base.top_k
+        search_mode = search_mode or self.search_mode
+        if search_mode not in SEARCH_MODES:
+            raise ValueError(f'不支持的检索模式: {search_mode}')
+        if not self.enable_rerank:
+            return self.load_chunks(getattr(self, f'{search_mode}_search')(query, top_k))
+        fetch = top_k * settings.RERANK_FETCH_MULTIPLIER
+        candidates = self.load_chunks(getattr(self, f'{search_mode}_search')(query, fetch))
+        return self.rerank(query, candidates, top_k)
+
+    def rerank(self, query: str, chunks: List[RetrievedChunk], top_k: int) -> List[RetrievedChunk]:
+        """用重排序模型（cross-encoder）对候选重新排序，模型不可用或配额等待超时时退回检索顺序"""
+        from apps.model_management.clients import ProviderError
+        from apps.model_management.limits import RateLimitTimeout
+        from apps.model_management.registry import get_rerank_model
+
+        if len(chunks) <= 1:
+            return chunks[:top_k]
+        try:
+            scores = get_rerank_model(self.rerank_model).rerank(query, [chunk.content for chunk in chunks])
+        except (ProviderError, RateLimitTimeout) as exc:
+            logger.warning('重排序失败，使用检索顺序: %s', exc)
+            return chunks[:top_k]
+        for chunk, score in zip(chunks, scores):
+            chunk.rerank_score = float(score)
+        return sorted(chunks, key=lambda chunk: chunk.rerank_score, reverse=True)[:top_k]
+
+    def load_chunks(self, ranked: List[Tuple[str, float]]) -> List[RetrievedChunk]:
+        """按排序结果一次性加载分块内容，过滤已删除文档"""
+        if not ranked:
+            return []
+        rows = DocumentChunk.objects.filter(
+            id__in=[chunk_id for chunk_id, _ in ranked],
+            document__is_deleted=False,
+        ).values_list('id', 'document_id', 'document__name', 'content', 'metadata')
+        by_id = {row[0]: row for row in rows}
+        results = []
+        for chunk_id, score in ranked:
+            row = by_id.get(chunk_id)
+            if row is not None:
+                results.append(RetrievedChunk(row[0], row[1], row[2], row[3], float(score), row[4] or {}))
+        return results
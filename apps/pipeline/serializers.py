@@ -0,0 +1,25 @@
+"""
+RAG管道序列化器
+"""
+from rest_framework import serializers
+
+from apps.embedding.filters import SearchFilters
+from .retrieval import SEARCH_MODES
+
+
+class FederatedSearchSerializer(serializers.Serializer):
+    """
+    跨知识库检索请求
+    """
+    query = serializers.CharField(max_length=2000)
+    top_k = serializers.IntegerField(required=False, default=10, min_value=1, max_value=100)
+    search_mode = serializers.ChoiceField(choices=SEARCH_MODES, required=False)
+    knowledge_bases = serializers.ListField(child=serializers.UUIDField(), required=False, allow_empty=False)
+    timeout = serializers.FloatField(required=False, min_value=0.1, max_value=30)
+    filters = serializers.DictField(required=False)
+
+    def validate_filters(self, value):
+        try:
+            return SearchFilters.from_dict(value)
+        except ValueError as exc:
+            raise serializers.ValidationError(str(exc))
@@ -2,7 +2,8 @@
 RAG管道URL配置
 """
 from django.urls import path
+from .views import FederatedSearchView
 
 urlpatterns = [
-    # TODO: 添加RAG管道相关的URL
-] 
\ No newline at end of file
+    path('search/', FederatedSearchView.as_view(), name='federated-search'),
+]
@@ -0,0 +1,46 @@
+"""
+RAG管道视图
+"""
+from django.conf import settings
+from rest_framework import permissions, status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from apps.core.replicas import ReplicaReadMixin
+from apps.model_management.limits import ModelRateLimited
+from .federated import FederatedSearch, accessible_knowledge_bases
+from .serializers import FederatedSearchSerializer
+
+
+class FederatedSearchView(ReplicaReadMixin, APIView):
+    """
+    跨知识库检索：在当前用户可访问的全部（或指定的）知识库中检索
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    throttle_scope = 'expensive'
+    # 检索是只读的 POST
+    replica_methods = ('POST',)
+
+    def post(self, request):
+        serializer = FederatedSearchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        knowledge_bases = accessible_knowledge_bases(request.user).select_related('settings')
+        if data.get('knowledge_bases'):
+            knowledge_bases = knowledge_bases.filter(id__in=data['knowledge_bases'])
+        limit = settings.FEDERATED_SEARCH['MAX_KNOWLEDGE_BASES']
+        knowledge_bases = list(knowledge_bases.order_by('-updated_at')[:limit + 1])
+        if len(knowledge_bases) > limit:
+            return Response(
+                {'error': f'一次最多检索 {limit} 个知识库，请通过 knowledge_bases 指定范围'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        result = FederatedSearch(knowledge_bases, timeout=data.get('timeout')).search(
+            data['query'], top_k=data['top_k'], search_mode=data.get('search_mode'), filters=data.get('filters')
+        )
+        outcomes = result['knowledge_bases']
+        if outcomes and all(outcome['status'] == 'rate_limited' for outcome in outcomes):
+            # 全部知识库都因模型配额不足失败时返回 503，部分失败时仍返回部分结果
+            raise ModelRateLimited(max(outcome.get('retry_after') or 0 for outcome in outcomes))
+        return Response(result)
@@ -4,4 +4,14 @@ from django.apps import AppConfig
 class UsersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.users'
-    verbose_name = '用户管理' 
\ No newline at end of file
+    verbose_name = '用户管理'
+
+    def ready(self):
+        from django.db.models.signals import post_save, post_delete
+        from rest_framework.authtoken.models import Token
+        from .authentication import invalidate_token, invalidate_user
+        from .models import User
+
+        post_save.connect(invalidate_user, sender=User, weak=False)
+        post_delete.connect(invalidate_user, sender=User, weak=False)
+        post_delete.connect(invalidate_token, sender=Token, weak=False)
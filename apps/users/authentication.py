@@ -0,0 +1,284 @@
+"""
+带过期时间的令牌认证
+
+DRF 的 TokenAuthentication 每个请求都要联表查询 Token 与用户，且令牌永不过期。
+ExpiringTokenAuthentication 先查Redis中的令牌快照（用户的非敏感字段与过期时间），
+命中时直接构造用户对象，不访问数据库；未命中时查库一次并写回缓存。
+
+- 令牌自签发（Token.created）起 AUTH_TOKEN['TTL'] 秒后过期，过期令牌在使用时删除；
+- 快照的缓存时间为 AUTH_TOKEN['CACHE_TTL'] 秒（不超过令牌剩余有效期）；
+- 登出、修改密码时删除令牌并立即清除快照（revoke_tokens），所有worker同时生效；
+  未命中时写入快照后再确认令牌仍存在，避免与撤销并发时缓存已撤销的令牌；
+- 用户信息变更（保存/删除）时清除该用户的快照，下一次请求重新查库；
+- Redis不可用时一段时间内直接查库，认证不受影响。
+
+ApiKeyAuthentication 供程序调用方使用（Authorization: ApiKey <key>）。
+"""
+import hashlib
+import json
+import logging
+import time
+import uuid
+from datetime import date, datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import models
+from django.utils import timezone
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+logger = logging.getLogger('manxiai.users')
+
+KEY_PREFIX = 'manxiai:auth'
+
+# 快照中不保存的字段
+EXCLUDED_FIELDS = ('password',)
+
+
+def _encode(value):
+    # 时间保留完整精度（DjangoJSONEncoder 会截断到毫秒，快照对象保存时会写回截断后的值）
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    raise TypeError(f'无法序列化的类型: {type(value).__name__}')
+
+
+def token_cache_key(key: str) -> str:
+    """缓存键只使用令牌的摘要，Redis中不出现令牌明文"""
+    return f'{KEY_PREFIX}:token:{hashlib.sha256(key.encode()).hexdigest()}'
+
+
+def user_index_key(user_pk) -> str:
+    """用户 -> 其令牌快照缓存键的集合，用于按用户清除"""
+    return f'{KEY_PREFIX}:user:{user_pk}'
+
+
+def token_expires_at(token: Token) -> Optional[datetime]:
+    ttl = settings.AUTH_TOKEN['TTL']
+    if ttl <= 0:
+        return None
+    return token.created + timedelta(seconds=ttl)
+
+
+def is_token_expired(token: Token) -> bool:
+    expires_at = token_expires_at(token)
+    return expires_at is not None and expires_at <= timezone.now()
+
+
+class TokenCache:
+    """
+    Redis中的令牌快照
+    """
+
+    RETRY_INTERVAL = 30.0
+
+    def __init__(self, client=None):
+        self._client = client
+        self._retry_at = 0.0
+
+    def _redis(self):
+        if time.monotonic() < self._retry_at:
+            return None
+        if self._client is None:
+            from apps.core.redis import get_redis
+            self._client = get_redis()
+        return self._client
+
+    def _redis_failed(self, exc):
+        logger.warning('令牌缓存的Redis不可用，%s 秒内认证直接查询数据库: %s', self.RETRY_INTERVAL, exc)
+        self._retry_at = time.monotonic() + self.RETRY_INTERVAL
+
+    @staticmethod
+    def _fields():
+        return [
+            field for field in get_user_model()._meta.concrete_fields
+            if field.name not in EXCLUDED_FIELDS
+        ]
+
+    def dump_user(self, user) -> Dict:
+        data = {}
+        for field in self._fields():
+            value = getattr(user, field.attname)
+            if isinstance(field, models.FileField):
+                value = value.name if value else None
+            data[field.attname] = value
+        return data
+
+    def load_user(self, data: Dict):
+        """
+        由快照构造用户对象：未缓存的字段（如密码）为延迟字段，访问时才查询；
+        保存时只更新已加载的字段，不会用空值覆盖数据库中的密码。
+        """
+        fields = self._fields()
+        values = [None if data[field.attname] is None else field.to_python(data[field.attname]) for field in fields]
+        return get_user_model().from_db(
+            'default', [field.attname for field in fields], values,
+        )
+
+    def get(self, key: str) -> Optional[Tuple[object, Optional[float]]]:
+        """返回 (用户, 过期时间戳)；未命中或Redis不可用时返回None"""
+        client = self._redis()
+        if client is None:
+            return None
+        try:
+            raw = client.get(token_cache_key(key))
+        except Exception as exc:
+            self._redis_failed(exc)
+            return None
+        if raw is None:
+            return None
+        try:
+            snapshot = json.loads(raw)
+            return self.load_user(snapshot['user']), snapshot['expires_at']
+        except Exception:
+            # 用户模型字段变化后的旧快照，按未命中处理
+            logger.exception('令牌快照解析失败')
+            return None
+
+    def set(self, key: str, user, expires_at: Optional[datetime]) -> bool:
+        """写入快照，返回是否写入"""
+        client = self._redis()
+        if client is None:
+            return False
+        ttl = settings.AUTH_TOKEN['CACHE_TTL']
+        if ttl <= 0:
+            return False
+        if expires_at is not None:
+            ttl = min(ttl, int((expires_at - timezone.now()).total_seconds()))
+            if ttl <= 0:
+                return False
+        snapshot = json.dumps({
+            'user': self.dump_user(user),
+            'expires_at': expires_at.timestamp() if expires_at is not None else None,
+        }, default=_encode)
+        cache_key = token_cache_key(key)
+        index_key = user_index_key(user.pk)
+        try:
+            pipe = client.pipeline(transaction=False)
+            pipe.set(cache_key, snapshot, ex=ttl)
+            pipe.sadd(index_key, cache_key)
+            pipe.expire(index_key, settings.AUTH_TOKEN['CACHE_TTL'])
+            pipe.execute()
+        except Exception as exc:
+            self._redis_failed(exc)
+            return False
+        return True
+
+    def delete(self, *keys: str):
+        client = self._redis()
+        if client is None or not keys:
+            return
+        try:
+            client.delete(*(token_cache_key(key) for key in keys))
+        except Exception as exc:
+            self._redis_failed(exc)
+
+    def delete_user(self, user_pk):
+        """清除用户的全部令牌快照"""
+        client = self._redis()
+        if client is None:
+            return
+        index_key = user_index_key(user_pk)
+        try:
+            cache_keys = client.smembers(index_key)
+            client.delete(index_key, *cache_keys)
+        except Exception as exc:
+            self._redis_failed(exc)
+
+
+token_cache = TokenCache()
+
+
+class ExpiringTokenAuthentication(TokenAuthentication):
+    """
+    请求头 Authorization: Token <key>，令牌快照命中缓存时不查询数据库
+    """
+
+    def authenticate_credentials(self, key):
+        cached = token_cache.get(key)
+        if cached is not None:
+            user, expires_at = cached
+            if expires_at is not None and expires_at <= time.time():
+                self._expire(key)
+            if not user.is_active:
+                raise exceptions.AuthenticationFailed('用户已停用或已删除')
+            # request.auth 只用于判断认证方式与取令牌值，不再查询 Token
+            return user, Token(key=key, user=user)
+
+        try:
+            token = Token.objects.select_related('user').get(key=key)
+        except Token.DoesNotExist:
+            raise exceptions.AuthenticationFailed('无效的令牌')
+        if is_token_expired(token):
+            self._expire(key)
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed('用户已停用或已删除')
+
+        if token_cache.set(key, token.user, token_expires_at(token)) and not Token.objects.filter(key=key).exists():
+            # 查库之后、写入快照之前令牌被撤销（revoke_tokens 先删令牌再清快照）时，
+            # 清快照可能早于这里的写入，写入后再确认一次，不缓存已撤销的令牌
+            token_cache.delete(key)
+            raise exceptions.AuthenticationFailed('无效的令牌')
+        return token.user, token
+
+    @staticmethod
+    def _expire(key):
+        Token.objects.filter(key=key).delete()
+        raise exceptions.AuthenticationFailed('令牌已过期，请重新登录')
+
+
+class ApiKeyAuthentication(TokenAuthentication):
+    """
+    请求头 Authorization: ApiKey <key>，request.auth 为 ApiKey 实例（限流按密钥计量）
+
+    每次校验查询数据库，停用或删除密钥立即生效；last_used_at 每分钟最多更新一次。
+    """
+    keyword = 'ApiKey'
+
+    LAST_USED_INTERVAL = timedelta(minutes=1)
+
+    def authenticate_credentials(self, key):
+        from .models import ApiKey
+
+        try:
+            api_key = ApiKey.objects.select_related('user').get(key=key, is_active=True)
+        except ApiKey.DoesNotExist:
+            raise exceptions.AuthenticationFailed('无效的API密钥')
+        now = timezone.now()
+        if api_key.expires_at is not None and api_key.expires_at <= now:
+            raise exceptions.AuthenticationFailed('API密钥已过期')
+        if not api_key.user.is_active:
+            raise exceptions.AuthenticationFailed('用户已停用或已删除')
+        if api_key.last_used_at is None or now - api_key.last_used_at >= self.LAST_USED_INTERVAL:
+            ApiKey.objects.filter(pk=api_key.pk).update(last_used_at=now)
+            api_key.last_used_at = now
+        return api_key.user, api_key
+
+
+def issue_token(user) -> Token:
+    """返回用户当前有效的令牌，已过期时重新签发"""
+    token, created = Token.objects.get_or_create(user=user)
+    if not created and is_token_expired(token):
+        revoke_tokens(user)
+        token = Token.objects.create(user=user)
+    return token
+
+
+def revoke_tokens(user):
+    """删除用户的令牌，快照由 Token 的 post_delete 信号清除，所有worker立即生效"""
+    Token.objects.filter(user=user).delete()
+    token_cache.delete_user(user.pk)
+
+
+def invalidate_user(sender, instance, **kwargs):
+    """用户信息变更后清除其快照（User 的 post_save / post_delete）"""
+    token_cache.delete_user(instance.pk)
+
+
+def invalidate_token(sender, instance, **kwargs):
+    """令牌删除后清除快照（Token 的 post_delete，包括在管理后台删除）"""
+    token_cache.delete(instance.key)
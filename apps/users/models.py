@@ -2,6 +2,7 @@
 用户管理模型
 """
 import uuid
+
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.utils.translation import gettext_lazy as _
@@ -12,6 +13,7 @@ class User(AbstractUser):
     """
     自定义用户模型
     """
+    # 用户主键对外暴露，始终使用 uuid4，不泄露注册时间
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     email = models.EmailField(_('email address'), unique=True)
     phone = models.CharField(max_length=20, blank=True, null=True, verbose_name='手机号')
@@ -57,6 +59,12 @@ class UserProfile(BaseModel):
         return f"{self.user.email} - Profile"
 
 
+class TeamQuerySet(models.QuerySet):
+    def with_members_count(self):
+        """带上拥有者与成员数（annotated_members_count），序列化团队列表时不再逐行查询"""
+        return self.select_related('owner').annotate(annotated_members_count=models.Count('teammember'))
+
+
 class Team(BaseModel):
     """
     团队模型
@@ -67,6 +75,8 @@ class Team(BaseModel):
     members = models.ManyToManyField(User, through='TeamMember', related_name='teams', verbose_name='成员')
     is_active = models.BooleanField(default=True, verbose_name='是否激活')
     
+    objects = TeamQuerySet.as_manager()
+    
     class Meta:
         db_table = 'teams'
         verbose_name = '团队'
@@ -76,6 +86,14 @@ class Team(BaseModel):
         return self.name
 
 
+class TeamMemberQuerySet(models.QuerySet):
+    def with_details(self):
+        """用户连接查询，嵌套的团队（含拥有者与成员数）一次预取"""
+        return self.select_related('user').prefetch_related(
+            models.Prefetch('team', queryset=Team.objects.with_members_count())
+        )
+
+
 class TeamMember(BaseModel):
     """
     团队成员关系
@@ -91,6 +109,8 @@ class TeamMember(BaseModel):
     role = models.CharField(max_length=20, choices=RoleChoices.choices, default=RoleChoices.MEMBER, verbose_name='角色')
     joined_at = models.DateTimeField(auto_now_add=True, verbose_name='加入时间')
     
+    objects = TeamMemberQuerySet.as_manager()
+    
     class Meta:
         db_table = 'team_members'
         unique_together = ['team', 'user']
@@ -3,6 +3,8 @@
 """
 from rest_framework import serializers
 from django.contrib.auth import authenticate
+from django.db.models import Count
+from apps.core.rows import RowSerializer
 from django.contrib.auth.password_validation import validate_password
 from .models import User, UserProfile, Team, TeamMember, ApiKey
 
@@ -103,7 +105,9 @@ class TeamSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'owner', 'created_at', 'updated_at']
     
     def get_members_count(self, obj):
-        return obj.members.count()
+        # 查询集经过 with_members_count() 时直接使用注解，避免逐行COUNT
+        count = getattr(obj, 'annotated_members_count', None)
+        return obj.members.count() if count is None else count
 
 
 class TeamMemberSerializer(serializers.ModelSerializer):
@@ -119,6 +123,53 @@ class TeamMemberSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'joined_at', 'created_at']
 
 
+def user_row_fields(prefix):
+    """UserSerializer 的可读字段"""
+    return {
+        name: f'{prefix}__{name}' for name in (
+            'id', 'email', 'username', 'first_name', 'last_name', 'phone',
+            'avatar', 'is_email_verified', 'is_phone_verified', 'created_at',
+        )
+    }
+
+
+class TeamMemberRowSerializer(RowSerializer):
+    """
+    团队成员列表的行序列化器，输出与 TeamMemberSerializer 相同；
+    团队、拥有者与用户在同一条SQL中连接查询，成员数按整页涉及的团队一次聚合
+    """
+    model = TeamMember
+    fields = {
+        'id': 'id',
+        'team': {
+            'id': 'team__id',
+            'name': 'team__name',
+            'description': 'team__description',
+            'owner': user_row_fields('team__owner'),
+            'members_count': 'team_members_count',
+            'is_active': 'team__is_active',
+            'created_at': 'team__created_at',
+            'updated_at': 'team__updated_at',
+        },
+        'user': user_row_fields('user'),
+        'role': 'role',
+        'joined_at': 'joined_at',
+        'created_at': 'created_at',
+    }
+    computed = ('team_members_count',)
+
+    def prepare_rows(self, rows):
+        team_ids = {row['team__id'] for row in rows}
+        counts = dict(
+            TeamMember.objects.filter(team_id__in=team_ids).order_by().values('team').annotate(
+                count=Count('id')
+            ).values_list('team', 'count')
+        ) if team_ids else {}
+        for row in rows:
+            row['team_members_count'] = counts.get(row['team__id'], 0)
+        return rows
+
+
 class ApiKeySerializer(serializers.ModelSerializer):
     """
     API密钥序列化器
@@ -0,0 +1,57 @@
+"""
+用户与团队测试
+"""
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from apps.users.models import Team, TeamMember, User
+
+
+class TeamQueryCountTests(TestCase):
+    """
+    团队列表与团队成员列表的SQL查询数与数据量无关（逐行查询的回归检查，大数据量见 benchmarks/query_counts.py）
+    """
+    # 均不超过一页，逐行查询会体现为查询数随数据量增长
+    SIZES = (2, 15)
+
+    def seed(self, size):
+        """一个用户参与 size 个团队，每个团队 size 个成员"""
+        user = User.objects.create_user(email=f'query-{size}@example.com', username=f'query-{size}')
+        others = User.objects.bulk_create([
+            User(email=f'query-{size}-{index}@example.com', username=f'query-{size}-{index}', password='!')
+            for index in range(size)
+        ])
+        teams = Team.objects.bulk_create([Team(name=f'团队 {index}', owner=others[index]) for index in range(size)])
+        TeamMember.objects.bulk_create([
+            TeamMember(team=team, user=member) for team in teams for member in [user, *others]
+        ])
+        return user, teams[0]
+
+    def count_queries(self, user, url):
+        client = APIClient()
+        client.force_authenticate(user)
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries), response.json()
+
+    def test_team_list(self):
+        counts = []
+        for size in self.SIZES:
+            user, _ = self.seed(size)
+            queries, body = self.count_queries(user, '/api/v1/auth/teams/')
+            self.assertEqual(body['count'], size)
+            self.assertEqual({team['members_count'] for team in body['results']}, {size + 1})
+            counts.append(queries)
+        self.assertEqual(counts[0], counts[1], f'团队列表查询数随团队数增长: {counts}')
+
+    def test_team_members(self):
+        counts = []
+        for size in self.SIZES:
+            user, team = self.seed(size)
+            queries, body = self.count_queries(user, f'/api/v1/auth/teams/{team.pk}/members/')
+            self.assertEqual(body['count'], size + 1)
+            counts.append(queries)
+        self.assertEqual(counts[0], counts[1], f'团队成员列表查询数随成员数增长: {counts}')
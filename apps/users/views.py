@@ -4,14 +4,14 @@
 from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.authtoken.models import Token
 from django.contrib.auth import login, logout
 from django.shortcuts import get_object_or_404
+from .authentication import issue_token, revoke_tokens, token_expires_at
 from .models import User, UserProfile, Team, TeamMember, ApiKey
 from .serializers import (
     UserSerializer, UserProfileSerializer, LoginSerializer, 
     ChangePasswordSerializer, TeamSerializer, TeamMemberSerializer, 
-    ApiKeySerializer
+    TeamMemberRowSerializer, ApiKeySerializer
 )
 
 
@@ -27,9 +27,9 @@ class UserViewSet(viewsets.ModelViewSet):
         """
         根据action设置权限
         """
-        if self.action == 'create':
+        if self.action in ['create', 'login']:
             permission_classes = [permissions.AllowAny]
-        elif self.action in ['me', 'change_password']:
+        elif self.action in ['me', 'change_password', 'logout']:
             permission_classes = [permissions.IsAuthenticated]
         else:
             permission_classes = [permissions.IsAdminUser]
@@ -59,9 +59,10 @@ class UserViewSet(viewsets.ModelViewSet):
         if serializer.is_valid():
             user = serializer.validated_data['user']
             login(request, user)
-            token, created = Token.objects.get_or_create(user=user)
+            token = issue_token(user)
             return Response({
                 'token': token.key,
+                'expires_at': token_expires_at(token),
                 'user': UserSerializer(user).data
             })
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -69,8 +70,10 @@ class UserViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['post'])
     def logout(self, request):
         """
-        用户登出
+        用户登出（令牌立即失效）
         """
+        if request.user.is_authenticated:
+            revoke_tokens(request.user)
         logout(request)
         return Response({'message': '登出成功'})
     
@@ -84,7 +87,14 @@ class UserViewSet(viewsets.ModelViewSet):
             user = request.user
             user.set_password(serializer.validated_data['new_password'])
             user.save()
-            return Response({'message': '密码修改成功'})
+            # 旧令牌全部吊销，返回新令牌
+            revoke_tokens(user)
+            token = issue_token(user)
+            return Response({
+                'message': '密码修改成功',
+                'token': token.key,
+                'expires_at': token_expires_at(token),
+            })
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
@@ -120,8 +130,11 @@ class TeamViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         """
         只返回用户参与的团队
+
+        用子查询而不是通过成员表连接过滤，成员数注解才能统计全部成员
         """
-        return self.queryset.filter(members=self.request.user)
+        member_of = TeamMember.objects.filter(user=self.request.user).values('team')
+        return self.queryset.filter(id__in=member_of).with_members_count().order_by('created_at')
     
     def perform_create(self, serializer):
         """
@@ -135,6 +148,19 @@ class TeamViewSet(viewsets.ModelViewSet):
             role=TeamMember.RoleChoices.OWNER
         )
     
+    @action(detail=True, methods=['get'])
+    def members(self, request, pk=None):
+        """
+        团队成员列表（分页）
+        """
+        team = self.get_object()
+        rows = TeamMemberRowSerializer(context=self.get_serializer_context())
+        queryset = rows.project(TeamMember.objects.filter(team=team).order_by('joined_at'))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(rows.to_representation(page))
+        return Response(rows.to_representation(queryset))
+    
     @action(detail=True, methods=['post'])
     def add_member(self, request, pk=None):
         """
@@ -154,6 +180,7 @@ class TeamViewSet(viewsets.ModelViewSet):
             return Response({'error': '用户已经是团队成员'}, status=status.HTTP_400_BAD_REQUEST)
         
         member = TeamMember.objects.create(team=team, user=user, role=role)
+        member = TeamMember.objects.with_details().get(pk=member.pk)
         serializer = TeamMemberSerializer(member)
         return Response(serializer.data)
     
@@ -0,0 +1,493 @@
+"""
+工作流执行引擎
+
+按拓扑顺序调度DAG节点，相互独立的分支通过asyncio并发执行，
+整体耗时取决于最长分支而不是各分支之和。
+"""
+import asyncio
+import hashlib
+import json
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from .models import WorkflowNode
+
+NodeType = WorkflowNode.NodeTypeChoices
+
+# 模板变量，例如 {{inputs.question}} 或 {{retrieve_a.chunks}}
+TEMPLATE_PATTERN = re.compile(r'\{\{\s*([\w.]+)\s*\}\}')
+
+
+class WorkflowError(Exception):
+    """工作流定义或执行错误"""
+
+
+@dataclass
+class NodeSpec:
+    """节点定义（与ORM解耦，便于在事件循环中使用）"""
+    key: str
+    node_type: str
+    config: Dict[str, Any] = field(default_factory=dict)
+    cacheable: bool = True
+
+
+@dataclass
+class EdgeSpec:
+    """连线定义"""
+    source: str
+    target: str
+    condition: str = ''
+
+
+class WorkflowGraph:
+    """
+    工作流DAG
+    """
+
+    def __init__(self, nodes: List[NodeSpec], edges: List[EdgeSpec]):
+        self.nodes = {node.key: node for node in nodes}
+        if len(self.nodes) != len(nodes):
+            raise WorkflowError('节点标识重复')
+        self.edges = edges
+        self.outgoing: Dict[str, List[EdgeSpec]] = {key: [] for key in self.nodes}
+        self.incoming: Dict[str, List[EdgeSpec]] = {key: [] for key in self.nodes}
+        for edge in edges:
+            if edge.source not in self.nodes or edge.target not in self.nodes:
+                raise WorkflowError(f'连线引用了不存在的节点: {edge.source} -> {edge.target}')
+            self.outgoing[edge.source].append(edge)
+            self.incoming[edge.target].append(edge)
+        self.order = self._topological_order()
+
+    @classmethod
+    def from_workflow(cls, workflow):
+        """从工作流模型构建DAG"""
+        nodes = [
+            NodeSpec(node.key, node.node_type, node.config or {}, node.cacheable)
+            for node in workflow.nodes.all()
+        ]
+        # 复用视图预取的连线（见 WorkflowViewSet.get_queryset）
+        edges = [EdgeSpec(edge.source.key, edge.target.key, edge.condition) for edge in workflow.edges.all()]
+        return cls(nodes, edges)
+
+    def _topological_order(self):
+        """Kahn算法求拓扑序，同时检测环"""
+        indegree = {key: len(edges) for key, edges in self.incoming.items()}
+        queue = [key for key, degree in indegree.items() if degree == 0]
+        order = []
+        while queue:
+            key = queue.pop()
+            order.append(key)
+            for edge in self.outgoing[key]:
+                indegree[edge.target] -= 1
+                if indegree[edge.target] == 0:
+                    queue.append(edge.target)
+        if len(order) != len(self.nodes):
+            raise WorkflowError('工作流存在循环依赖')
+        return order
+
+
+class NodeContext:
+    """
+    节点执行上下文
+    """
+
+    def __init__(self, node: NodeSpec, inputs: Dict[str, Any], results: Dict[str, Any],
+                 upstream: Optional[List[str]] = None, user=None):
+        self.node = node
+        self.inputs = inputs
+        self.results = results
+        self.upstream = upstream or []
+        # 运行工作流的用户，访问知识库等资源时按其权限校验
+        self.user = user
+
+    def resolve(self, path: str) -> Any:
+        """按点号路径取值，inputs表示运行输入，其余为上游节点输出"""
+        parts = path.split('.')
+        if parts[0] == 'inputs':
+            value = self.inputs
+        elif parts[0] in self.results:
+            value = self.results[parts[0]]
+        else:
+            return None
+        for part in parts[1:]:
+            if isinstance(value, dict):
+                value = value.get(part)
+            elif isinstance(value, (list, tuple)) and part.isdigit() and int(part) < len(value):
+                value = value[int(part)]
+            else:
+                return None
+        return value
+
+    def render(self, value: Any) -> Any:
+        """渲染配置中的模板变量"""
+        if isinstance(value, str):
+            matched = TEMPLATE_PATTERN.fullmatch(value.strip())
+            if matched:
+                # 整个字段就是一个变量时保留原始类型
+                return self.resolve(matched.group(1))
+            return TEMPLATE_PATTERN.sub(lambda m: _to_text(self.resolve(m.group(1))), value)
+        if isinstance(value, dict):
+            return {k: self.render(v) for k, v in value.items()}
+        if isinstance(value, list):
+            return [self.render(v) for v in value]
+        return value
+
+    def rendered_config(self) -> Dict[str, Any]:
+        return self.render(self.node.config)
+
+
+def _to_text(value: Any) -> str:
+    if value is None:
+        return ''
+    if isinstance(value, str):
+        return value
+    return json.dumps(value, ensure_ascii=False, default=str)
+
+
+def to_json_safe(value: Any) -> Any:
+    """转换为可存入 JSONField 的值，无法序列化的对象（如工具返回的自定义对象）转为字符串"""
+    return json.loads(json.dumps(value, ensure_ascii=False, default=str))
+
+
+# ---------------------------------------------------------------------------
+# 节点处理器注册
+# ---------------------------------------------------------------------------
+
+Handler = Callable[[NodeContext], Awaitable[Any]]
+
+
+@dataclass
+class NodeHandler:
+    func: Handler
+    # 输出仅由节点类型和渲染后的配置决定，可在同一次运行内复用
+    cacheable: bool = True
+
+
+NODE_HANDLERS: Dict[str, NodeHandler] = {}
+TOOLS: Dict[str, Callable[..., Any]] = {}
+
+
+def register_node_handler(node_type: str, cacheable: bool = True):
+    """注册节点处理器"""
+    def decorator(func):
+        NODE_HANDLERS[node_type] = NodeHandler(func, cacheable)
+        return func
+    return decorator
+
+
+def register_tool(name: str):
+    """注册可被工具节点调用的函数，同步函数会在线程池中执行"""
+    def decorator(func):
+        TOOLS[name] = func
+        return func
+    return decorator
+
+
+@register_node_handler(NodeType.START, cacheable=False)
+async def run_start(context: NodeContext):
+    return dict(context.inputs)
+
+
+@register_node_handler(NodeType.END, cacheable=False)
+async def run_end(context: NodeContext):
+    config = context.rendered_config()
+    if 'output' in config:
+        return config['output']
+    # 未配置输出时汇总所有上游节点结果
+    return {key: context.results.get(key) for key in context.upstream if key in context.results}
+
+
+CONDITION_OPERATORS = {
+    'eq': lambda left, right: left == right,
+    'ne': lambda left, right: left != right,
+    'gt': lambda left, right: left is not None and left > right,
+    'gte': lambda left, right: left is not None and left >= right,
+    'lt': lambda left, right: left is not None and left < right,
+    'lte': lambda left, right: left is not None and left <= right,
+    'contains': lambda left, right: left is not None and right in left,
+    'empty': lambda left, right: not left,
+    'not_empty': lambda left, right: bool(left),
+}
+
+
+@register_node_handler(NodeType.CONDITION, cacheable=False)
+async def run_condition(context: NodeContext):
+    """
+    条件节点，输出命中的分支标签
+
+    配置示例: {"source": "retrieve.chunks", "operator": "not_empty",
+              "true_branch": "answer", "false_branch": "fallback"}
+    """
+    config = context.node.config
+    operator = CONDITION_OPERATORS.get(config.get('operator', 'not_empty'))
+    if operator is None:
+        raise WorkflowError(f"不支持的条件运算符: {config.get('operator')}")
+    left = context.resolve(config.get('source', ''))
+    right = context.render(config.get('value'))
+    matched = operator(left, right)
+    return {
+        'matched': matched,
+        'branch': config.get('true_branch', 'true') if matched else config.get('false_branch', 'false'),
+    }
+
+
+@register_node_handler(NodeType.TOOL)
+async def run_tool(context: NodeContext):
+    config = context.rendered_config()
+    tool = TOOLS.get(config.get('tool'))
+    if tool is None:
+        raise WorkflowError(f"未注册的工具: {config.get('tool')}")
+    arguments = config.get('arguments') or {}
+    if asyncio.iscoroutinefunction(tool):
+        return await tool(**arguments)
+    return await asyncio.to_thread(tool, **arguments)
+
+
+def _retrieve(config: Dict[str, Any], user):
+    from django.core.exceptions import ValidationError
+    from apps.embedding.filters import SearchFilters
+    from apps.pipeline.federated import accessible_knowledge_bases
+    from apps.pipeline.retrieval import RetrievalService
+
+    if user is None:
+        raise WorkflowError('检索节点需要运行用户')
+    try:
+        # 知识库ID可能来自运行输入（模板变量），每次运行都按运行用户的权限解析
+        knowledge_base = accessible_knowledge_bases(user).filter(id=config.get('knowledge_base')).first()
+    except ValidationError:
+        knowledge_base = None
+    if knowledge_base is None:
+        raise WorkflowError(f"知识库不存在或无权访问: {config.get('knowledge_base')}")
+    try:
+        filters = SearchFilters.from_dict(config.get('filters'))
+    except ValueError as exc:
+        raise WorkflowError(f'检索过滤条件无效: {exc}')
+    chunks = RetrievalService(knowledge_base, filters=filters).search(
+        _to_text(config.get('query')),
+        top_k=config.get('top_k'),
+        search_mode=config.get('search_mode'),
+    )
+    return {'chunks': [chunk.to_dict() for chunk in chunks]}
+
+
+@register_node_handler(NodeType.RETRIEVE)
+async def run_retrieve(context: NodeContext):
+    """
+    知识库检索节点
+
+    配置示例: {"knowledge_base": "<id>", "query": "{{inputs.question}}", "top_k": 5,
+              "filters": {"tags": ["手册"], "document_types": ["md"]}}
+    """
+    from asgiref.sync import sync_to_async
+    return await sync_to_async(_retrieve, thread_sensitive=False)(context.rendered_config(), context.user)
+
+
+@register_node_handler(NodeType.LLM, cacheable=False)
+async def run_llm(context: NodeContext):
+    """通过模型注册表调用大模型生成回答"""
+    from asgiref.sync import sync_to_async
+    from apps.model_management.registry import get_llm
+
+    config = context.rendered_config()
+    messages = []
+    if config.get('system_prompt'):
+        messages.append({'role': 'system', 'content': config['system_prompt']})
+    messages.append({'role': 'user', 'content': _to_text(config.get('prompt'))})
+    model = await sync_to_async(get_llm)(config.get('model'))
+    params = {'temperature': config.get('temperature', 0.7)}
+    if config.get('max_tokens'):
+        params['max_tokens'] = config['max_tokens']
+    result = await model.achat(messages, **params)
+    return {'text': result.text, 'total_tokens': result.total_tokens}
+
+
+# ---------------------------------------------------------------------------
+# 执行器
+# ---------------------------------------------------------------------------
+
+class RunCache:
+    """
+    单次运行内的节点输出缓存
+
+    缓存的是Future，相同键的节点并发执行时只会真正计算一次。
+    """
+
+    def __init__(self):
+        self._futures: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+
+    @staticmethod
+    def make_key(node_type: str, config: Dict[str, Any]) -> str:
+        payload = json.dumps([node_type, config], sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable[Any]]):
+        future = self._futures.get(key)
+        if future is not None:
+            self.hits += 1
+            return await asyncio.shield(future), True
+        future = asyncio.get_running_loop().create_future()
+        self._futures[key] = future
+        try:
+            result = await compute()
+        except asyncio.CancelledError:
+            self._futures.pop(key, None)
+            future.cancel()
+            raise
+        except Exception as exc:
+            # 失败的结果不缓存
+            self._futures.pop(key, None)
+            future.set_exception(exc)
+            future.exception()
+            raise
+        future.set_result(result)
+        return result, False
+
+
+class WorkflowExecutor:
+    """
+    工作流执行器
+
+    stream() 逐个产出节点事件，run() 直接返回最终结果。
+    """
+
+    def __init__(self, graph: WorkflowGraph, inputs: Optional[Dict[str, Any]] = None,
+                 max_concurrency: int = 8, node_timeout: Optional[float] = None, user=None):
+        self.graph = graph
+        self.inputs = inputs or {}
+        self.user = user
+        self.max_concurrency = max(1, max_concurrency)
+        self.node_timeout = node_timeout
+        self.results: Dict[str, Any] = {}
+        self.cache = RunCache()
+
+    async def _execute_node(self, node: NodeSpec, semaphore: asyncio.Semaphore):
+        handler = NODE_HANDLERS.get(node.node_type)
+        if handler is None:
+            raise WorkflowError(f'不支持的节点类型: {node.node_type}')
+        upstream = [edge.source for edge in self.graph.incoming[node.key]]
+        context = NodeContext(node, self.inputs, self.results, upstream, user=self.user)
+
+        async def compute():
+            async with semaphore:
+                coro = handler.func(context)
+                if self.node_timeout:
+                    return await asyncio.wait_for(coro, self.node_timeout)
+                return await coro
+
+        if handler.cacheable and node.cacheable:
+            key = RunCache.make_key(node.node_type, context.rendered_config())
+            return await self.cache.get_or_compute(key, compute)
+        return await compute(), False
+
+    def _edge_alive(self, edge: EdgeSpec) -> bool:
+        """条件节点只激活与命中分支标签一致的连线"""
+        if not edge.condition:
+            return True
+        output = self.results.get(edge.source)
+        return isinstance(output, dict) and output.get('branch') == edge.condition
+
+    async def stream(self):
+        """
+        执行工作流并产出事件
+
+        事件类型: node_started / node_finished / node_skipped / node_failed / run_finished
+        """
+        graph = self.graph
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        pending = {key: len(edges) for key, edges in graph.incoming.items()}
+        alive = {key: False for key in graph.nodes}
+        running: Dict[asyncio.Task, tuple] = {}
+        ready = [key for key in graph.order if pending[key] == 0]
+        run_started = time.perf_counter()
+
+        def resolve_edges(key):
+            """节点完成或跳过后更新下游依赖计数，返回新就绪/需跳过的节点"""
+            newly_ready = []
+            for edge in graph.outgoing[key]:
+                if key in self.results and self._edge_alive(edge):
+                    alive[edge.target] = True
+                pending[edge.target] -= 1
+                if pending[edge.target] == 0:
+                    newly_ready.append(edge.target)
+            return newly_ready
+
+        try:
+            while ready or running:
+                to_skip = []
+                for key in ready:
+                    # 非起始节点至少需要一条存活的入边才会执行
+                    if graph.incoming[key] and not alive[key]:
+                        to_skip.append(key)
+                        continue
+                    node = graph.nodes[key]
+                    yield {'event': 'node_started', 'node': key, 'node_type': node.node_type}
+                    task = asyncio.create_task(self._execute_node(node, semaphore))
+                    running[task] = (key, time.perf_counter())
+                ready = []
+
+                for key in to_skip:
+                    yield {'event': 'node_skipped', 'node': key}
+                    ready.extend(resolve_edges(key))
+                if ready or not running:
+                    continue
+
+                done, _ = await asyncio.wait(running.keys(), return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    key, started = running.pop(task)
+                    elapsed_ms = int((time.perf_counter() - started) * 1000)
+                    try:
+                        output, cached = task.result()
+                    except Exception as exc:
+                        yield {'event': 'node_failed', 'node': key, 'error': str(exc), 'elapsed_ms': elapsed_ms}
+                        raise WorkflowError(f'节点 {key} 执行失败: {exc}') from exc
+                    self.results[key] = output
+                    yield {
+                        'event': 'node_finished', 'node': key, 'output': output,
+                        'cached': cached, 'elapsed_ms': elapsed_ms,
+                    }
+                    ready.extend(resolve_edges(key))
+        finally:
+            for task in running:
+                task.cancel()
+            # 等待被取消的任务真正结束，避免事件循环关闭时仍有未完成的任务
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+
+        yield {
+            'event': 'run_finished',
+            'outputs': self.outputs(),
+            'cache_hits': self.cache.hits,
+            'elapsed_ms': int((time.perf_counter() - run_started) * 1000),
+        }
+
+    def outputs(self) -> Dict[str, Any]:
+        """优先返回结束节点的输出，没有结束节点时返回所有叶子节点输出"""
+        end_keys = [key for key, node in self.graph.nodes.items() if node.node_type == NodeType.END]
+        if not end_keys:
+            end_keys = [key for key, edges in self.graph.outgoing.items() if not edges]
+        return {key: self.results[key] for key in end_keys if key in self.results}
+
+    async def run(self) -> Dict[str, Any]:
+        async for _ in self.stream():
+            pass
+        return self.outputs()
+
+
+def iterate_sync(async_iterable):
+    """
+    在同步上下文（WSGI、Celery）中逐个消费异步生成器
+    """
+    loop = asyncio.new_event_loop()
+    iterator = async_iterable.__aiter__()
+    try:
+        while True:
+            try:
+                yield loop.run_until_complete(iterator.__anext__())
+            except StopAsyncIteration:
+                break
+    finally:
+        loop.run_until_complete(iterator.aclose())
+        loop.close()
@@ -1 +1,142 @@
- 
\ No newline at end of file
+"""
+工作流编排模型
+"""
+from django.db import models
+from apps.core.models import BaseModel, UserRelatedModel, SoftDeleteModel, StatusChoices
+
+
+class Workflow(UserRelatedModel, SoftDeleteModel):
+    """
+    工作流定义模型
+    """
+    name = models.CharField(max_length=100, verbose_name='工作流名称')
+    description = models.TextField(blank=True, null=True, verbose_name='描述')
+    knowledge_base = models.ForeignKey(
+        'knowledge_base.KnowledgeBase',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='workflows',
+        verbose_name='默认知识库'
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=StatusChoices.choices,
+        default=StatusChoices.ACTIVE,
+        verbose_name='状态'
+    )
+    max_concurrency = models.IntegerField(default=8, verbose_name='最大并发节点数')
+
+    class Meta:
+        db_table = 'workflows'
+        verbose_name = '工作流'
+        verbose_name_plural = '工作流'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return self.name
+
+
+class WorkflowNode(BaseModel):
+    """
+    工作流节点模型
+    """
+    class NodeTypeChoices(models.TextChoices):
+        START = 'start', '开始'
+        RETRIEVE = 'retrieve', '检索'
+        LLM = 'llm', '大模型'
+        CONDITION = 'condition', '条件分支'
+        TOOL = 'tool', '工具调用'
+        END = 'end', '结束'
+
+    workflow = models.ForeignKey(
+        Workflow,
+        on_delete=models.CASCADE,
+        related_name='nodes',
+        verbose_name='工作流'
+    )
+    key = models.CharField(max_length=50, verbose_name='节点标识')
+    name = models.CharField(max_length=100, blank=True, default='', verbose_name='节点名称')
+    node_type = models.CharField(max_length=20, choices=NodeTypeChoices.choices, verbose_name='节点类型')
+    config = models.JSONField(default=dict, blank=True, verbose_name='节点配置')
+    cacheable = models.BooleanField(default=True, verbose_name='允许缓存输出')
+    position = models.JSONField(default=dict, blank=True, verbose_name='画布位置')
+
+    class Meta:
+        db_table = 'workflow_nodes'
+        unique_together = ['workflow', 'key']
+        verbose_name = '工作流节点'
+        verbose_name_plural = '工作流节点'
+
+    def __str__(self):
+        return f"{self.workflow.name} - {self.key} ({self.node_type})"
+
+
+class WorkflowEdge(BaseModel):
+    """
+    工作流连线模型
+    """
+    workflow = models.ForeignKey(
+        Workflow,
+        on_delete=models.CASCADE,
+        related_name='edges',
+        verbose_name='工作流'
+    )
+    source = models.ForeignKey(
+        WorkflowNode,
+        on_delete=models.CASCADE,
+        related_name='outgoing_edges',
+        verbose_name='起始节点'
+    )
+    target = models.ForeignKey(
+        WorkflowNode,
+        on_delete=models.CASCADE,
+        related_name='incoming_edges',
+        verbose_name='目标节点'
+    )
+    # 条件节点的分支标签，为空表示无条件连线
+    condition = models.CharField(max_length=50, blank=True, default='', verbose_name='分支条件')
+
+    class Meta:
+        db_table = 'workflow_edges'
+        unique_together = ['source', 'target', 'condition']
+        verbose_name = '工作流连线'
+        verbose_name_plural = '工作流连线'
+
+    def __str__(self):
+        return f"{self.source.key} -> {self.target.key}"
+
+
+class WorkflowRun(UserRelatedModel):
+    """
+    工作流运行记录
+    """
+    workflow = models.ForeignKey(
+        Workflow,
+        on_delete=models.CASCADE,
+        related_name='runs',
+        verbose_name='工作流'
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=StatusChoices.choices,
+        default=StatusChoices.PENDING,
+        verbose_name='状态'
+    )
+    inputs = models.JSONField(default=dict, blank=True, verbose_name='输入')
+    outputs = models.JSONField(default=dict, blank=True, verbose_name='输出')
+    node_results = models.JSONField(default=dict, blank=True, verbose_name='节点结果')
+    error = models.TextField(blank=True, default='', verbose_name='错误信息')
+    cache_hits = models.IntegerField(default=0, verbose_name='缓存命中数')
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name='开始时间')
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name='结束时间')
+    duration_ms = models.IntegerField(default=0, verbose_name='耗时(毫秒)')
+
+    class Meta:
+        db_table = 'workflow_runs'
+        verbose_name = '工作流运行记录'
+        verbose_name_plural = '工作流运行记录'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.workflow.name} - {self.status}"
@@ -0,0 +1,168 @@
+"""
+工作流编排序列化器
+"""
+import uuid
+
+from django.db import transaction
+from rest_framework import serializers
+from .engine import TEMPLATE_PATTERN, WorkflowGraph, NodeSpec, EdgeSpec, WorkflowError
+from .models import Workflow, WorkflowNode, WorkflowEdge, WorkflowRun
+
+
+class WorkflowNodeSerializer(serializers.ModelSerializer):
+    """
+    工作流节点序列化器
+    """
+    class Meta:
+        model = WorkflowNode
+        fields = ['key', 'name', 'node_type', 'config', 'cacheable', 'position']
+
+
+class WorkflowEdgeSerializer(serializers.Serializer):
+    """
+    工作流连线序列化器，使用节点标识引用节点
+    """
+    source = serializers.CharField()
+    target = serializers.CharField()
+    condition = serializers.CharField(required=False, allow_blank=True, default='')
+
+    def to_representation(self, instance):
+        return {
+            'source': instance.source.key,
+            'target': instance.target.key,
+            'condition': instance.condition,
+        }
+
+
+class WorkflowSerializer(serializers.ModelSerializer):
+    """
+    工作流序列化器，节点和连线随工作流一起整体保存
+    """
+    nodes = WorkflowNodeSerializer(many=True, required=False)
+    edges = WorkflowEdgeSerializer(many=True, required=False)
+    created_by_name = serializers.CharField(source='created_by.username', read_only=True)
+
+    class Meta:
+        model = Workflow
+        fields = [
+            'id', 'name', 'description', 'knowledge_base', 'status', 'max_concurrency',
+            'nodes', 'edges', 'created_by', 'created_by_name', 'created_at', 'updated_at'
+        ]
+        read_only_fields = ['id', 'created_by', 'created_by_name', 'created_at', 'updated_at']
+
+    def _accessible_ids(self, ids):
+        """ids 中当前用户可访问的知识库ID"""
+        from apps.pipeline.federated import accessible_knowledge_bases
+
+        valid = []
+        for pk in ids:
+            try:
+                valid.append(uuid.UUID(str(pk)))
+            except ValueError:
+                continue
+        if not valid:
+            return set()
+        user = self.context['request'].user
+        return {str(pk) for pk in accessible_knowledge_bases(user).filter(id__in=valid).values_list('id', flat=True)}
+
+    def validate_knowledge_base(self, value):
+        if value is not None and str(value.pk) not in self._accessible_ids([value.pk]):
+            raise serializers.ValidationError('知识库不存在或无权访问')
+        return value
+
+    def validate_nodes(self, nodes):
+        """检索节点引用的知识库必须是当前用户可访问的；模板变量在运行时按运行用户校验"""
+        referenced = {}
+        for node in nodes:
+            if node['node_type'] != WorkflowNode.NodeTypeChoices.RETRIEVE:
+                continue
+            knowledge_base = (node.get('config') or {}).get('knowledge_base')
+            if isinstance(knowledge_base, str) and TEMPLATE_PATTERN.search(knowledge_base):
+                continue
+            referenced[node['key']] = str(knowledge_base)
+        if referenced:
+            accessible = self._accessible_ids(set(referenced.values()))
+            denied = [key for key, pk in referenced.items() if pk not in accessible]
+            if denied:
+                raise serializers.ValidationError(f"节点 {', '.join(denied)} 引用的知识库不存在或无权访问")
+        return nodes
+
+    def validate(self, attrs):
+        """校验节点与连线构成合法的DAG"""
+        if 'nodes' in attrs or 'edges' in attrs:
+            # 部分更新只提交了节点或连线之一时，另一半按现有的图校验
+            nodes = attrs['nodes'] if 'nodes' in attrs else self._current_nodes()
+            edges = attrs['edges'] if 'edges' in attrs else self._current_edges()
+            try:
+                WorkflowGraph(
+                    [NodeSpec(node['key'], node['node_type']) for node in nodes],
+                    [EdgeSpec(edge['source'], edge['target'], edge.get('condition', '')) for edge in edges],
+                )
+            except WorkflowError as exc:
+                raise serializers.ValidationError(str(exc))
+        return attrs
+
+    def _current_nodes(self):
+        if self.instance is None:
+            return []
+        return [{'key': node.key, 'node_type': node.node_type} for node in self.instance.nodes.all()]
+
+    def _current_edges(self):
+        if self.instance is None:
+            return []
+        return [
+            {'source': edge.source.key, 'target': edge.target.key, 'condition': edge.condition}
+            for edge in self.instance.edges.all()
+        ]
+
+    def _save_graph(self, workflow, nodes, edges):
+        """nodes 为 None 时保留现有节点，只替换连线"""
+        if nodes is None:
+            workflow.edges.all().delete()
+            node_map = {node.key: node for node in workflow.nodes.all()}
+        else:
+            # 删除节点会级联删除连线
+            workflow.nodes.all().delete()
+            node_map = {}
+            for node_data in nodes:
+                node_map[node_data['key']] = WorkflowNode.objects.create(workflow=workflow, **node_data)
+        for edge_data in edges:
+            WorkflowEdge.objects.create(
+                workflow=workflow,
+                source=node_map[edge_data['source']],
+                target=node_map[edge_data['target']],
+                condition=edge_data.get('condition', ''),
+            )
+
+    @transaction.atomic
+    def create(self, validated_data):
+        nodes = validated_data.pop('nodes', [])
+        edges = validated_data.pop('edges', [])
+        workflow = super().create(validated_data)
+        self._save_graph(workflow, nodes, edges)
+        return workflow
+
+    @transaction.atomic
+    def update(self, instance, validated_data):
+        nodes = validated_data.pop('nodes', None)
+        edges = validated_data.pop('edges', None)
+        if nodes is not None and edges is None:
+            # 只提交了节点：现有连线按节点key重建到新节点上（删除节点时会被级联删除）
+            edges = self._current_edges()
+        workflow = super().update(instance, validated_data)
+        if edges is not None:
+            self._save_graph(workflow, nodes, edges)
+        return workflow
+
+
+class WorkflowRunSerializer(serializers.ModelSerializer):
+    """
+    工作流运行记录序列化器
+    """
+    class Meta:
+        model = WorkflowRun
+        fields = [
+            'id', 'workflow', 'status', 'inputs', 'outputs', 'node_results', 'error',
+            'cache_hits', 'started_at', 'finished_at', 'duration_ms', 'created_at'
+        ]
+        read_only_fields = fields
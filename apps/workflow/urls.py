@@ -1,8 +1,13 @@
 """
 工作流编排URL配置
 """
-from django.urls import path
+from django.urls import path, include
+from rest_framework.routers import DefaultRouter
+from .views import WorkflowViewSet
+
+router = DefaultRouter()
+router.register(r'', WorkflowViewSet, basename='workflow')
 
 urlpatterns = [
-    # TODO: 添加工作流编排相关的URL
-] 
\ No newline at end of file
+    path('', include(router.urls)),
+]
@@ -0,0 +1,138 @@
+"""
+工作流编排视图
+"""
+import json
+import logging
+import time
+from django.db.models import Prefetch
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from rest_framework import viewsets, status, permissions
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from apps.core.models import StatusChoices
+from apps.model_management.limits import ModelRateLimited, RateLimitTimeout
+from .engine import WorkflowGraph, WorkflowExecutor, WorkflowError, iterate_sync, to_json_safe
+from .models import Workflow, WorkflowEdge, WorkflowRun
+from .serializers import WorkflowSerializer, WorkflowRunSerializer
+
+logger = logging.getLogger('manxiai.workflow')
+
+
+class WorkflowViewSet(viewsets.ModelViewSet):
+    """
+    工作流管理视图集
+    """
+    queryset = Workflow.objects.all()
+    serializer_class = WorkflowSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    throttle_scopes = {'run': 'expensive'}
+
+    def get_queryset(self):
+        """
+        只返回当前用户创建的工作流
+        """
+        return self.queryset.filter(created_by=self.request.user).prefetch_related(
+            'nodes', Prefetch('edges', queryset=WorkflowEdge.objects.select_related('source', 'target')),
+        )
+
+    def perform_create(self, serializer):
+        serializer.save(created_by=self.request.user)
+
+    def perform_destroy(self, instance):
+        instance.soft_delete()
+
+    def _execute(self, run, graph):
+        """
+        执行工作流并逐个产出事件，结束后回写运行记录；
+        节点异常时运行标记为失败，流式客户端断开（生成器被关闭）时标记为已取消
+        """
+        executor = WorkflowExecutor(
+            graph, run.inputs, max_concurrency=run.workflow.max_concurrency, user=run.created_by,
+        )
+        started = time.perf_counter()
+        run.status = StatusChoices.PROCESSING
+        run.started_at = timezone.now()
+        run.save(update_fields=['status', 'started_at', 'updated_at'])
+        events = iterate_sync(executor.stream())
+        try:
+            for event in events:
+                if event['event'] == 'node_finished':
+                    run.node_results[event['node']] = to_json_safe(event['output'])
+                yield event
+            run.status = StatusChoices.COMPLETED
+            run.outputs = to_json_safe(executor.outputs())
+        except WorkflowError as exc:
+            run.status = StatusChoices.FAILED
+            run.error = str(exc)
+            event = {'event': 'run_failed', 'error': str(exc)}
+            if isinstance(exc.__cause__, RateLimitTimeout):
+                event['retry_after'] = exc.__cause__.retry_after
+            yield event
+        except GeneratorExit:
+            run.status = StatusChoices.CANCELLED
+            run.error = '客户端断开连接，运行已取消'
+            raise
+        except Exception as exc:
+            logger.exception('工作流运行异常: %s', run.pk)
+            run.status = StatusChoices.FAILED
+            run.error = str(exc) or exc.__class__.__name__
+            yield {'event': 'run_failed', 'error': run.error}
+        finally:
+            # 取消仍在执行的节点并关闭事件循环
+            events.close()
+            run.cache_hits = executor.cache.hits
+            run.finished_at = timezone.now()
+            run.duration_ms = int((time.perf_counter() - started) * 1000)
+            run.save()
+
+    @action(detail=True, methods=['post'])
+    def run(self, request, pk=None):
+        """
+        运行工作流，stream=true 时以NDJSON流式返回中间结果
+        """
+        workflow = self.get_object()
+        try:
+            graph = WorkflowGraph.from_workflow(workflow)
+        except WorkflowError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        run = WorkflowRun.objects.create(
+            workflow=workflow,
+            created_by=request.user,
+            inputs=request.data.get('inputs', {}),
+        )
+        events = self._execute(run, graph)
+
+        if request.data.get('stream'):
+            def body():
+                # 客户端断开时响应关闭本生成器，随即关闭运行生成器，运行记录标记为已取消
+                try:
+                    for event in events:
+                        yield json.dumps(event, ensure_ascii=False, default=str) + '\n'
+                finally:
+                    events.close()
+            return StreamingHttpResponse(body(), content_type='application/x-ndjson')
+
+        rate_limited = False
+        retry_after = None
+        for event in events:
+            if event['event'] == 'run_failed' and 'retry_after' in event:
+                rate_limited, retry_after = True, event['retry_after']
+        if rate_limited:
+            # 节点因模型配额等待超时失败时返回 503，运行记录已保存
+            raise ModelRateLimited(retry_after)
+        return Response(WorkflowRunSerializer(run).data)
+
+    @action(detail=True, methods=['get'])
+    def runs(self, request, pk=None):
+        """
+        获取工作流运行记录
+        """
+        workflow = self.get_object()
+        runs = WorkflowRun.objects.filter(workflow=workflow)
+        page = self.paginate_queryset(runs)
+        serializer = WorkflowRunSerializer(page if page is not None else runs, many=True)
+        if page is not None:
+            return self.get_paginated_response(serializer.data)
+        return Response(serializer.data)
@@ -0,0 +1,3 @@
+"""
+ManxiAI 离线基准测试
+"""
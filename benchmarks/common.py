@@ -0,0 +1,115 @@
+"""
+基准测试公共工具
+"""
+import json
+import os
+import platform
+import subprocess
+import sys
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import numpy as np
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def setup_django(settings_module='config.settings'):
+    """在脚本中初始化Django"""
+    if ROOT_DIR not in sys.path:
+        sys.path.insert(0, ROOT_DIR)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    import django
+    django.setup()
+
+
+def latency_summary(samples_ms):
+    """延迟分位数（毫秒）"""
+    if not samples_ms:
+        return {}
+    values = np.asarray(samples_ms, dtype=np.float64)
+    return {
+        'count': int(values.size),
+        'mean': round(float(values.mean()), 3),
+        'p50': round(float(np.percentile(values, 50)), 3),
+        'p95': round(float(np.percentile(values, 95)), 3),
+        'p99': round(float(np.percentile(values, 99)), 3),
+        'max': round(float(values.max()), 3),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def build_report(name, params, **sections):
+    """
+    统一的结果格式，results 中每一项带 key 字段，便于跨提交对比
+    """
+    return {
+        'benchmark': name,
+        'git_revision': git_revision(),
+        'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'params': params,
+        **sections,
+    }
+
+
+def write_report(report, output=None):
+    payload = json.dumps(report, ensure_ascii=False, indent=2, default=str)
+    if output:
+        with open(output, 'w', encoding='utf-8') as fp:
+            fp.write(payload + '\n')
+    else:
+        sys.stdout.write(payload + '\n')
+
+
+@contextmanager
+def benchmark_database(keepdb=False, **overrides):
+    """
+    在独立的测试数据库中运行，并临时覆盖配置；模型默认走离线的 local_stub 供应商
+    """
+    from django.db import connection
+    from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+    settings_override = override_settings(**{
+        'DEFAULT_MODEL_PROVIDER': 'local_stub',
+        'MODEL_RATE_LIMIT_BACKEND': 'local',
+        'MODEL_REQUESTS_PER_MINUTE': 0,
+        'MODEL_TOKENS_PER_MINUTE': 0,
+        **overrides,
+    })
+    settings_override.enable()
+    setup_test_environment()
+    old_database = connection.creation.create_test_db(verbosity=0, keepdb=keepdb)
+    try:
+        from apps.model_management.registry import registry
+        registry.close()
+        yield connection
+    finally:
+        if not keepdb:
+            connection.creation.destroy_test_db(old_database, verbosity=0)
+        teardown_test_environment()
+        settings_override.disable()
+
+
+def create_benchmark_knowledge_base(**fields):
+    """创建基准测试用户与知识库"""
+    import time
+
+    from apps.knowledge_base.models import KnowledgeBase, KnowledgeBaseSettings
+    from apps.users.models import User
+
+    suffix = time.time_ns()
+    user = User.objects.create_user(
+        email=f'bench-{suffix}@example.com', username=f'bench-{suffix}', password=None
+    )
+    knowledge_base = KnowledgeBase.objects.create(name='benchmark', created_by=user, **fields)
+    KnowledgeBaseSettings.objects.create(knowledge_base=knowledge_base)
+    return user, knowledge_base
@@ -0,0 +1,59 @@
+"""
+对比两份基准测试结果
+
+用法: python -m benchmarks.compare old.json new.json
+"""
+import argparse
+import json
+
+
+def flatten(value, prefix=''):
+    """把结果展开为 {路径: 数值}，列表项按其 key 字段命名"""
+    metrics = {}
+    if isinstance(value, dict):
+        for name, item in value.items():
+            if name in ('params', 'key'):
+                continue
+            metrics.update(flatten(item, f'{prefix}.{name}' if prefix else name))
+    elif isinstance(value, list):
+        for position, item in enumerate(value):
+            label = item.get('key', position) if isinstance(item, dict) else position
+            metrics.update(flatten(item, f'{prefix}[{label}]'))
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        metrics[prefix] = value
+    return metrics
+
+
+def compare(old, new):
+    old_metrics, new_metrics = flatten(old), flatten(new)
+    rows = []
+    for name in sorted(set(old_metrics) | set(new_metrics)):
+        before, after = old_metrics.get(name), new_metrics.get(name)
+        delta = None
+        if before not in (None, 0) and after is not None:
+            delta = (after - before) / abs(before) * 100
+        rows.append((name, before, after, delta))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='对比两份基准测试结果')
+    parser.add_argument('old')
+    parser.add_argument('new')
+    args = parser.parse_args(argv)
+
+    with open(args.old, encoding='utf-8') as fp:
+        old = json.load(fp)
+    with open(args.new, encoding='utf-8') as fp:
+        new = json.load(fp)
+
+    print(f"{old.get('git_revision')} -> {new.get('git_revision')}")
+    rows = compare(old, new)
+    width = max((len(name) for name, *_ in rows), default=10)
+    for name, before, after, delta in rows:
+        change = f'{delta:+.1f}%' if delta is not None else '-'
+        print(f'{name:<{width}}  {before!s:>12}  {after!s:>12}  {change:>9}')
+
+
+if __name__ == '__main__':
+    main()
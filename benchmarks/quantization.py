@@ -0,0 +1,97 @@
+"""
+向量量化召回率/延迟基准测试
+
+在合成的聚类向量上比较 float32 精确检索、float16(halfvec同等精度损失) 和 int8 量化
+候选召回 + float32 精确重排 的 recall@k、单次查询延迟与向量内存占用。
+
+用法: python -m benchmarks.quantization --size 20000 --dimensions 1536 --output quantization.json
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from apps.embedding import quantization
+from benchmarks.common import build_report, latency_summary, write_report
+
+
+def make_corpus(size, dimensions, clusters, seed):
+    """生成单位化的聚类向量，模拟真实文本向量的分布"""
+    rng = np.random.default_rng(seed)
+    centroids = rng.standard_normal((clusters, dimensions)).astype(np.float32)
+    labels = rng.integers(0, clusters, size)
+    vectors = centroids[labels] + 0.6 * rng.standard_normal((size, dimensions)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def make_queries(corpus, count, seed):
+    rng = np.random.default_rng(seed + 1)
+    picked = corpus[rng.integers(0, len(corpus), count)]
+    queries = picked + 0.3 * rng.standard_normal(picked.shape).astype(np.float32) / np.sqrt(corpus.shape[1])
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+def recall(found, expected):
+    return len(set(found) & set(expected)) / len(expected)
+
+
+def run_mode(name, corpus, queries, truth, top_k, multiplier, score_fn, nbytes):
+    latencies, recalls, recalls_no_rescore = [], [], []
+    for query, expected in zip(queries, truth):
+        started = time.perf_counter()
+        candidates = quantization.top_k_indices(score_fn(query), top_k * multiplier)
+        exact = corpus[candidates] @ query
+        found = candidates[quantization.top_k_indices(exact, top_k)]
+        latencies.append((time.perf_counter() - started) * 1000)
+        recalls.append(recall(found, expected))
+        recalls_no_rescore.append(recall(candidates[:top_k], expected))
+    return {
+        'key': name,
+        'recall_at_k': round(float(np.mean(recalls)), 4),
+        'recall_at_k_without_rescore': round(float(np.mean(recalls_no_rescore)), 4),
+        'latency_ms': latency_summary(latencies),
+        'vector_bytes': int(nbytes),
+        'bytes_per_vector': round(nbytes / len(corpus), 1),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--size', type=int, default=20000)
+    parser.add_argument('--dimensions', type=int, default=1536)
+    parser.add_argument('--clusters', type=int, default=200)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--top-k', type=int, default=10)
+    parser.add_argument('--multiplier', type=int, default=4)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--recall-tolerance', type=float, default=0.02,
+                        help='量化模式相对float32允许的最大召回率下降，超出时以非零状态退出')
+    parser.add_argument('--output', help='结果JSON输出路径，默认输出到标准输出')
+    args = parser.parse_args(argv)
+
+    corpus = make_corpus(args.size, args.dimensions, args.clusters, args.seed)
+    queries = make_queries(corpus, args.queries, args.seed)
+    truth = [quantization.top_k_indices(corpus @ query, args.top_k) for query in queries]
+
+    half = corpus.astype(np.float16)
+    int8_index = quantization.Int8Index.from_vectors(list(range(len(corpus))), corpus)
+
+    results = [
+        run_mode('float32', corpus, queries, truth, args.top_k, 1,
+                 lambda q: corpus @ q, corpus.nbytes),
+        run_mode('float16', corpus, queries, truth, args.top_k, args.multiplier,
+                 lambda q: (half @ q.astype(np.float16)).astype(np.float32), half.nbytes),
+        run_mode('int8', corpus, queries, truth, args.top_k, args.multiplier,
+                 int8_index.scores, int8_index.nbytes),
+    ]
+    baseline = results[0]['recall_at_k']
+    failed = [r['key'] for r in results if baseline - r['recall_at_k'] > args.recall_tolerance]
+    report = build_report('quantization', vars(args), results=results, failed=failed)
+    write_report(report, args.output)
+    return report
+
+
+if __name__ == '__main__':
+    sys.exit(1 if main()['failed'] else 0)
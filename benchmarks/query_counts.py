@@ -0,0 +1,114 @@
+"""
+列表接口SQL查询数检查
+
+分别在少量与大量数据下请求团队、团队成员、知识库列表接口（以及整表序列化团队列表），
+记录每次请求执行的SQL条数。查询数必须与数据量无关（O(1)），否则以非零状态退出，
+用于发现逐行查询（N+1）的回归。
+需要可连接的PostgreSQL，运行时创建独立的测试数据库并在结束后销毁。
+
+用法: python -m benchmarks.query_counts --sizes 10,300 --output query_counts.json
+"""
+import argparse
+import sys
+import time
+
+from benchmarks.common import benchmark_database, build_report, setup_django, write_report
+
+MEMBERS_PER_TEAM = 3
+
+
+def seed(size):
+    """一个用户参与 size 个团队（每个团队若干成员），拥有 size 个知识库，第一个团队有 size 个成员"""
+    from apps.knowledge_base.models import KnowledgeBase
+    from apps.users.models import Team, TeamMember, User
+
+    suffix = time.time_ns()
+    user = User.objects.create_user(email=f'query-{suffix}@example.com', username=f'query-{suffix}')
+    others = User.objects.bulk_create([
+        User(email=f'query-{suffix}-{index}@example.com', username=f'query-{suffix}-{index}', password='!')
+        for index in range(max(size, MEMBERS_PER_TEAM))
+    ])
+    teams = Team.objects.bulk_create([
+        Team(name=f'团队 {index}', owner=others[index % len(others)]) for index in range(size)
+    ])
+    members = [TeamMember(team=team, user=user) for team in teams]
+    for index, team in enumerate(teams):
+        count = len(others) if index == 0 else MEMBERS_PER_TEAM
+        members.extend(TeamMember(team=team, user=other) for other in others[:count])
+    TeamMember.objects.bulk_create(members)
+    KnowledgeBase.objects.bulk_create([
+        KnowledgeBase(name=f'知识库 {index}', created_by=user) for index in range(size)
+    ])
+    return user, teams[0]
+
+
+def count_queries(func):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    with CaptureQueriesContext(connection) as context:
+        result = func()
+    return len(context.captured_queries), result
+
+
+def checks(user, team):
+    from rest_framework.test import APIClient
+
+    from apps.users.models import Team, TeamMember
+    from apps.users.serializers import TeamSerializer
+
+    client = APIClient()
+    client.force_authenticate(user)
+
+    def get(url):
+        def request():
+            response = client.get(url)
+            assert response.status_code == 200, (url, response.status_code)
+            return response
+        return request
+
+    def all_teams():
+        member_of = TeamMember.objects.filter(user=user).values('team')
+        return TeamSerializer(Team.objects.filter(id__in=member_of).with_members_count(), many=True).data
+
+    return {
+        'team_list': get('/api/v1/auth/teams/'),
+        'team_list_unpaginated': all_teams,
+        'team_members': get(f'/api/v1/auth/teams/{team.pk}/members/'),
+        'knowledge_base_list': get('/api/v1/knowledge-base/'),
+    }
+
+
+def run(args):
+    sizes = sorted(int(value) for value in args.sizes.split(','))
+    counts = {}
+    with benchmark_database(keepdb=args.keepdb):
+        for size in sizes:
+            for name, func in checks(*seed(size)).items():
+                queries, _ = count_queries(func)
+                counts.setdefault(name, []).append(queries)
+    results, failed = [], []
+    for name, values in counts.items():
+        results.append({'key': name, 'sizes': sizes, 'queries': values})
+        if len(set(values)) > 1 or values[-1] > args.max_queries:
+            failed.append(name)
+    return results, failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='列表接口SQL查询数检查')
+    parser.add_argument('--sizes', default='10,300', help='逗号分隔的数据量（团队数/知识库数）')
+    parser.add_argument('--max-queries', type=int, default=10, help='单次请求允许的最大查询数')
+    parser.add_argument('--keepdb', action='store_true', help='保留测试数据库')
+    parser.add_argument('--output', help='结果JSON输出路径，默认输出到标准输出')
+    args = parser.parse_args(argv)
+
+    setup_django()
+    results, failed = run(args)
+    report = build_report('query_counts', vars(args), results=results, failed=failed)
+    write_report(report, args.output)
+    return report
+
+
+if __name__ == '__main__':
+    sys.exit(1 if main()['failed'] else 0)
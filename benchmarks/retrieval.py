@@ -0,0 +1,195 @@
+"""
+检索质量与延迟基准测试
+
+生成可复现的合成知识库，测量入库吞吐量，以及各检索模式(semantic/keyword/hybrid)
+在各量化方式下的 p50/p95/p99 延迟、recall@k、hit@k 与 MRR。
+需要可连接的PostgreSQL(已安装pgvector)，运行时创建独立的测试数据库并在结束后销毁；
+模型调用使用 local_stub 供应商，完全离线。
+
+用法: python -m benchmarks.retrieval --documents 200 --paragraphs 20 --output retrieval.json
+"""
+import argparse
+import random
+import time
+
+from benchmarks.common import (
+    benchmark_database, build_report, create_benchmark_knowledge_base, latency_summary, setup_django,
+    write_report,
+)
+
+COMMON_WORDS = ['the', 'of', 'and', 'to', 'in', 'system', 'data', 'user', 'service', 'model']
+
+
+def make_vocabulary(size, rng):
+    alphabet = 'abcdefghijklmnopqrstuvwxyz'
+    words = set()
+    while len(words) < size:
+        words.add(''.join(rng.choice(alphabet) for _ in range(rng.randint(4, 9))))
+    return sorted(words)
+
+
+def build_corpus(documents, paragraphs, words_per_paragraph, vocabulary_size, seed):
+    """
+    每篇文档有自己的主题词，段落由主题词、常用词和全局词表中的随机词组成
+    """
+    rng = random.Random(seed)
+    vocabulary = make_vocabulary(vocabulary_size, rng)
+    corpus = []
+    for doc_index in range(documents):
+        topic = rng.sample(vocabulary, 30)
+        doc_paragraphs = []
+        for _ in range(paragraphs):
+            words = []
+            for _ in range(words_per_paragraph):
+                roll = rng.random()
+                if roll < 0.4:
+                    words.append(rng.choice(topic))
+                elif roll < 0.6:
+                    words.append(rng.choice(COMMON_WORDS))
+                else:
+                    words.append(rng.choice(vocabulary))
+            doc_paragraphs.append(' '.join(words) + '.')
+        corpus.append((f'synthetic-{doc_index:05d}', doc_paragraphs))
+    return corpus
+
+
+def build_queries(corpus, count, terms, seed):
+    """从随机段落中抽取若干非常用词作为查询，该段落即为相关结果"""
+    rng = random.Random(seed + 1)
+    queries = []
+    for _ in range(count):
+        doc_index = rng.randrange(len(corpus))
+        paragraph = rng.choice(corpus[doc_index][1])
+        words = [w.rstrip('.') for w in paragraph.split() if w.rstrip('.') not in COMMON_WORDS]
+        queries.append((' '.join(rng.sample(words, min(terms, len(words)))), doc_index, paragraph))
+    return queries
+
+
+def ingest(knowledge_base, user, corpus):
+    from apps.document.services import ingest_text
+
+    documents = []
+    chunks = 0
+    started = time.perf_counter()
+    for name, paragraphs in corpus:
+        document = ingest_text(knowledge_base, name, '\n\n'.join(paragraphs), user)
+        documents.append(document)
+        chunks += document.chunks_count
+    elapsed = time.perf_counter() - started
+    return documents, {
+        'documents': len(documents),
+        'chunks': chunks,
+        'seconds': round(elapsed, 3),
+        'documents_per_second': round(len(documents) / elapsed, 2),
+        'chunks_per_second': round(chunks / elapsed, 2),
+    }
+
+
+def relevant_chunks(documents, queries):
+    """相关分块：同一文档中包含该段落文本的分块"""
+    from apps.document.models import DocumentChunk
+
+    chunks_by_document = {}
+    for chunk_id, document_id, content in DocumentChunk.objects.values_list('id', 'document_id', 'content'):
+        chunks_by_document.setdefault(document_id, []).append((chunk_id, content))
+    relevant = []
+    for _, doc_index, paragraph in queries:
+        candidates = chunks_by_document.get(documents[doc_index].id, [])
+        relevant.append({chunk_id for chunk_id, content in candidates if paragraph in content})
+    return relevant
+
+
+def evaluate(service, queries, relevant, search_mode, top_k, warmup):
+    from apps.model_management.cache import query_embedding_cache
+
+    for query, _, _ in queries[:warmup]:
+        service.search(query, top_k=top_k, search_mode=search_mode)
+    # 测量不命中查询向量缓存时的完整检索延迟
+    query_embedding_cache.use_redis = False
+    query_embedding_cache.clear()
+
+    latencies, recalls, hits, reciprocal_ranks = [], [], [], []
+    for (query, _, _), expected in zip(queries, relevant):
+        started = time.perf_counter()
+        results = service.search(query, top_k=top_k, search_mode=search_mode)
+        latencies.append((time.perf_counter() - started) * 1000)
+        found = [result.chunk_id for result in results]
+        matched = [rank for rank, chunk_id in enumerate(found) if chunk_id in expected]
+        recalls.append(len(set(found) & expected) / len(expected) if expected else 0.0)
+        hits.append(1.0 if matched else 0.0)
+        reciprocal_ranks.append(1.0 / (matched[0] + 1) if matched else 0.0)
+    count = len(queries) or 1
+    return {
+        'recall_at_k': round(sum(recalls) / count, 4),
+        'hit_at_k': round(sum(hits) / count, 4),
+        'mrr': round(sum(reciprocal_ranks) / count, 4),
+        'latency_ms': latency_summary(latencies),
+    }
+
+
+def run(args):
+    with benchmark_database(keepdb=args.keepdb, EMBEDDING_DIMENSIONS=args.dimensions):
+        from apps.embedding.services import requantize_knowledge_base
+        from apps.pipeline.retrieval import RetrievalService, SEARCH_MODES
+
+        user, knowledge_base = create_benchmark_knowledge_base(
+            chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap,
+            similarity_threshold=0.0, top_k=args.top_k,
+        )
+        kb_settings = knowledge_base.settings
+
+        corpus = build_corpus(args.documents, args.paragraphs, args.words, args.vocabulary, args.seed)
+        queries = build_queries(corpus, args.queries, args.query_terms, args.seed)
+        documents, ingest_metrics = ingest(knowledge_base, user, corpus)
+        relevant = relevant_chunks(documents, queries)
+
+        results = []
+        quantization_modes = [mode.strip() for mode in args.quantization.split(',') if mode.strip()]
+        for mode in quantization_modes:
+            kb_settings.vector_quantization = mode
+            kb_settings.save()
+            requantize_knowledge_base(knowledge_base)
+            knowledge_base.refresh_from_db()
+            service = RetrievalService(knowledge_base)
+            for search_mode in SEARCH_MODES:
+                # 关键词检索与量化方式无关，只测一次
+                if search_mode == 'keyword' and mode != quantization_modes[0]:
+                    continue
+                metrics = evaluate(service, queries, relevant, search_mode, args.top_k, args.warmup)
+                results.append({
+                    'key': f'{search_mode}/{mode}',
+                    'search_mode': search_mode,
+                    'quantization': mode,
+                    **metrics,
+                })
+        return ingest_metrics, results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='检索质量与延迟基准测试')
+    parser.add_argument('--documents', type=int, default=200)
+    parser.add_argument('--paragraphs', type=int, default=20, help='每篇文档的段落数')
+    parser.add_argument('--words', type=int, default=60, help='每个段落的词数')
+    parser.add_argument('--vocabulary', type=int, default=20000)
+    parser.add_argument('--chunk-size', type=int, default=1000)
+    parser.add_argument('--chunk-overlap', type=int, default=200)
+    parser.add_argument('--dimensions', type=int, default=1536)
+    parser.add_argument('--quantization', default='none', help='逗号分隔: none,float16,int8')
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--query-terms', type=int, default=5)
+    parser.add_argument('--top-k', type=int, default=10)
+    parser.add_argument('--warmup', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--keepdb', action='store_true', help='保留测试数据库')
+    parser.add_argument('--output', help='结果JSON输出路径，默认输出到标准输出')
+    args = parser.parse_args(argv)
+
+    setup_django()
+    ingest_metrics, results = run(args)
+    report = build_report('retrieval', vars(args), ingest=ingest_metrics, results=results)
+    write_report(report, args.output)
+    return report
+
+
+if __name__ == '__main__':
+    main()
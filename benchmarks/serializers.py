@@ -0,0 +1,158 @@
+"""
+列表接口序列化基准测试
+
+对比 ModelSerializer + JSONRenderer 与 行序列化器(.values()投影) + FastJSONRenderer
+在知识库列表、分享列表、团队成员列表上每1000行的耗时，并校验两者输出的JSON完全一致。
+serialize 为数据已取出后的序列化耗时，total 包含查询、序列化与渲染。
+需要可连接的PostgreSQL，运行时创建独立的测试数据库并在结束后销毁。
+
+用法: python -m benchmarks.serializers --rows 1000,5000 --output serializers.json
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+
+from benchmarks.common import benchmark_database, build_report, setup_django, write_report
+
+
+def seed(rows):
+    from apps.knowledge_base.models import KnowledgeBase, KnowledgeBaseShare
+    from apps.users.models import Team, TeamMember, User
+
+    suffix = time.time_ns()
+    owner = User.objects.create_user(email=f'owner-{suffix}@example.com', username=f'owner-{suffix}')
+    users = User.objects.bulk_create([
+        User(email=f'user-{suffix}-{index}@example.com', username=f'user-{suffix}-{index}',
+             first_name='测试', last_name=str(index), password='!')
+        for index in range(rows)
+    ])
+    knowledge_bases = KnowledgeBase.objects.bulk_create([
+        KnowledgeBase(name=f'知识库 {index}', description='基准测试' * 8, created_by=owner,
+                      documents_count=index, chunks_count=index * 10, total_size=index * 1024)
+        for index in range(rows)
+    ])
+    KnowledgeBaseShare.objects.bulk_create([
+        KnowledgeBaseShare(knowledge_base=knowledge_bases[0], shared_with=user, permissions={'download': True})
+        for user in users
+    ])
+    team = Team.objects.create(name='基准团队', owner=owner)
+    TeamMember.objects.bulk_create([TeamMember(team=team, user=user) for user in users])
+    return owner, knowledge_bases[0], team
+
+
+def cases(owner, knowledge_base, team):
+    from apps.knowledge_base.models import KnowledgeBase, KnowledgeBaseShare
+    from apps.knowledge_base.serializers import (
+        KnowledgeBaseListRowSerializer, KnowledgeBaseListSerializer,
+        KnowledgeBaseShareRowSerializer, KnowledgeBaseShareSerializer,
+    )
+    from apps.users.models import TeamMember
+    from apps.users.serializers import TeamMemberRowSerializer, TeamMemberSerializer
+
+    # 基线查询集已加 select_related，只比较序列化本身的差异（TeamSerializer 的成员数仍为逐行查询）
+    return {
+        'knowledge_base_list': (
+            KnowledgeBase.objects.filter(created_by=owner).order_by('created_at'),
+            ('created_by',), KnowledgeBaseListSerializer, KnowledgeBaseListRowSerializer,
+        ),
+        'knowledge_base_shares': (
+            KnowledgeBaseShare.objects.filter(knowledge_base=knowledge_base).order_by('created_at'),
+            ('knowledge_base', 'shared_with'), KnowledgeBaseShareSerializer, KnowledgeBaseShareRowSerializer,
+        ),
+        'team_members': (
+            TeamMember.objects.filter(team=team).order_by('joined_at'),
+            ('team__owner', 'user'), TeamMemberSerializer, TeamMemberRowSerializer,
+        ),
+    }
+
+
+def timed(func):
+    started = time.perf_counter()
+    result = func()
+    return result, (time.perf_counter() - started) * 1000
+
+
+def measure_drf(queryset, select_related, serializer_class, limit):
+    from rest_framework.renderers import JSONRenderer
+
+    def total():
+        data = serializer_class(queryset.select_related(*select_related)[:limit], many=True).data
+        return JSONRenderer().render(data)
+
+    objects = list(queryset.select_related(*select_related)[:limit])
+    data, serialize_ms = timed(lambda: serializer_class(objects, many=True).data)
+    _, render_ms = timed(lambda: JSONRenderer().render(data))
+    body, total_ms = timed(total)
+    return body, serialize_ms, render_ms, total_ms
+
+
+def measure_rows(queryset, row_serializer_class, limit):
+    from apps.core.renderers import FastJSONRenderer
+
+    serializer = row_serializer_class()
+
+    def total():
+        return FastJSONRenderer().render(serializer.to_representation(serializer.project(queryset)[:limit]))
+
+    rows = list(serializer.project(queryset)[:limit])
+    data, serialize_ms = timed(lambda: serializer.to_representation(rows))
+    _, render_ms = timed(lambda: FastJSONRenderer().render(data))
+    body, total_ms = timed(total)
+    return body, serialize_ms, render_ms, total_ms
+
+
+def per_thousand(samples, rows):
+    return round(statistics.median(samples) * 1000 / rows, 3)
+
+
+def run(args):
+    sizes = sorted(int(value) for value in args.rows.split(','))
+    results, failed = [], []
+    with benchmark_database(keepdb=args.keepdb):
+        seeded = seed(sizes[-1])
+        for name, (queryset, select_related, serializer_class, row_serializer_class) in cases(*seeded).items():
+            for rows in sizes:
+                samples = {'drf': ([], [], []), 'rows': ([], [], [])}
+                bodies = {}
+                for _ in range(args.repeat):
+                    for mode, measured in (
+                        ('drf', measure_drf(queryset, select_related, serializer_class, rows)),
+                        ('rows', measure_rows(queryset, row_serializer_class, rows)),
+                    ):
+                        bodies[mode] = measured[0]
+                        for bucket, value in zip(samples[mode], measured[1:]):
+                            bucket.append(value)
+                if json.loads(bodies['drf']) != json.loads(bodies['rows']):
+                    failed.append(f'{name}/{rows}')
+                for mode, (serialize, render, total) in samples.items():
+                    results.append({
+                        'key': f'{name}/{mode}/{rows}',
+                        'rows': rows,
+                        'serialize_ms_per_1000': per_thousand(serialize, rows),
+                        'render_ms_per_1000': per_thousand(render, rows),
+                        'total_ms_per_1000': per_thousand(total, rows),
+                        'bytes': len(bodies[mode]),
+                    })
+    return results, failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', default='1000,5000', help='逗号分隔的行数')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--keepdb', action='store_true', help='保留测试数据库')
+    parser.add_argument('--output', help='结果JSON输出路径，默认输出到标准输出')
+    args = parser.parse_args(argv)
+
+    setup_django()
+    results, failed = run(args)
+    # failed 为两种实现输出不一致的用例
+    report = build_report('serializers', vars(args), results=results, failed=failed)
+    write_report(report, args.output)
+    return report
+
+
+if __name__ == '__main__':
+    sys.exit(1 if main()['failed'] else 0)
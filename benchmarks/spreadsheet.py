@@ -0,0 +1,107 @@
+"""
+表格流式解析内存基准测试
+
+生成不同行数的 CSV / XLSX 文件，逐行解析并按行窗口分块，记录峰值内存(tracemalloc)与吞吐量。
+流式解析的峰值内存应与行数基本无关；XLSX 的共享字符串表会随不重复文本增长，
+因此生成的数据以数值和少量重复文本为主。
+
+用法: python -m benchmarks.spreadsheet --rows 20000,200000 --output spreadsheet.json
+"""
+import argparse
+import csv
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+from benchmarks.common import build_report, write_report
+
+CATEGORIES = ['硬件', '软件', '服务', '耗材', '其他']
+HEADER = ['订单号', '日期', '类别', '数量', '单价', '备注']
+
+
+def make_row(number):
+    return [
+        10000000 + number,
+        date(2024, 1, 1) + timedelta(days=number % 365),
+        CATEGORIES[number % len(CATEGORIES)],
+        number % 97,
+        round(10 + (number % 1000) / 7, 2),
+        '加急' if number % 11 == 0 else '',
+    ]
+
+
+def write_csv(path, rows):
+    with open(path, 'w', encoding='utf-8', newline='') as fp:
+        writer = csv.writer(fp)
+        writer.writerow(HEADER)
+        for number in range(rows):
+            writer.writerow(make_row(number))
+
+
+def write_xlsx(path, rows):
+    import openpyxl
+
+    workbook = openpyxl.Workbook(write_only=True)
+    worksheet = workbook.create_sheet('订单')
+    worksheet.append(HEADER)
+    for number in range(rows):
+        worksheet.append(make_row(number))
+    workbook.save(path)
+
+
+def measure(path, file_type, chunk_size):
+    from apps.document.spreadsheets import iter_row_windows, iter_sheet_rows
+
+    windows = 0
+    tracemalloc.start()
+    started = time.perf_counter()
+    with open(path, 'rb') as fp:
+        for _ in iter_row_windows(iter_sheet_rows(fp, file_type), chunk_size):
+            windows += 1
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return windows, elapsed, peak
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', default='20000,200000', help='逗号分隔的行数')
+    parser.add_argument('--formats', default='csv,xlsx')
+    parser.add_argument('--chunk-size', type=int, default=1000)
+    parser.add_argument('--max-growth', type=float, default=2.0,
+                        help='最大行数相对最小行数允许的峰值内存倍数，超出时以非零状态退出')
+    parser.add_argument('--output', help='结果JSON输出路径，默认输出到标准输出')
+    args = parser.parse_args(argv)
+
+    sizes = sorted(int(value) for value in args.rows.split(','))
+    writers = {'csv': write_csv, 'xlsx': write_xlsx}
+    results, failed = [], []
+    with tempfile.TemporaryDirectory() as directory:
+        for file_type in args.formats.split(','):
+            peaks = []
+            for rows in sizes:
+                path = os.path.join(directory, f'{rows}.{file_type}')
+                writers[file_type](path, rows)
+                windows, elapsed, peak = measure(path, file_type, args.chunk_size)
+                peaks.append(peak)
+                results.append({
+                    'key': f'{file_type}/{rows}',
+                    'rows': rows,
+                    'file_bytes': os.path.getsize(path),
+                    'chunks': windows,
+                    'rows_per_second': round(rows / max(elapsed, 1e-9)),
+                    'peak_memory_bytes': peak,
+                })
+            if peaks[-1] > peaks[0] * args.max_growth:
+                failed.append(file_type)
+    report = build_report('spreadsheet', vars(args), results=results, failed=failed)
+    write_report(report, args.output)
+    return report
+
+
+if __name__ == '__main__':
+    sys.exit(1 if main()['failed'] else 0)
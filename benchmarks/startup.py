@@ -0,0 +1,117 @@
+"""
+进程启动耗时基准测试
+
+在全新的Python子进程中依次测量：django.setup()（加载全部应用与 ready()）、加载URL配置（导入全部视图，
+接口进程启动）、导入Celery任务模块（worker启动），重复 --repeat 次取分位数；另用 -X importtime
+运行一次，列出耗时最多的顶层导入，便于定位回归。
+
+模型、解析相关的重型库（langchain、sentence-transformers、tiktoken、openai、文档解析库等）只应在
+使用时导入，启动后出现在 sys.modules 中，或启动耗时 p50 超过 --max-ms 时以非零状态退出。不需要数据库。
+
+用法: python start.py startup_benchmark --repeat 5 --output startup.json
+      python -m benchmarks.startup --repeat 5 --output startup.json
+"""
+import argparse
+import json
+import re
+import subprocess
+import sys
+
+from benchmarks.common import ROOT_DIR, build_report, latency_summary, write_report
+
+HEAVY_MODULES = (
+    'langchain', 'langchain_core', 'langchain_openai', 'langchain_community',
+    'sentence_transformers', 'torch', 'transformers', 'tiktoken', 'openai', 'httpx',
+    'pypdf', 'docx', 'pptx', 'openpyxl', 'xlrd', 'bs4', 'html2text', 'magic', 'jieba',
+)
+
+PHASES = ('django_setup', 'urls', 'celery_tasks')
+
+# 子进程中执行，不导入基准测试模块本身（numpy等），避免影响测量
+CHILD_CODE = """
+import json, os, sys, time
+sys.path.insert(0, {root!r})
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+marks = [time.perf_counter()]
+import django
+django.setup()
+marks.append(time.perf_counter())
+from django.urls import get_resolver
+get_resolver().url_patterns
+marks.append(time.perf_counter())
+from config.celery import app
+app.loader.import_default_modules()
+marks.append(time.perf_counter())
+heavy = {heavy!r}
+print(json.dumps({{
+    'phases_ms': [(end - start) * 1000 for start, end in zip(marks, marks[1:])],
+    'modules': len(sys.modules),
+    'heavy_modules': sorted(name for name in heavy if name in sys.modules),
+}}))
+"""
+
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)$')
+
+
+def run_child(importtime=False):
+    code = CHILD_CODE.format(root=ROOT_DIR, heavy=HEAVY_MODULES)
+    command = [sys.executable, *(['-X', 'importtime'] if importtime else []), '-c', code]
+    completed = subprocess.run(command, cwd=ROOT_DIR, capture_output=True, text=True, check=False)
+    if completed.returncode != 0:
+        raise RuntimeError(f'启动子进程失败:\n{completed.stderr[-2000:]}')
+    return json.loads(completed.stdout.strip().splitlines()[-1]), completed.stderr
+
+
+def slowest_imports(stderr, top):
+    """-X importtime 输出中累计耗时最多的顶层导入（毫秒）"""
+    imports = []
+    for line in stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        # 没有缩进的是子进程代码直接触发的顶层导入
+        if match and not match.group(3):
+            imports.append((match.group(4), int(match.group(2)) / 1000))
+    imports.sort(key=lambda item: item[1], reverse=True)
+    return [{'module': name, 'cumulative_ms': round(ms, 1)} for name, ms in imports[:top]]
+
+
+def run(args):
+    samples = {phase: [] for phase in (*PHASES, 'total')}
+    heavy, modules = set(), 0
+    for _ in range(args.repeat):
+        result, _ = run_child()
+        for phase, elapsed in zip(PHASES, result['phases_ms']):
+            samples[phase].append(elapsed)
+        samples['total'].append(sum(result['phases_ms']))
+        heavy.update(result['heavy_modules'])
+        modules = result['modules']
+    _, stderr = run_child(importtime=True)
+
+    results = [{'key': phase, 'latency_ms': latency_summary(values)} for phase, values in samples.items()]
+    failed = []
+    if heavy:
+        failed.append('heavy_modules')
+    if results[-1]['latency_ms']['p50'] > args.max_ms:
+        failed.append('total')
+    return results, {
+        'modules_loaded': modules,
+        'heavy_modules_loaded': sorted(heavy),
+        'slowest_imports': slowest_imports(stderr, args.top),
+    }, failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='进程启动耗时基准测试')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--max-ms', type=float, default=3000.0, help='允许的启动总耗时p50（毫秒）')
+    parser.add_argument('--top', type=int, default=15, help='列出耗时最多的顶层导入数')
+    parser.add_argument('--output', help='结果JSON输出路径，默认输出到标准输出')
+    args = parser.parse_args(argv)
+
+    results, details, failed = run(args)
+    report = build_report('startup', vars(args), results=results, failed=failed, **details)
+    write_report(report, args.output)
+    return report
+
+
+if __name__ == '__main__':
+    sys.exit(1 if main()['failed'] else 0)
@@ -0,0 +1,109 @@
+"""
+接口限流开销基准测试
+
+测量 ApiThrottle.allow_request 单次调用的延迟（用户 + API密钥 + 若干团队，共一次脚本调用），
+分别使用进程内令牌桶与Redis（Redis不可连接时跳过）。预算设置得足够大，只测量计量本身的开销。
+p99 超过 --max-ms 时以非零状态退出。不需要数据库。
+
+用法: python -m benchmarks.throttling --requests 20000 --teams 3 --output throttling.json
+"""
+import argparse
+import sys
+import time
+import uuid
+
+from benchmarks.common import build_report, latency_summary, setup_django, write_report
+
+RATES = {'user': '1000000/min', 'api_key': '1000000/min', 'team': '1000000/min', 'anon': '1000000/min'}
+
+
+def make_request(teams):
+    """已登录、使用API密钥的请求；团队成员关系预先放入缓存，不查询数据库"""
+    from django.test import RequestFactory
+    from rest_framework.request import Request
+
+    from apps.core import throttling
+    from apps.users.models import ApiKey, User
+
+    user = User(pk=uuid.uuid4(), email='throttle@example.com', username='throttle')
+    team_ids = tuple(str(uuid.uuid4()) for _ in range(teams))
+    throttling.team_membership._entries[str(user.pk)] = (time.monotonic() + 3600, team_ids)
+    request = Request(RequestFactory().get('/api/v1/knowledge-base/', REMOTE_ADDR='127.0.0.1'))
+    request.user = user
+    request.auth = ApiKey(pk=uuid.uuid4(), user=user, key='benchmark')
+    return request
+
+
+def measure(store, request, count):
+    from apps.core import throttling
+
+    class View:
+        throttle_scope = 'default'
+
+    throttling.throttle_store = store
+    throttle = throttling.ApiThrottle()
+    view = View()
+    for _ in range(min(count, 200)):
+        throttle.allow_request(request, view)
+    samples, denied = [], 0
+    for _ in range(count):
+        started = time.perf_counter()
+        allowed = throttle.allow_request(request, view)
+        samples.append((time.perf_counter() - started) * 1000)
+        denied += not allowed
+    return samples, denied
+
+
+def redis_store():
+    from apps.core.redis import get_redis
+    from apps.core.throttling import RedisThrottleStore
+
+    client = get_redis()
+    try:
+        client.ping()
+    except Exception as exc:
+        print(f'Redis不可连接，跳过: {exc}', file=sys.stderr)
+        return None
+    return RedisThrottleStore(client=client)
+
+
+def run(args):
+    from django.test.utils import override_settings
+
+    from apps.core.throttling import LocalThrottleStore
+
+    rates = {'default': RATES, 'expensive': RATES}
+    results, failed = [], []
+    with override_settings(API_THROTTLE={'BACKEND': 'local', 'TEAM_CACHE_TTL': 3600, 'RATES': rates}):
+        request = make_request(args.teams)
+        stores = [('local', LocalThrottleStore())]
+        store = redis_store()
+        if store is not None:
+            stores.append(('redis', store))
+        for name, store in stores:
+            samples, denied = measure(store, request, args.requests)
+            summary = latency_summary(samples)
+            results.append({'key': f'{name}/teams={args.teams}', 'buckets': 2 + args.teams,
+                            'denied': denied, 'latency_ms': summary})
+            if denied or summary['p99'] > args.max_ms:
+                failed.append(name)
+    return results, failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='接口限流开销基准测试')
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--teams', type=int, default=3, help='用户所在团队数（每个团队一个桶）')
+    parser.add_argument('--max-ms', type=float, default=1.0, help='允许的p99延迟（毫秒）')
+    parser.add_argument('--output', help='结果JSON输出路径，默认输出到标准输出')
+    args = parser.parse_args(argv)
+
+    setup_django()
+    results, failed = run(args)
+    report = build_report('throttling', vars(args), results=results, failed=failed)
+    write_report(report, args.output)
+    return report
+
+
+if __name__ == '__main__':
+    sys.exit(1 if main()['failed'] else 0)
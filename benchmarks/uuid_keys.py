@@ -0,0 +1,137 @@
+"""
+主键UUID版本对比基准测试
+
+分别以 uuid4 与 uuid7（MODEL_IDS['UUID_VERSION']，DocumentChunk 已声明 uuid_version = 7）作为主键默认值，向空的分块表逐批写入
+同样数量的 DocumentChunk（每批一个事务），记录整体与最后10%批次的写入速度（表越大随机主键的
+页分裂越多，差距主要体现在后段），以及写入完成后主键索引与全部索引的大小。
+需要可连接的PostgreSQL，运行时创建独立的测试数据库并在结束后销毁；其它数据库只报告写入速度。
+
+用法: python -m benchmarks.uuid_keys --rows 200000 --versions 4,7 --output uuid_keys.json
+"""
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.common import (
+    benchmark_database, build_report, create_benchmark_knowledge_base, setup_django, write_report,
+)
+
+TAIL_FRACTION = 0.1
+
+INDEX_SIZE_SQL = """
+SELECT
+    (SELECT pg_relation_size(i.indexrelid) FROM pg_index i
+     WHERE i.indrelid = %s::regclass AND i.indisprimary),
+    pg_indexes_size(%s::regclass)
+"""
+
+
+def build_texts(rng, count):
+    return [' '.join(f'word{value}' for value in rng.integers(0, 5000, 40)) for _ in range(count)]
+
+
+def reset_table(connection):
+    from apps.document.models import DocumentChunk
+
+    table = DocumentChunk._meta.db_table
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            # 向量表引用分块表，一并清空；TRUNCATE 同时回收索引空间
+            cursor.execute(f'TRUNCATE {connection.ops.quote_name(table)} CASCADE')
+    else:
+        DocumentChunk.objects.all().delete()
+
+
+def index_sizes(connection):
+    from apps.document.models import DocumentChunk
+
+    if connection.vendor != 'postgresql':
+        return None, None
+    table = DocumentChunk._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(INDEX_SIZE_SQL, [table, table])
+        return cursor.fetchone()
+
+
+def insert(version, document, args):
+    """按 version 生成主键写入 args.rows 行，返回每批的 (行数, 耗时)"""
+    from django.test.utils import override_settings
+
+    from apps.core.bulk import copy_insert
+    from apps.document.models import DocumentChunk
+    from apps.document.services import build_chunks
+
+    rng = np.random.default_rng(args.seed)
+    timings = []
+    written = 0
+    with override_settings(MODEL_IDS={'UUID_VERSION': version}):
+        while written < args.rows:
+            count = min(args.batch_size, args.rows - written)
+            # 主键在构造对象时由字段默认值生成，不计入写入耗时
+            chunks = build_chunks(document, build_texts(rng, count), start_index=written)
+            started = time.perf_counter()
+            if args.writer == 'copy':
+                copy_insert(DocumentChunk, chunks, batch_size=count)
+            else:
+                DocumentChunk.objects.bulk_create(chunks, batch_size=count)
+            timings.append((count, time.perf_counter() - started))
+            written += count
+    return timings
+
+
+def summarize(version, timings, sizes):
+    rows = sum(count for count, _ in timings)
+    seconds = sum(elapsed for _, elapsed in timings)
+    tail = timings[-max(1, int(len(timings) * TAIL_FRACTION)):]
+    tail_rows = sum(count for count, _ in tail)
+    tail_seconds = sum(elapsed for _, elapsed in tail)
+    primary_key_bytes, index_bytes = sizes
+    return {
+        'key': f'uuid{version}',
+        'rows': rows,
+        'seconds': round(seconds, 3),
+        'rows_per_second': round(rows / seconds, 1),
+        'tail_rows_per_second': round(tail_rows / tail_seconds, 1),
+        'primary_key_index_bytes': primary_key_bytes,
+        'all_indexes_bytes': index_bytes,
+    }
+
+
+def run(args):
+    from apps.core.models import StatusChoices
+    from apps.document.models import Document
+
+    results = []
+    with benchmark_database(keepdb=args.keepdb) as connection:
+        user, knowledge_base = create_benchmark_knowledge_base()
+        document = Document.objects.create(
+            knowledge_base=knowledge_base, name='uuid-keys', status=StatusChoices.PROCESSING, created_by=user,
+        )
+        for version in (int(value) for value in args.versions.split(',')):
+            reset_table(connection)
+            timings = insert(version, document, args)
+            results.append(summarize(version, timings, index_sizes(connection)))
+        reset_table(connection)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='主键UUID版本对比基准测试')
+    parser.add_argument('--rows', type=int, default=200000, help='每种主键写入的分块数')
+    parser.add_argument('--batch-size', type=int, default=2000)
+    parser.add_argument('--versions', default='4,7', help='逗号分隔的UUID版本: 4,7')
+    parser.add_argument('--writer', choices=('copy', 'bulk_create'), default='copy')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--keepdb', action='store_true', help='保留测试数据库')
+    parser.add_argument('--output', help='结果JSON输出路径，默认输出到标准输出')
+    args = parser.parse_args(argv)
+
+    setup_django()
+    report = build_report('uuid_keys', vars(args), results=run(args))
+    write_report(report, args.output)
+    return report
+
+
+if __name__ == '__main__':
+    main()
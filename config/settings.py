@@ -27,10 +27,12 @@ DJANGO_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 ]
 
 THIRD_PARTY_APPS = [
     'rest_framework',
+    'rest_framework.authtoken',
     'corsheaders',
     'django_filters',
     'drf_yasg',
@@ -54,14 +56,22 @@ INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + LOCAL_APPS
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'apps.core.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'apps.core.middleware.ReplicaRoutingMiddleware',
 ]
 
+# JSON响应压缩（客户端支持且安装了brotli时使用br，否则gzip），小于 MIN_SIZE 字节的响应不压缩
+RESPONSE_COMPRESSION = {
+    'MIN_SIZE': int(os.getenv('RESPONSE_COMPRESSION_MIN_SIZE', '1024')),
+    'BROTLI_QUALITY': int(os.getenv('RESPONSE_COMPRESSION_BROTLI_QUALITY', '5')),
+}
+
 ROOT_URLCONF = 'config.urls'
 
 TEMPLATES = [
@@ -94,6 +104,37 @@ DATABASES = {
     }
 }
 
+# 只读副本：DB_REPLICA_HOSTS 为逗号分隔的 host[:port]，库名与账号同主库。
+# 只有声明为只读的接口（知识库列表/详情、公开/分享给我的知识库、跨库检索）读副本，见 apps/core/replicas.py
+DB_REPLICAS = {
+    'ALIASES': [],
+    # 复制延迟超过该值（秒）的副本暂不使用
+    'MAX_LAG': float(os.getenv('DB_REPLICA_MAX_LAG', '2')),
+    # 每个进程检查复制延迟的间隔（秒）
+    'CHECK_INTERVAL': float(os.getenv('DB_REPLICA_CHECK_INTERVAL', '5')),
+    # 用户写入后只读主库的时间（秒），应大于 MAX_LAG
+    'STICKY_SECONDS': float(os.getenv('DB_REPLICA_STICKY_SECONDS', '5')),
+}
+for index, replica in enumerate(host for host in os.getenv('DB_REPLICA_HOSTS', '').split(',') if host.strip()):
+    host, _, port = replica.strip().partition(':')
+    alias = f'replica_{index + 1}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': port or DATABASES['default']['PORT'],
+        # 测试时副本指向测试主库
+        'TEST': {'MIRROR': 'default'},
+    }
+    DB_REPLICAS['ALIASES'].append(alias)
+
+DATABASE_ROUTERS = ['apps.core.replicas.ReplicaRouter']
+
+# 模型主键：UUID_VERSION=7 时声明了 uuid_version = 7 的模型（分块、向量表）新行使用按时间递增的 uuid7
+# （插入追加在主键索引末尾），其余模型与默认配置使用 uuid4；两种主键可以共存，随时切换；见 apps/core/ids.py
+MODEL_IDS = {
+    'UUID_VERSION': int(os.getenv('MODEL_UUID_VERSION', '4')),
+}
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -136,12 +177,22 @@ AUTH_USER_MODEL = 'users.User'
 # REST Framework configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'apps.users.authentication.ExpiringTokenAuthentication',
+        'apps.users.authentication.ApiKeyAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
+    # 按用户/API密钥/团队计量，预算见 API_THROTTLE
+    'DEFAULT_THROTTLE_CLASSES': [
+        'apps.core.throttling.ApiThrottle',
+    ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    # orjson 编码，输出与 JSONRenderer 相同
+    'DEFAULT_RENDERER_CLASSES': [
+        'apps.core.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
     'DEFAULT_FILTER_BACKENDS': [
@@ -176,21 +227,152 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
+CELERY_BEAT_SCHEDULE = {
+    'dispatch-scheduled-indexing': {
+        'task': 'apps.document.tasks.dispatch_scheduled_indexing',
+        'schedule': 60.0,
+    },
+    'dispatch-web-crawls': {
+        'task': 'apps.document.tasks.dispatch_web_crawls',
+        'schedule': 300.0,
+    },
+    'purge-deleted-knowledge-bases': {
+        'task': 'apps.knowledge_base.tasks.purge_deleted_knowledge_bases',
+        'schedule': float(os.getenv('KB_PURGE_INTERVAL', '86400')),
+    },
+}
+
+# 软删除知识库的永久清理：删除超过 RETENTION_DAYS 天的软删除知识库及其全部数据，
+# 每批 BATCH_SIZE 行、批次间暂停 BATCH_PAUSE 秒，每次最多处理 MAX_KNOWLEDGE_BASES 个；
+# 配置了只读副本时等待复制延迟回落，最多等待 MAX_LAG_WAIT 秒
+KB_PURGE = {
+    'RETENTION_DAYS': int(os.getenv('KB_PURGE_RETENTION_DAYS', '30')),
+    'BATCH_SIZE': int(os.getenv('KB_PURGE_BATCH_SIZE', '1000')),
+    'BATCH_PAUSE': float(os.getenv('KB_PURGE_BATCH_PAUSE', '0.2')),
+    'MAX_KNOWLEDGE_BASES': int(os.getenv('KB_PURGE_MAX_KNOWLEDGE_BASES', '20')),
+    'MAX_LAG_WAIT': float(os.getenv('KB_PURGE_MAX_LAG_WAIT', '60')),
+}
+
+# 定时索引：全局同时处理的文档数上限，处理中超过STALE_AFTER秒视为异常并重新排队
+INDEX_SCHEDULER = {
+    'MAX_CONCURRENCY': int(os.getenv('INDEX_MAX_CONCURRENCY', '4')),
+    'STALE_AFTER': int(os.getenv('INDEX_STALE_AFTER', '3600')),
+}
+
+# 网页数据源采集：全局与每个主机的并发、单页超时(秒)与大小上限(字节)；
+# 默认拒绝解析到内网/回环/链路本地等地址的网址，ALLOW_PRIVATE_HOSTS 只用于本地测试
+WEB_CRAWLER = {
+    'MAX_CONCURRENCY': int(os.getenv('WEB_CRAWLER_MAX_CONCURRENCY', '8')),
+    'PER_HOST_CONCURRENCY': int(os.getenv('WEB_CRAWLER_PER_HOST_CONCURRENCY', '2')),
+    'TIMEOUT': float(os.getenv('WEB_CRAWLER_TIMEOUT', '20')),
+    'MAX_PAGE_BYTES': int(os.getenv('WEB_CRAWLER_MAX_PAGE_BYTES', str(5 * 1024 * 1024))),
+    'USER_AGENT': os.getenv('WEB_CRAWLER_USER_AGENT', 'ManxiAI-Crawler/1.0'),
+    'MAX_REDIRECTS': int(os.getenv('WEB_CRAWLER_MAX_REDIRECTS', '5')),
+    'ALLOW_PRIVATE_HOSTS': os.getenv('WEB_CRAWLER_ALLOW_PRIVATE_HOSTS', 'False').lower() == 'true',
+}
+
+# Redis Configuration（限流、缓存等共享状态）
+REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/1')
+REDIS_SOCKET_TIMEOUT = float(os.getenv('REDIS_SOCKET_TIMEOUT', '0.5'))
+
+# 登录令牌：TTL 为令牌有效期（秒，0 表示不过期）；CACHE_TTL 为Redis中令牌快照的缓存时间，
+# 也是Redis故障恢复期间吊销、用户信息变更生效的最长延迟
+AUTH_TOKEN = {
+    'TTL': int(os.getenv('AUTH_TOKEN_TTL', str(7 * 24 * 3600))),
+    'CACHE_TTL': int(os.getenv('AUTH_TOKEN_CACHE_TTL', '300')),
+}
+
+# 接口限流：BACKEND 为 redis（所有worker共享）/ local（进程内，测试用）/ none（关闭）；
+# default 为普通接口，expensive 为检索、工作流运行等会调用模型的接口，各维度独立计量，速率为空或0表示不限
+API_THROTTLE = {
+    'BACKEND': os.getenv('API_THROTTLE_BACKEND', 'redis'),
+    # 用户所在团队的进程内缓存时间（秒）
+    'TEAM_CACHE_TTL': float(os.getenv('API_THROTTLE_TEAM_CACHE_TTL', '60')),
+    'RATES': {
+        'default': {
+            'anon': os.getenv('API_THROTTLE_DEFAULT_ANON', '120/min'),
+            'user': os.getenv('API_THROTTLE_DEFAULT_USER', '600/min'),
+            'api_key': os.getenv('API_THROTTLE_DEFAULT_API_KEY', '600/min'),
+            'team': os.getenv('API_THROTTLE_DEFAULT_TEAM', '3000/min'),
+        },
+        'expensive': {
+            'anon': os.getenv('API_THROTTLE_EXPENSIVE_ANON', '0'),
+            'user': os.getenv('API_THROTTLE_EXPENSIVE_USER', '30/min'),
+            'api_key': os.getenv('API_THROTTLE_EXPENSIVE_API_KEY', '60/min'),
+            'team': os.getenv('API_THROTTLE_EXPENSIVE_TEAM', '200/min'),
+        },
+    },
+}
+
+# 查询向量缓存：redis 为进程内LRU+Redis两级，local 只用进程内，none 关闭；TTL单位为秒
+QUERY_EMBEDDING_CACHE = {
+    'BACKEND': os.getenv('QUERY_EMBEDDING_CACHE_BACKEND', 'redis'),
+    'MAX_ENTRIES': int(os.getenv('QUERY_EMBEDDING_CACHE_MAX_ENTRIES', '2048')),
+    'TTL': int(os.getenv('QUERY_EMBEDDING_CACHE_TTL', '86400')),
+}
 
 # AI Model Configuration
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY', '')
 OPENAI_BASE_URL = os.getenv('OPENAI_BASE_URL', 'https://api.openai.com/v1')
+LLM_MODEL = os.getenv('LLM_MODEL', 'gpt-3.5-turbo')
+
+# Model Provider Configuration
+# 模型管理中未配置默认模型时使用的供应商类型: openai / openai_compatible / local_stub / local（本地模型服务）
+DEFAULT_MODEL_PROVIDER = os.getenv('DEFAULT_MODEL_PROVIDER', 'openai')
+MODEL_PROVIDER_MAX_CONCURRENCY = int(os.getenv('MODEL_PROVIDER_MAX_CONCURRENCY', '16'))
+MODEL_PROVIDER_TOKENS_PER_MINUTE = int(os.getenv('MODEL_PROVIDER_TOKENS_PER_MINUTE', '0'))
+
+# 按模型的客户端限流（多个worker共享），backend: redis / local
+MODEL_RATE_LIMIT_BACKEND = os.getenv('MODEL_RATE_LIMIT_BACKEND', 'redis')
+MODEL_REQUESTS_PER_MINUTE = int(os.getenv('MODEL_REQUESTS_PER_MINUTE', '0'))
+MODEL_TOKENS_PER_MINUTE = int(os.getenv('MODEL_TOKENS_PER_MINUTE', '0'))
+MODEL_RATE_LIMIT_TIMEOUT = float(os.getenv('MODEL_RATE_LIMIT_TIMEOUT', '60'))
 
 # Embedding Configuration
 EMBEDDING_MODEL = os.getenv('EMBEDDING_MODEL', 'text-embedding-ada-002')
 EMBEDDING_DIMENSIONS = int(os.getenv('EMBEDDING_DIMENSIONS', '1536'))
 
+# 重排序（知识库设置 enable_rerank 开启时，召回 top_k * RERANK_FETCH_MULTIPLIER 条后重排）
+RERANK_MODEL = os.getenv('RERANK_MODEL', 'BAAI/bge-reranker-base')
+RERANK_FETCH_MULTIPLIER = int(os.getenv('RERANK_FETCH_MULTIPLIER', '4'))
+
+# 本地模型服务（python start.py model_server）：sentence-transformers 模型只加载一份，
+# 所有 gunicorn / Celery worker 通过 Unix socket 调用，同一模型的并发请求动态合并成批次
+LOCAL_MODEL_SERVER = {
+    'SOCKET': os.getenv('LOCAL_MODEL_SOCKET', '/tmp/manxiai-models.sock'),
+    'DEVICE': os.getenv('LOCAL_MODEL_DEVICE', 'cpu'),
+    'MAX_BATCH_SIZE': int(os.getenv('LOCAL_MODEL_MAX_BATCH_SIZE', '64')),
+    'MAX_WAIT_MS': float(os.getenv('LOCAL_MODEL_MAX_WAIT_MS', '5')),
+    'INFERENCE_THREADS': int(os.getenv('LOCAL_MODEL_INFERENCE_THREADS', '1')),
+    'TIMEOUT': float(os.getenv('LOCAL_MODEL_TIMEOUT', '60')),
+    # 启动时预加载的模型，逗号分隔；其他模型在第一次请求时加载
+    'PRELOAD_EMBEDDING': [name for name in os.getenv('LOCAL_MODEL_PRELOAD_EMBEDDING', '').split(',') if name],
+    'PRELOAD_RERANK': [name for name in os.getenv('LOCAL_MODEL_PRELOAD_RERANK', '').split(',') if name],
+}
+
 # Vector Database Configuration
 VECTOR_DATABASE = {
     'ENGINE': 'pgvector',
     'TABLE_NAME': 'embeddings',
     'SIMILARITY_THRESHOLD': float(os.getenv('SIMILARITY_THRESHOLD', '0.7')),
     'TOP_K': int(os.getenv('TOP_K', '5')),
+    'HNSW_M': int(os.getenv('HNSW_M', '16')),
+    'HNSW_EF_CONSTRUCTION': int(os.getenv('HNSW_EF_CONSTRUCTION', '64')),
+    # 进程内缓存int8量化索引的知识库数量
+    'INT8_CACHE_SIZE': int(os.getenv('INT8_CACHE_SIZE', '32')),
+    # 过滤检索：匹配行数不超过该值时直接对过滤结果精确计算（位图预过滤），否则走带过滤的HNSW
+    'PREFILTER_EXACT_THRESHOLD': int(os.getenv('PREFILTER_EXACT_THRESHOLD', '20000')),
+    'HNSW_EF_SEARCH_FILTERED': int(os.getenv('HNSW_EF_SEARCH_FILTERED', '200')),
+    # 重新向量化的批大小与限速(分块/秒，0为不限速)
+    'REEMBED_BATCH_SIZE': int(os.getenv('REEMBED_BATCH_SIZE', '256')),
+    'REEMBED_ROWS_PER_SECOND': float(os.getenv('REEMBED_ROWS_PER_SECOND', '200')),
+}
+
+# 跨知识库联合检索：单个知识库超时(秒)、并发数与单次最多检索的知识库数
+FEDERATED_SEARCH = {
+    'TIMEOUT': float(os.getenv('FEDERATED_SEARCH_TIMEOUT', '2.0')),
+    'MAX_CONCURRENCY': int(os.getenv('FEDERATED_SEARCH_MAX_CONCURRENCY', '8')),
+    'MAX_KNOWLEDGE_BASES': int(os.getenv('FEDERATED_SEARCH_MAX_KNOWLEDGE_BASES', '50')),
 }
 
 # File Upload Configuration
@@ -10,6 +10,11 @@ from django.core.management import execute_from_command_line
 if __name__ == '__main__':
     # 设置Django设置模块
     os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+
+    if sys.argv[1:2] == ['startup_benchmark']:
+        # 启动耗时在全新的子进程中测量，当前进程不需要初始化Django；出现回归时以非零状态退出
+        from benchmarks.startup import main
+        sys.exit(1 if main(sys.argv[2:])['failed'] else 0)
     
     # 初始化Django
     django.setup()
@@ -37,13 +42,22 @@ if __name__ == '__main__':
             # 启动Celery worker
             os.system('celery -A config worker --loglevel=info')
             
+        elif command == 'beat':
+            # 启动Celery beat（定时索引调度）
+            os.system('celery -A config beat --loglevel=info')
+            
+        elif command == 'model_server':
+            # 启动本地模型服务（sentence-transformers 模型由所有worker共享）
+            from apps.model_management.local_server import serve
+            serve()
+            
         elif command == 'shell':
             # 启动Django shell
             execute_from_command_line(['manage.py', 'shell'])
             
         else:
             print(f"未知命令: {command}")
-            print("可用命令: migrate, createsuperuser, runserver, celery, shell")
+            print("可用命令: migrate, createsuperuser, runserver, celery, beat, model_server, shell, startup_benchmark")
     else:
         print("ManxiAI 项目启动脚本")
         print("使用方法: python start.py <command>")
@@ -52,4 +66,7 @@ if __name__ == '__main__':
         print("  createsuperuser - 创建超级用户")
         print("  runserver     - 启动开发服务器")
         print("  celery        - 启动Celery worker")
-        print("  shell         - 启动Django shell") 
\ No newline at end of file
+        print("  beat          - 启动Celery beat定时调度")
+        print("  model_server  - 启动本地模型服务")
+        print("  shell         - 启动Django shell")
+        print("  startup_benchmark - 测量进程启动耗时，检查重型库是否在启动时被导入")